@@ -2,5 +2,5 @@ from django.conf import settings
 
 def cdn(request):
     return {
-        "CDN_BASE_URL": getattr(settings, "CDN_BASE_URL", "").rstrip("/")
+        "CDN_BASE_URL": settings.CDN_BASE_URL
     }
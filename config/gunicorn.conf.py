@@ -0,0 +1,151 @@
+# config/gunicorn.conf.py
+"""
+Perfil de producción de gunicorn:  gunicorn -c config/gunicorn.conf.py
+
+- gthread: el checkout espera a Wompi (I/O); con threads un request lento no bloquea el worker entero.
+- preload_app: Django + la app se importan una vez en el master y los workers
+  comparten esa memoria (copy-on-write) en vez de importar cada uno.
+- max_requests + jitter: cada worker se recicla tras N requests (fugas de memoria),
+  con jitter para que no se reinicien todos a la vez.
+- workers según CPU y memoria disponible (cgroup del contenedor), pisable con WEB_CONCURRENCY.
+
+Conexiones a Postgres: una por thread (workers × threads), ver DB_POOL en settings.
+
+Benchmark: python manage.py bench_http (tabla al final del archivo).
+"""
+import multiprocessing
+import os
+
+# =========================
+# Tamaño
+# =========================
+WORKER_MEMORY_MB = int(os.getenv("GUNICORN_WORKER_MEMORY_MB", "128"))  # ~60 MB medidos (ver tabla) + margen hasta el reciclado
+RESERVED_MEMORY_MB = 128  # master + margen
+
+
+def _cpu_count() -> int:
+    """CPUs del contenedor: cuota de cgroup si hay, si no las que ve el proceso."""
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def _memory_mb() -> int:
+    """Límite de memoria del contenedor (cgroup v2 / v1) o la RAM total."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            raw = open(path).read().strip()
+        except OSError:
+            continue
+        if raw.isdigit() and int(raw) < 1 << 50:  # "max" / número gigante = sin límite
+            return int(raw) // (1024 * 1024)
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 1024
+
+
+def default_workers() -> int:
+    by_cpu = _cpu_count() * 2 + 1
+    by_memory = max(1, (_memory_mb() - RESERVED_MEMORY_MB) // WORKER_MEMORY_MB)
+    return max(1, min(by_cpu, by_memory))
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# gthread por defecto; con GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker (pip install uvicorn) corre ASGI
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if "uvicorn" in worker_class:
+    wsgi_app = "config.asgi:application"
+else:
+    wsgi_app = "config.wsgi:application"
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ("1", "true", "yes")
+
+# =========================
+# Reciclado / timeouts
+# =========================
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "45"))  # Wompi tiene timeout=30 en requests
+graceful_timeout = 30
+keepalive = 5
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None  # heartbeat en RAM, no en el disco del contenedor
+
+# =========================
+# Proxy (Railway)
+# =========================
+# Detrás del proxy de Railway: confiar en X-Forwarded-Proto.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*")
+# Wompi firma el webhook en el header "wompi_hash". gunicorn >= 22 descarta headers con "_",
+# salvo los listados acá (no usamos header_map="dangerous": dejaría mezclar X_Forwarded_For).
+forwarder_headers = "SCRIPT_NAME,PATH_INFO,WOMPI_HASH"
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+# =========================
+# Hooks
+# =========================
+def when_ready(server):
+    if preload_app:
+        # con preload, importar también urls -> views/api/pdf antes del fork (si no, lo paga cada worker en su 1er request)
+        from django.urls import get_resolver
+
+        get_resolver().url_patterns
+    server.log.info(
+        "Basalto: %s workers × %s threads (%s), preload=%s, max_requests=%s±%s",
+        workers, threads, worker_class, preload_app, max_requests, max_requests_jitter,
+    )
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return  # sin preload el master no cargó Django: no hay nada heredado
+    # nada abierto en el master se comparte con los workers (sockets de DB / Redis)
+    from django.core.cache import caches
+    from django.db import connections
+
+    from orders.cache import app_cache
+
+    connections.close_all()
+    caches.close_all()
+    app_cache.clear_local()  # L1 / tags del cache de la app: cada worker arranca los suyos
+
+
+# =========================
+# Benchmark
+# =========================
+# 1 vCPU, SQLite, Wompi = wompi_simulator --latency-ms 200, 16 clientes × 10 s:
+#   python manage.py bench_http http://127.0.0.1:8000/api/catalog/?kind=shirts -c 16 -d 10 --pid <master>
+#   python manage.py bench_http http://127.0.0.1:8000/api/orders/create/ --checkout -c 16 -d 10 --pid <master>
+# (checkout con RATE_LIMIT_ENABLED=0; memoria = PSS de master + workers)
+#
+#   config                     | catálogo RPS / p95  | checkout RPS / p95  | memoria
+#   ---------------------------+---------------------+---------------------+--------
+#   sync × 1 (Procfile viejo)  | 143 / 139 ms        |  4.6 / 3430 ms      |  85 MB
+#   sync × 3                   | 119 / 172 ms        | 13.4 / 1224 ms      | 209 MB
+#   gthread 3×4, sin preload   |  93 / 292 ms        | 44.9 /  555 ms      | 215 MB
+#   gthread 3×4 + preload      | 107 / 266 ms        | 43.1 /  588 ms      | 184 MB
+#
+# - checkout (espera a Wompi): los threads dan ~3x sobre sync × 3 y ~10x sobre el Procfile viejo.
+# - catálogo (CPU): con 1 CPU más procesos/threads no suman, solo se reparten; en Railway escala con las CPUs.
+# - preload: ~30 MB menos con 3 workers (el import de Django/pydantic se comparte), y el
+#   primer request de cada worker no paga los imports.
+# - los 500 del checkout (~5%) son choques de order_number (4 dígitos al azar por día) con
+#   >1000 órdenes en el mismo día del benchmark, no del servidor.
@@ -1,4 +1,5 @@
 from pathlib import Path
+import json
 import os
 import dj_database_url
 
@@ -62,6 +63,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "orders.replica.ReplicaPinMiddleware",  # antes de sesiones: guardar la sesión también cuenta como escritura
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -93,17 +95,98 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+# import en frío de config.wsgi (python manage.py profile_startup); el test falla si se pasa
+STARTUP_IMPORT_BUDGET_MS = int(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
 
 # =========================
 # Database
 # =========================
-DATABASES = {
-    "default": dj_database_url.config(
-        default=os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
-        conn_max_age=600,
+# DB_POOL:
+#   ""          -> una conexión persistente por worker/thread (DB_CONN_MAX_AGE) con health check
+#   "pgbouncer" -> detrás de PgBouncer en modo transaction: sin cursores del lado del servidor
+#   "psycopg"   -> pool dentro de cada proceso (Django 5.1 + psycopg 3: pip install "psycopg[binary,pool]")
+DB_POOL = os.getenv("DB_POOL", "").lower()
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
+
+def _database(url: str) -> dict:
+    db = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DB_POOL == "psycopg" else DB_CONN_MAX_AGE,  # con pool, Django no acepta persistentes
+        conn_health_checks=True,  # conexión muerta (restart de Postgres / idle timeout) -> se reabre sola
     )
+    if db["ENGINE"] == "django.db.backends.sqlite3":
+        # local / benchmark: con varios threads escribiendo, IMMEDIATE toma el lock al empezar
+        # (si no, "database is locked" al pasar de lectura a escritura) y espera en vez de fallar
+        db.setdefault("OPTIONS", {}).update(transaction_mode="IMMEDIATE", timeout=20)
+    if db["ENGINE"] != "django.db.backends.postgresql":
+        return db
+    if DB_POOL == "pgbouncer":
+        db["DISABLE_SERVER_SIDE_CURSORS"] = True
+    elif DB_POOL == "psycopg":
+        from psycopg_pool import ConnectionPool  # solo si se pidió el pool
+
+        db.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN", "1")),
+            "max_size": int(os.getenv("DB_POOL_MAX", "4")),
+            "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "check": ConnectionPool.check_connection,
+        }
+    return db
+
+
+DATABASES = {
+    "default": _database(os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")),
 }
 
+# Réplica de lectura opcional: solo la usan las vistas marcadas con read_replica (orders/replica.py)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = _database(DATABASE_REPLICA_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["orders.replica.ReplicaRouter"]
+# después de escribir, el cliente lee del primario este tiempo (lag de la réplica)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "15"))
+
+# =========================
+# Cache
+# =========================
+# Compartido entre workers de gunicorn: Redis si hay REDIS_URL (o algo que hable el
+# protocolo: python manage.py redis_stub para correr offline), CACHE_BACKEND=db en la base
+# (python manage.py createcachetable), si no archivos en disco (mismo contenedor).
+# Lo usan rate limits, stock, precios y el cache de dos niveles (orders/cache.py).
+REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis" if REDIS_URL else "file").lower()
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == "db":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "basalto_cache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR", "/tmp/basalto-cache"),
+        }
+    }
+
+# orders/cache.py: LRU en memoria por proceso delante de CACHES["default"]
+APP_CACHE_L1_MAX_ENTRIES = int(os.getenv("APP_CACHE_L1_MAX_ENTRIES", "2048"))
+APP_CACHE_L1_TTL = int(os.getenv("APP_CACHE_L1_TTL", "30"))  # tope en L1 aunque L2 dure más
+APP_CACHE_TAG_CHECK_SECONDS = float(os.getenv("APP_CACHE_TAG_CHECK_SECONDS", "2"))  # demora máx. de una invalidación en otro worker
+APP_CACHE_WAIT_SECONDS = float(os.getenv("APP_CACHE_WAIT_SECONDS", "5"))  # espera a quien ya está calculando
+
 # =========================
 # Internationalization
 # =========================
@@ -115,16 +198,25 @@ USE_TZ = True
 # =========================
 # Static files
 # =========================
-STATIC_URL = "/static/"
+CDN_BASE_URL = os.getenv("CDN_BASE_URL", "").rstrip("/")
+
+# Con CDN, {% static %} / {% asset %} apuntan al CDN (origin = WhiteNoise en /static/)
+STATIC_URL = f"{CDN_BASE_URL}/static/" if CDN_BASE_URL else "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
-CDN_BASE_URL = os.getenv("CDN_BASE_URL", "")
 
 
 # ✅ para desarrollo: tus assets viven en /static
 
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Django 5.1 ya no lee STATICFILES_STORAGE: el storage se define en STORAGES.
+# collectstatic genera nombres hasheados + .gz/.br (brotli) de css/js.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "orders.storage.StaticStorage"},
+}
 WHITENOISE_MANIFEST_STRICT = False
+# archivos hasheados: max-age de 10 años + immutable (WhiteNoise); el resto 1h
+WHITENOISE_MAX_AGE = 0 if DEBUG else 3600
 
 
 # =========================
@@ -144,7 +236,96 @@ WOMPI_API_BASE = os.getenv(
     "https://api.wompi.sv"
 )
 
+# conciliación (python manage.py reconcile_payments): consultas en paralelo a Wompi
+WOMPI_RECONCILE_WORKERS = int(os.getenv("WOMPI_RECONCILE_WORKERS", "8"))
+# no tocar órdenes más nuevas que esto: el webhook todavía puede llegar
+WOMPI_RECONCILE_MIN_AGE_MINUTES = int(os.getenv("WOMPI_RECONCILE_MIN_AGE_MINUTES", "15"))
+
+# =========================
+# Precios (orders/pricing.py)
+# =========================
+# Envío: por departamento (nombre, sin importar mayúsculas/tildes) o el default.
+# Ej. SHIPPING_BY_DEPARTMENT='{"San Salvador": "2.50", "Morazán": "4.50"}'
+SHIPPING_DEFAULT = os.getenv("SHIPPING_DEFAULT", "3.00")
+SHIPPING_BY_DEPARTMENT = json.loads(os.getenv("SHIPPING_BY_DEPARTMENT", "{}"))
+SHIPPING_FREE_FROM = os.getenv("SHIPPING_FREE_FROM", "0")  # envío gratis desde este subtotal (0 = nunca)
+# Descuentos por cantidad: se aplica el mejor tramo alcanzado. sku_prefix limita qué líneas cuentan.
+# Ej. BUNDLE_DISCOUNTS='[{"min_qty": 3, "percent": "10", "label": "3+ camisas", "sku_prefix": "BAS-CC-"}]'
+BUNDLE_DISCOUNTS = json.loads(os.getenv("BUNDLE_DISCOUNTS", "[]"))
+# cada cuánto un proceso revisa si cambió la versión de la lista de precios (cache compartido)
+PRICE_LIST_CHECK_SECONDS = int(os.getenv("PRICE_LIST_CHECK_SECONDS", "5"))
+
+# =========================
+# Rate limits (API pública de órdenes)
+# =========================
+# (máx. requests, ventana en segundos) por IP y por teléfono, según método de pago
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("1", "true", "yes")
+ORDER_RATE_LIMITS = {
+    "card": {"ip": (10, 600), "phone": (5, 600)},
+    "transfer": {"ip": (20, 600), "phone": (10, 600)},
+}
+# proxies delante de la app (Railway = 1): la IP real es la N-ésima desde el final de X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = int(os.getenv("RATE_LIMIT_PROXY_COUNT", "1"))
+
+# =========================
+# Archivo de órdenes
+# =========================
+# delivered/cancelled más viejas que esto se mueven a ArchivedOrder (python manage.py archive_orders)
+ORDER_ARCHIVE_DAYS = int(os.getenv("ORDER_ARCHIVE_DAYS", "180"))
+
+# =========================
+# Documentos PDF (packing slips / comprobantes)
+# =========================
+# cache de PDFs por hash de contenido + salidas de los jobs (merge / zip)
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "/tmp/basalto-docs")
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", "2"))  # procesos de render del proceso de jobs
+
+# =========================
+# Acciones masivas (python manage.py run_bulk_jobs, Procfile: jobs)
+# =========================
+BULK_POLL_SECONDS = float(os.getenv("BULK_POLL_SECONDS", "1"))
+# un job "running" sin heartbeat en este tiempo es de un proceso que murió (deploy, OOM)
+BULK_HEARTBEAT_SECONDS = int(os.getenv("BULK_HEARTBEAT_SECONDS", "300"))
+BULK_MAX_ATTEMPTS = int(os.getenv("BULK_MAX_ATTEMPTS", "2"))  # después de esto queda en failed
+
 # =========================
 # WhatsApp
 # =========================
 BASALTO_WHATSAPP_NUMBER = os.getenv("BASALTO_WHATSAPP_NUMBER", "50378455804")
+
+# =========================
+# Avisos al cliente (outbox: orders/notifications.py + manage.py dispatch_notifications)
+# =========================
+# canales: whatsapp, email, webhook, log (solo loguea; el default para correr local)
+NOTIFY_CHANNELS = [c.strip() for c in os.getenv("NOTIFY_CHANNELS", "log").split(",") if c.strip()]
+NOTIFY_EVENTS = [e.strip() for e in os.getenv("NOTIFY_EVENTS", "paid,shipped,delivered,tracking").split(",") if e.strip()]
+NOTIFY_BATCH = int(os.getenv("NOTIFY_BATCH", "50"))
+NOTIFY_POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "2"))
+# un lote tomado que no terminó vuelve a la cola; mínimo: el real es >= 2 × NOTIFY_BATCH × NOTIFY_TIMEOUT_SECONDS
+NOTIFY_LEASE_SECONDS = int(os.getenv("NOTIFY_LEASE_SECONDS", "120"))
+NOTIFY_TIMEOUT_SECONDS = float(os.getenv("NOTIFY_TIMEOUT_SECONDS", "10"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "6"))
+NOTIFY_RETRY_BASE_SECONDS = int(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "30"))  # 30 s, 1 min, 2 min, ...
+NOTIFY_RETRY_MAX_SECONDS = int(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "3600"))
+# envíos en paralelo por canal (límites del proveedor), ej. {"whatsapp": 4, "email": 2}
+NOTIFY_CONCURRENCY = json.loads(os.getenv("NOTIFY_CONCURRENCY", '{"whatsapp": 4, "email": 2, "webhook": 8}'))
+NOTIFY_DEFAULT_CONCURRENCY = 4
+
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL", "")
+NOTIFY_WEBHOOK_SECRET = os.getenv("NOTIFY_WEBHOOK_SECRET", "")
+NOTIFY_EMAIL_TO = [e.strip() for e in os.getenv("NOTIFY_EMAIL_TO", "").split(",") if e.strip()]
+
+# API de WhatsApp Cloud (para probar local: WHATSAPP_API_BASE apuntando a un stub)
+WHATSAPP_API_BASE = os.getenv("WHATSAPP_API_BASE", "https://graph.facebook.com/v20.0")
+WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
+WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN", "")
+WHATSAPP_TEMPLATES = json.loads(os.getenv("WHATSAPP_TEMPLATES", "{}"))  # {"shipped": "pedido_enviado", ...}
+WHATSAPP_TEMPLATE_LANG = os.getenv("WHATSAPP_TEMPLATE_LANG", "es")
+
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "1") == "1"
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "BASALTO <no-reply@basalto.sv>")
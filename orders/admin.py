@@ -1,27 +1,75 @@
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from .models import Notification, Order, OrderItem, Product, Variant
+from .inventory import sync_low_stock_alert
+from .notifications import enqueue_tracking, requeue
+from .transitions import STATUS_LABELS, transition
+from .whatsapp import refresh_whatsapp
+
+ESTIMATED_COUNT_FROM = 10_000  # por debajo, COUNT(*) exacto (es barato igual)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist sin filtros en Postgres: el total sale de pg_class.reltuples (lo que dejó el
+    último ANALYZE) en vez de un COUNT(*) que recorre la tabla entera en cada página.
+    Con filtros / búsqueda, o en SQLite, COUNT normal.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        connection = connections[qs.db]
+        if connection.vendor == "postgresql" and not qs.query.where:
+            with connection.cursor() as cur:
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [qs.model._meta.db_table])
+                row = cur.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_FROM:  # -1 = tabla nunca analizada
+                return int(row[0])
+        return super().count
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ("title","sleeve","color","size","fabric","unit_price","qty","line_total","img")
+    autocomplete_fields = ("variant",)  # sin esto, un <select> con todos los variants por fila
     can_delete = False
 
     def has_add_permission(self, request, obj=None):
         return False
 
 
+def _set_status(modeladmin, request, queryset, status):
+    moved, skipped = transition(queryset, status, source="admin", actor=request.user.get_username())
+    modeladmin.message_user(request, f"{len(moved)} orden(es) → {STATUS_LABELS[status]}")
+    if skipped:
+        modeladmin.message_user(
+            request,
+            "Sin cambio (transición no permitida): " + ", ".join(o.order_number for o in skipped),
+            level=messages.WARNING,
+        )
+
+
 @admin.action(description="Marcar como EN PROCESO")
 def mark_processing(modeladmin, request, queryset):
-    queryset.update(status="processing")
+    _set_status(modeladmin, request, queryset, "processing")
 
 @admin.action(description="Marcar como ENVIADA")
 def mark_shipped(modeladmin, request, queryset):
-    queryset.update(status="shipped")
+    _set_status(modeladmin, request, queryset, "shipped")
 
 @admin.action(description="Marcar como ENTREGADA")
 def mark_delivered(modeladmin, request, queryset):
-    queryset.update(status="delivered")
+    _set_status(modeladmin, request, queryset, "delivered")
+
+@admin.action(description="Marcar como CANCELADA (devuelve stock)")
+def mark_cancelled(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, "cancelled")
 
 
 @admin.register(Order)
@@ -33,6 +81,7 @@ class OrderAdmin(admin.ModelAdmin):
         "status",
         "payment_method",
         "total",
+        "items_count",
         "full_name",
         "phone",
         "department",
@@ -45,23 +94,113 @@ class OrderAdmin(admin.ModelAdmin):
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
 
-    readonly_fields = ("created_at", "updated_at", "subtotal", "shipping", "total", "payment_link")
+    # listas grandes: sin el segundo COUNT(*) de "N en total" y con total estimado (ver arriba)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    readonly_fields = ("status", "created_at", "updated_at", "subtotal", "shipping", "discount", "total", "payment_link")  # estado: solo por acciones
 
     fieldsets = (
         ("Estado", {"fields": ("order_number", "status", "payment_method", "payment_link", "tracking_code")}),
         ("Cliente", {"fields": ("full_name", "phone")}),
         ("Envío", {"fields": ("country", "address_line1", "address_line2", "department", "city", "notes")}),
-        ("Totales", {"fields": ("subtotal", "shipping", "total")}),
+        ("Totales", {"fields": ("subtotal", "shipping", "discount", "total")}),
         ("Timestamps", {"fields": ("created_at", "updated_at")}),
     )
 
-    actions = [mark_processing, mark_shipped, mark_delivered]
+    actions = [mark_processing, mark_shipped, mark_delivered, mark_cancelled]
+
+    def get_queryset(self, request):
+        # subquery por fila (solo las de la página), no un GROUP BY sobre toda la tabla
+        items = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        return super().get_queryset(request).annotate(
+            items_count=Subquery(items, output_field=IntegerField())
+        )
+
+    @admin.display(description="Items", ordering="items_count")
+    def items_count(self, obj):
+        return obj.items_count or 0
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "tracking_code" in form.changed_data:
+            enqueue_tracking([obj])  # misma transacción que el guardado del admin
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # el mensaje de WhatsApp lleva items + datos de envío: si se editaron, se regenera
+        if form.has_changed() or any(fs.has_changed() for fs in formsets):
+            order = form.instance
+            order.save(update_fields=refresh_whatsapp(order))
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("order", "title", "sleeve", "color", "size", "qty", "unit_price", "line_total")
+    list_select_related = ("order",)  # Order.__str__ por fila
     list_filter = ("sleeve", "color", "size")
     search_fields = ("order__order_number", "title", "color", "size")
     ordering = ("-id",)
+    autocomplete_fields = ("order", "variant")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ("title", "slug")
+    search_fields = ("title", "slug")
+    ordering = ("title",)
+
+
+@admin.register(Variant)
+class VariantAdmin(admin.ModelAdmin):
+    """Sobre todo para el autocomplete de OrderItem.variant; el stock se toca en /dashboard/inventory/."""
+    list_display = ("sku", "product", "sleeve", "color", "size", "price", "inventory", "active")
+    list_select_related = ("product",)  # Variant.__str__ usa product.title
+    list_filter = ("active", "sleeve", "size")
+    search_fields = ("sku", "product__title", "color")
+    ordering = ("product__title", "sleeve", "color", "size")
+    autocomplete_fields = ("product",)
+    readonly_fields = ("inventory", "low_stock")  # cambios de stock: por el ledger (inventory.set_stock)
+
+    def save_model(self, request, obj, form, change):
+        was_low = obj.low_stock  # no es editable: todavía tiene el valor de la DB
+        super().save_model(request, obj, form, change)
+        if change and "low_stock_threshold" in form.changed_data:
+            sync_low_stock_alert(obj, was_low)  # 👈 sin esto el umbral prendía low_stock sin alerta
+
+    def get_search_results(self, request, queryset, search_term):
+        # autocomplete: el texto de cada opción es Variant.__str__
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related("product"), may_have_duplicates
+
+
+
+@admin.action(description="Reintentar (las fallidas)")
+def retry_notifications(modeladmin, request, queryset):
+    modeladmin.message_user(request, f"{requeue(queryset)} aviso(s) de nuevo en la cola")
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """Outbox de avisos al cliente: lo llena transition() / tracking, lo vacía dispatch_notifications."""
+    list_display = ("order_number", "event", "channel", "recipient", "state", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("state", "event", "channel")
+    search_fields = ("order_number", "recipient")
+    ordering = ("-id",)
+    readonly_fields = [f.name for f in Notification._meta.fields]
+    actions = [retry_notifications]
 
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
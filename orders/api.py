@@ -1,72 +1,29 @@
+import hashlib
 import json
-import re
-from decimal import Decimal, InvalidOperation
-from urllib.parse import quote
+from functools import wraps
 
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
+from pydantic import ValidationError
 
+from . import ratelimit
+from .idempotency import idempotent
+from .inventory import apply_stock_changes, get_availability
 from .models import Order, OrderItem, Variant
-from .utils import generate_order_number
+from .pricing import PricingError, get_price_list, price_cart
+from .schemas import MAX_BODY_BYTES, CartQuotePayload, CheckoutPayload, error_fields
+from .utils import generate_order_number, normalize_size
+from .views import CATALOG_PAGE_SIZE, build_men_cards, split_cards
+from .whatsapp import PREORDER_NOTICE, refresh_whatsapp
 from .wompi import create_payment_link
 
-SHIPPING_FLAT = Decimal("3.00")
-
-PREORDER_NOTICE = (
-    "Pre-order — producción por lote.\n"
-    "Tu pedido se confecciona especialmente para vos.\n"
-    "Producción: 10–15 días.\n"
-    "Envío: San Salvador 3 días · departamentos 4–5 días hábiles.\n"
-)
-
-TRANSFER_INFO = (
-    "Transferencia bancaria:\n"
-    "Banco: BANCO AGRICOLA\n"
-    "Cuenta de ahorro: 3550507559\n"
-    "A nombre de: WILDER DIAZ\n"
-    "Referencia: {ref}\n"
-    "Enviá tu comprobante por este chat para confirmar tu pre-order.\n"
-)
-
-
-def build_message(order: Order) -> str:
-    lines = []
-    lines.append(f"Pedido BASALTO: {order.order_number}")
-    lines.append("")
-    for it in order.items.all():
-        sku_txt = f" | SKU {it.variant.sku}" if getattr(it, "variant", None) else ""
-        lines.append(
-            f"- {it.title} | {it.sleeve} | {it.color} | Talla {it.size} | x{it.qty} — ${it.unit_price}{sku_txt}"
-        )
-    lines.append("")
-    lines.append(f"Subtotal: ${order.subtotal}")
-    lines.append(f"Envío (El Salvador): ${order.shipping}")
-    lines.append(f"Total: ${order.total}")
-    lines.append("")
-    lines.append("Datos de envío:")
-    lines.append(f"Nombre: {order.full_name}")
-    lines.append(f"Tel: {order.phone}")
-    addr = f"{order.address_line1} {order.address_line2}".strip()
-    lines.append(f"Dirección: {addr}")
-    if order.city:
-        lines.append(f"Ciudad/Municipio: {order.city}")
-    if order.department:
-        lines.append(f"Departamento: {order.department}")
-    lines.append("")
-    lines.append(f"Método de pago: {order.payment_method.upper()}")
-    lines.append("")
-    lines.append(PREORDER_NOTICE.strip())
-    if order.payment_method == "transfer":
-        lines.append("")
-        lines.append(TRANSFER_INFO.format(ref=order.order_number).strip())
-    if order.payment_link:
-        lines.append("")
-        lines.append(f"Link de pago (Wompi): {order.payment_link}")
-    return "\n".join(lines)
-
 
 def _to_int(value, default=1) -> int:
     try:
@@ -75,159 +32,92 @@ def _to_int(value, default=1) -> int:
         return default
 
 
-def _clean_money(value) -> str:
-    """
-    Deja solo dígitos y punto. Ej:
-      "$30" -> "30"
-      "30.00" -> "30.00"
-      "Q30" -> "30"
-      "30,00" -> "30.00"
-    """
-    s = str(value or "").strip()
-    s = s.replace(",", ".")
-    s = re.sub(r"[^0-9.]", "", s)
-    # si queda vacío, devolvemos "0"
-    return s if s else "0"
+def _limit_body(view):
+    """Rechaza payloads grandes por Content-Length, antes de leer el body o tocar la DB."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if _to_int(request.META.get("CONTENT_LENGTH"), 0) > MAX_BODY_BYTES:
+            return JsonResponse({"ok": False, "error": "PAYLOAD_TOO_LARGE", "detail": "Pedido demasiado grande"}, status=413)
+        return view(request, *args, **kwargs)
+    return wrapper
 
 
-def _to_decimal(value, default="0") -> Decimal:
-    try:
-        return Decimal(_clean_money(value))
-    except (InvalidOperation, ValueError):
-        return Decimal(default)
-
 @csrf_exempt
 @require_POST
+@_limit_body
+@idempotent
 def create_order(request):
-    # ---- Parse JSON ----
+    # ---- Parse + validación + normalización (una pasada) ----
     try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except Exception:
-        return HttpResponseBadRequest("JSON inválido")
-
-    # ---- Country lock ----
-    country = (payload.get("country") or "El Salvador").strip()
-    if country.lower() != "el salvador":
-        return HttpResponseBadRequest("Solo enviamos a El Salvador")
-
-    # ---- Payment method ----
-    payment_method = (payload.get("payment_method") or "card").strip().lower()
-    if payment_method not in ["card", "transfer"]:
-        return HttpResponseBadRequest("Método de pago inválido")
-
-    # ---- Shipping fields ----
-    full_name = (payload.get("full_name") or "").strip()
-    phone = (payload.get("phone") or "").strip()
-    address_line1 = (payload.get("address_line1") or "").strip()
-
-    if not full_name or not phone or not address_line1:
-        return HttpResponseBadRequest("Faltan datos de envío")
-
-    items = payload.get("items") or []
-    if not isinstance(items, list) or len(items) == 0:
-        return HttpResponseBadRequest("Carrito vacío")
-
-    # ---- Size helpers ----
-    SHIRT_SIZES = {"S", "M", "L", "XL", "XXL"}
-    ONE_SIZE_ALIASES = {"UNI", "UNICA", "ÚNICA", "ONE", "ONE SIZE", "OS", "U"}
-
-    def normalize_size(val: str) -> str:
-        s = (val or "").strip().upper()
-        if s in ONE_SIZE_ALIASES:
-            return "UNI"
-        return s
-
-    # ---- Pre-clean + agrupar SKUs ----
-    cleaned = []
+        data = CheckoutPayload.model_validate_json(request.body)
+    except ValidationError as e:
+        fields = error_fields(e)
+        return JsonResponse({
+            "ok": False,
+            "error": "VALIDATION_ERROR",
+            "detail": fields[0]["message"] if fields else "Pedido inválido",
+            "fields": fields,
+        }, status=400)
+
+    payment_method = data.payment_method
+
+    # ---- Rate limit por IP y teléfono (antes de tocar stock o Wompi) ----
+    if settings.RATE_LIMIT_ENABLED:
+        blocked, retry_after = ratelimit.check(ratelimit.order_rules(request, payment_method, data.phone))
+        if blocked:
+            ratelimit.record_blocked(blocked)
+            response = JsonResponse({
+                "ok": False,
+                "error": "RATE_LIMITED",
+                "detail": "Demasiados pedidos seguidos. Intentá de nuevo en unos minutos.",
+            }, status=429)
+            response["Retry-After"] = str(retry_after)
+            return response
+
+    # ---- Agrupar SKUs ----
     skus_needed = {}
+    for it in data.items:
+        skus_needed[it.sku] = skus_needed.get(it.sku, 0) + it.qty
 
-    for it in items:
-        sku = (it.get("sku") or "").strip()
-
-        # talla
-        size = normalize_size(it.get("size") or "")
-
-        # ✅ Si NO trae SKU, asumimos camisa => exigir S–XXL
-        if not sku:
-            if size not in SHIRT_SIZES:
-                return HttpResponseBadRequest("Talla inválida")
-        else:
-            # ✅ Si trae SKU (accesorios o camisa), permitir UNI o S-XXL
-            if not size:
-                size = "UNI"
-            if size not in (SHIRT_SIZES | {"UNI"}):
-                return HttpResponseBadRequest("Talla inválida")
-
-        qty = max(1, _to_int(it.get("qty"), 1))
-
-        if sku:
-            skus_needed[sku] = skus_needed.get(sku, 0) + qty
-
-        cleaned.append({
-            "title": (it.get("title") or "Producto BASALTO").strip(),
-            "sleeve": (it.get("sleeve") or "").strip(),
-            "color": (it.get("color") or "").strip(),
-            "size": size,
-            "fabric": (it.get("fabric") or "").strip(),
-            "img": (it.get("img") or "").strip(),
-            "qty": qty,
-            "sku": sku,
-            "raw_price": it.get("unit_price") or it.get("price") or "0",
-        })
+    # ---- Precios (lista en memoria, sin queries) ----
+    try:
+        quote = price_cart([(it.sku, it.qty) for it in data.items], department=data.department)
+    except PricingError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # ---- Pre-check de stock (cache, sin locks) ----
+    # Rechaza carritos que ya sabemos sin stock antes de tomar select_for_update.
+    available = get_availability(list(skus_needed))
+    for sku, need_qty in skus_needed.items():
+        if available.get(sku, 0) < need_qty:
+            return HttpResponseBadRequest(
+                f"Sin stock para {sku} (stock {available.get(sku, 0)}, requerido {need_qty})"
+            )
 
     # ---- Persist + inventory (atomic) ----
     with transaction.atomic():
-        variants_by_sku = {}
-
-        # ✅ Si hay SKU, bloqueamos, validamos stock y obtenemos precio real
-        if skus_needed:
-            variants = (
-                Variant.objects
-                .select_for_update()
-                .filter(sku__in=list(skus_needed.keys()), active=True)
-            )
-            variants_by_sku = {v.sku: v for v in variants}
-
-            missing = [sku for sku in skus_needed.keys() if sku not in variants_by_sku]
-            if missing:
-                return HttpResponseBadRequest(f"SKU no existe o inactivo: {', '.join(missing)}")
-
-            for sku, need_qty in skus_needed.items():
-                v = variants_by_sku[sku]
-                if v.inventory < need_qty:
-                    return HttpResponseBadRequest(
-                        f"Sin stock para {sku} (stock {v.inventory}, requerido {need_qty})"
-                    )
-
-        # ---- Calcular totales (ya con precio real si hay SKU) ----
-        subtotal = Decimal("0.00")
-        for row in cleaned:
-            if row["sku"]:
-                v = variants_by_sku[row["sku"]]
-                unit_price = Decimal(v.price)  # ✅ precio real desde DB
-
-                # sincronizar display desde DB
-                row["title"] = v.product.title
-                row["sleeve"] = v.sleeve
-                row["color"] = v.color
-                row["fabric"] = v.fabric
-                row["img"] = v.img
-
-                # ✅ si el variant es talla única, forzamos size UNI
-                if normalize_size(v.size) == "UNI":
-                    row["size"] = "UNI"
-            else:
-                unit_price = _to_decimal(row["raw_price"], "0")
-
-            if unit_price <= 0:
-                return HttpResponseBadRequest("Precio inválido")
-
-            row["unit_price"] = unit_price
-            row["line_total"] = unit_price * row["qty"]
-            subtotal += row["line_total"]
-
-        shipping = SHIPPING_FLAT
-        total = subtotal + shipping
+        # ✅ bloqueamos solo los Variant (of=self) y validamos stock; product viene en la misma query
+        variants = (
+            Variant.objects
+            .select_for_update(of=("self",))
+            .select_related("product")
+            .filter(sku__in=list(skus_needed.keys()), active=True)
+        )
+        variants_by_sku = {v.sku: v for v in variants}
+
+        missing = [sku for sku in skus_needed.keys() if sku not in variants_by_sku]
+        if missing:
+            return HttpResponseBadRequest(f"SKU no existe o inactivo: {', '.join(missing)}")
+
+        for sku, need_qty in skus_needed.items():
+            v = variants_by_sku[sku]
+            if v.inventory < need_qty:
+                return HttpResponseBadRequest(
+                    f"Sin stock para {sku} (stock {v.inventory}, requerido {need_qty})"
+                )
+
+        if any(line.unit_price <= 0 for line in quote.lines):
+            return HttpResponseBadRequest("Precio inválido")
 
         # ---- Crear Order ----
         order = Order.objects.create(
@@ -235,74 +125,77 @@ def create_order(request):
             status="pending",
             payment_method=payment_method,
             country="El Salvador",
-            full_name=full_name,
-            phone=phone,
-            address_line1=address_line1,
-            address_line2=(payload.get("address_line2") or "").strip(),
-            department=(payload.get("department") or "").strip(),
-            city=(payload.get("city") or "").strip(),
-            notes=(payload.get("notes") or "").strip(),
-            subtotal=subtotal,
-            shipping=shipping,
-            total=total,
+            full_name=data.full_name,
+            phone=data.phone,
+            address_line1=data.address_line1,
+            address_line2=data.address_line2,
+            department=data.department,
+            city=data.city,
+            notes=data.notes,
+            subtotal=quote.subtotal,
+            shipping=quote.shipping,
+            discount=quote.discount,
+            total=quote.total,
         )
 
-        # ---- Descontar inventario (si hay SKU) ----
-        if skus_needed:
-            for sku, need_qty in skus_needed.items():
-                v = variants_by_sku[sku]
-                v.inventory -= need_qty
-                v.save(update_fields=["inventory", "updated_at"])
+        # ---- Descontar inventario ----
+        apply_stock_changes(
+            [(variants_by_sku[sku], -need_qty) for sku, need_qty in skus_needed.items()],
+            "checkout",
+            order=order,
+        )
 
-        # ---- Crear items ----
-        for row in cleaned:
-            variant = variants_by_sku.get(row["sku"]) if row["sku"] else None
+        # ---- Crear items (display desde el Variant, precio desde la cotización) ----
+        items = []  # 👈 en memoria: el mensaje de WhatsApp se arma de acá, sin re-consultar
+        for line in quote.lines:
+            variant = variants_by_sku[line.sku]
 
-            OrderItem.objects.create(
+            items.append(OrderItem.objects.create(
                 order=order,
                 variant=variant,
-                title=row["title"],
-                sleeve=row["sleeve"],
-                color=row["color"],
-                size=row["size"],
-                fabric=row["fabric"] or (variant.fabric if variant else ""),
-                img=row["img"],
-                qty=row["qty"],
-                unit_price=row["unit_price"],
-                line_total=row["line_total"],
+                title=variant.product.title,
+                sleeve=variant.sleeve,
+                color=variant.color,
+                size=normalize_size(variant.size) or "UNI",  # el front manda solo {sku, qty}
+                fabric=variant.fabric,
+                img=variant.img,
+                qty=line.qty,
+                unit_price=line.unit_price,
+                line_total=line.line_total,
+            ))
+
+    # ---- Wompi: only for card ----
+    # fuera del atomic: la orden y el stock ya quedaron commiteados y los locks de Variant
+    # no se quedan tomados mientras esperamos a Wompi (hasta 30s)
+    order.payment_link = ""
+    if payment_method == "card":
+        try:
+            payment_link, link_id = create_payment_link(
+                order_number=order.order_number,
+                amount_usd=float(order.total),
+                success_url="https://www.basalto1530.com/payment/success/",
+                webhook_url="https://web-production-844fb.up.railway.app/wompi/callback/",
             )
-
-        # ---- Wompi: only for card ----
-        order.payment_link = ""
-        if payment_method == "card":
-            try:
-                payment_link = create_payment_link(
-                    order_number=order.order_number,
-                    amount_usd=float(order.total),
-                    success_url="https://www.basalto1530.com/payment/success/",
-                    webhook_url="https://web-production-844fb.up.railway.app/wompi/callback/",
-                )
-                order.payment_link = payment_link or ""
-                order.status = "payment_link_created" if order.payment_link else "pending"
-            except Exception as e:
-                order.payment_link = ""
-                order.status = "pending"
-                order.save(update_fields=["payment_link", "status", "updated_at"])
-                return JsonResponse({
-                    "ok": False,
-                    "error": "WOMPI_ERROR",
-                    "detail": str(e),
-                    "order_number": order.order_number,
-                }, status=502)
-        else:
+            order.payment_link = payment_link or ""
+            order.wompi_link_id = link_id
+            order.status = "payment_link_created" if order.payment_link else "pending"
+        except Exception as e:
+            order.payment_link = ""
             order.status = "pending"
-
-        order.save(update_fields=["payment_link", "status", "updated_at"])
-
-    # ---- WhatsApp message ----
-    wa_phone = getattr(settings, "BASALTO_WHATSAPP_NUMBER", "50300000000")
-    message = build_message(order)
-    whatsapp_url = f"https://wa.me/{wa_phone}?text={quote(message, safe='')}"
+            wa_fields = refresh_whatsapp(order, items)
+            order.save(update_fields=["payment_link", "status", "updated_at", *wa_fields])
+            return JsonResponse({
+                "ok": False,
+                "error": "WOMPI_ERROR",
+                "detail": str(e),
+                "order_number": order.order_number,
+            }, status=502)
+    else:
+        order.status = "pending"
+
+    # ---- WhatsApp: se renderiza una vez y queda guardado en la orden ----
+    wa_fields = refresh_whatsapp(order, items)
+    order.save(update_fields=["payment_link", "wompi_link_id", "status", "updated_at", *wa_fields])
 
     return JsonResponse({
         "ok": True,
@@ -310,8 +203,122 @@ def create_order(request):
         "payment_method": order.payment_method,
         "subtotal": str(order.subtotal),
         "shipping": str(order.shipping),
+        "discount": str(order.discount),
         "total": str(order.total),
         "payment_link": order.payment_link,
-        "whatsapp_url": whatsapp_url,
+        "whatsapp_url": order.whatsapp_url,
         "preorder_notice": PREORDER_NOTICE,
-    })
\ No newline at end of file
+    })
+
+
+CATALOG_KINDS = ("shirts", "caps", "bags")
+CATALOG_MAX_PER_PAGE = 48
+CATALOG_MAX_AGE = 60  # segundos; el ETag permite revalidar barato después
+
+
+def _card_json(card: dict) -> dict:
+    return {
+        "title": card["title"],
+        "sleeve": card["sleeve"],
+        "color": card["color"],
+        "fabric": card["fabric"],
+        "img": card["img"],
+        "srcset": card.get("srcset"),
+        "price": card["price"],
+        "compare": card["compare"],
+        "kind": card["kind"],
+        "sku_map": card["sku_map"],
+    }
+
+
+@require_GET
+def catalog_cards(request):
+    """
+    Catálogo paginado (solo lectura) para cargar el resto de cards por scroll.
+    GET /api/catalog/?kind=shirts|caps|bags&page=2&per_page=12
+    """
+    kind = (request.GET.get("kind") or "shirts").strip().lower()
+    if kind not in CATALOG_KINDS:
+        return HttpResponseBadRequest("kind inválido")
+
+    per_page = min(max(_to_int(request.GET.get("per_page"), CATALOG_PAGE_SIZE), 1), CATALOG_MAX_PER_PAGE)
+
+    shirts, caps, bags = split_cards(build_men_cards())
+    cards = dict(zip(CATALOG_KINDS, (shirts, caps, bags)))[kind]
+
+    paginator = Paginator(cards, per_page)
+    page = paginator.get_page(request.GET.get("page"))
+
+    body = json.dumps({
+        "kind": kind,
+        "page": page.number,
+        "num_pages": paginator.num_pages,
+        "count": paginator.count,
+        "next_page": page.next_page_number() if page.has_next() else None,
+        "results": [_card_json(c) for c in page.object_list],
+    }, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf-8")
+
+    etag = quote_etag(hashlib.sha1(body).hexdigest())
+    response = get_conditional_response(request, etag=etag)  # 304 si el cliente ya lo tiene
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=CATALOG_MAX_AGE, stale_while_revalidate=CATALOG_MAX_AGE * 5)
+    return response
+
+
+STOCK_MAX_SKUS = 100
+
+
+@require_GET
+def stock_availability(request):
+    """
+    Disponibilidad en vivo para validar el carrito antes del checkout.
+    GET /api/stock/?skus=BAS-CC-ML-NGR-M,BAS-CC-ML-NGR-L
+      -> {"ok": true, "stock": {sku: qty}, "prices": {sku: "30.00"}}
+    Los precios salen de la lista en memoria: el front corrige carritos guardados con precio viejo.
+    """
+    raw = request.GET.get("skus") or ""
+    skus = list(dict.fromkeys(s.strip() for s in raw.split(",") if s.strip()))
+
+    if not skus:
+        return HttpResponseBadRequest("Faltan SKUs")
+    if len(skus) > STOCK_MAX_SKUS:
+        return HttpResponseBadRequest(f"Máximo {STOCK_MAX_SKUS} SKUs por consulta")
+
+    response = JsonResponse({
+        "ok": True,
+        "stock": get_availability(skus),
+        "prices": get_price_list().prices(skus),
+    })
+    patch_cache_control(response, private=True, max_age=5)
+    return response
+
+
+@csrf_exempt
+@require_POST
+@_limit_body
+def cart_quote(request):
+    """
+    Totales del carrito con las mismas reglas que create_order (envío por departamento,
+    descuentos por cantidad), sin tocar stock ni crear nada.
+    POST /api/cart/quote/ {"department": "...", "items": [{"sku": "...", "qty": 2}]}
+    """
+    try:
+        data = CartQuotePayload.model_validate_json(request.body)
+    except ValidationError as e:
+        fields = error_fields(e)
+        return JsonResponse({
+            "ok": False,
+            "error": "VALIDATION_ERROR",
+            "detail": fields[0]["message"] if fields else "Carrito inválido",
+            "fields": fields,
+        }, status=400)
+
+    try:
+        quote = price_cart([(it.sku, it.qty) for it in data.items], department=data.department)
+    except PricingError as e:
+        return JsonResponse({"ok": False, "error": "UNKNOWN_SKU", "detail": str(e), "skus": e.skus}, status=400)
+
+    return JsonResponse({"ok": True, **quote.as_dict()})
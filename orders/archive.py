@@ -0,0 +1,72 @@
+# orders/archive.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Notification, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ("delivered", "cancelled")
+
+
+def _copy_fields(src_model, dst_model):
+    """Campos concretos que existen en ambos modelos (attname: order_id, variant_id...)."""
+    dst = {f.attname for f in dst_model._meta.concrete_fields}
+    return [f.attname for f in src_model._meta.concrete_fields if f.attname in dst]
+
+
+ORDER_FIELDS = _copy_fields(Order, ArchivedOrder)
+ITEM_FIELDS = _copy_fields(OrderItem, ArchivedOrderItem)
+
+
+def archivable(days: int):
+    """
+    Cerradas y viejas, sin avisos en el outbox por salir (pending / sending): esas esperan a que
+    el dispatcher termine y entran en una corrida siguiente. Los avisos ya enviados o fallidos
+    no frenan nada: tienen su order_number y payload, y el FK queda en NULL (SET_NULL).
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    outbox = Notification.objects.filter(order_id__isnull=False, state__in=("pending", "sending")).values("order_id")
+    return (
+        Order.objects
+        .filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+        .exclude(id__in=outbox)
+    )
+
+
+def archive_batch(days: int, batch_size: int = 500) -> int:
+    """
+    Mueve UN lote de órdenes cerradas (y sus items) a las tablas de archivo.
+    Todo en una transacción: o queda en Order o en ArchivedOrder, nunca en las dos.
+    Devuelve cuántas órdenes movió (0 = no queda nada).
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable(days)
+            .order_by("id")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        orders = Order.objects.filter(id__in=ids).values(*ORDER_FIELDS)
+        items = OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)
+
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**row) for row in items])
+
+        # StockMovement / OrderStatusChange / Notification.order quedan en NULL (on_delete=SET_NULL);
+        # los tres guardan order_number
+        Order.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+
+def archive_orders(days: int, batch_size: int = 500) -> int:
+    """Archiva en lotes chicos hasta que no quede nada. Devuelve el total movido."""
+    total = 0
+    while True:
+        moved = archive_batch(days, batch_size)
+        if not moved:
+            return total
+        total += moved
@@ -0,0 +1,62 @@
+# orders/assets.py
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+# hosts que sirven nuestro /static/ (además de FRONTEND_DOMAIN y CDN_BASE_URL)
+OWN_HOSTS = {"basalto1530.com", "www.basalto1530.com"}
+
+
+def _own_hosts() -> set:
+    hosts = set(OWN_HOSTS)
+    for url in (settings.FRONTEND_DOMAIN, getattr(settings, "CDN_BASE_URL", "")):
+        host = urlsplit(url or "").hostname
+        if host:
+            hosts.add(host)
+    return hosts
+
+
+def static_key(img: str) -> str:
+    """
+    Convierte el valor de Variant.img a la ruta relativa dentro de /static/.
+    Soporta "images/x.webp", "/static/images/x.webp" y
+    "https://basalto1530.com/static/images/x.webp". Devuelve "" si no es estático.
+    """
+    s = (img or "").strip()
+    if not s:
+        return ""
+
+    static_path = urlsplit(settings.STATIC_URL or "/static/").path or "/static/"
+    parts = urlsplit(s)
+    if parts.scheme in ("http", "https"):
+        if parts.hostname not in _own_hosts():
+            return ""
+        s = parts.path
+
+    if s.startswith(static_path):
+        return s[len(static_path):]
+    if s.startswith("/"):
+        return ""
+    return s
+
+
+def is_cloudinary(url: str) -> bool:
+    return "res.cloudinary.com/" in (url or "") and "/image/upload/" in (url or "")
+
+
+def asset_url(path: str) -> str:
+    """
+    Resolver único de URLs de assets (templates, cards, srcset):
+    - rutas de /static/ (relativas, absolutas o con nuestro dominio) -> nombre
+      hasheado del manifest de collectstatic, servido desde STATIC_URL (CDN si hay)
+    - URLs externas (Cloudinary, etc.) -> sin cambios, ya vienen de un CDN
+    """
+    s = (path or "").strip()
+    if not s:
+        return ""
+
+    key = static_key(s)
+    if not key:
+        return s
+    return staticfiles_storage.url(key)
@@ -0,0 +1,182 @@
+# orders/bulk.py
+"""
+Acciones masivas del dashboard: la vista solo crea el BulkJob (queued) y las corre
+`python manage.py run_bulk_jobs` (Procfile: jobs), fuera de gunicorn: un deploy o el
+max_requests de un worker web no las corta a la mitad.
+
+Van por lotes de BULK_CHUNK órdenes guardando el progreso (y el heartbeat) en BulkJob;
+el dashboard lo consulta por JSON. Un job "running" sin heartbeat en BULK_HEARTBEAT_SECONDS
+es de un proceso que murió: vuelve a la cola hasta BULK_MAX_ATTEMPTS y después queda en failed.
+Re-correr un lote no hace daño: transition() salta lo que ya se movió y el tracking es el mismo.
+"""
+import csv
+import io
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .documents import job_output_path, purge_job_files, render_documents, write_merged_pdf, write_zip
+from .models import BulkJob, Order
+from .notifications import enqueue_tracking
+from .transitions import transition
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK = 100
+MAX_CSV_BYTES = 1024 * 1024
+MAX_ERRORS = 50  # no guardar miles de errores en el JSON del job
+
+
+def _chunks(seq, size=BULK_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _progress(job, processed, changed, errors):
+    BulkJob.objects.filter(pk=job.pk).update(
+        processed=F("processed") + processed,
+        changed=F("changed") + changed,
+        heartbeat_at=timezone.now(),
+    )
+    if errors:
+        job.refresh_from_db(fields=["errors"])
+        job.errors = (job.errors + errors)[:MAX_ERRORS]
+        job.save(update_fields=["errors"])
+
+
+# =========================
+# Runners (uno por kind)
+# =========================
+def _run_status(job):
+    ids = job.params["ids"]
+    status = job.params["status"]
+    for chunk in _chunks(ids):
+        moved, skipped = transition(chunk, status, source="bulk", actor=job.created_by)
+        _progress(job, len(chunk), len(moved), [f"{o.order_number}: {o.get_status_display()}" for o in skipped])
+
+
+def _run_tracking(job):
+    rows = job.params["rows"]  # [[order_number, tracking_code], ...]
+    mark_shipped = job.params.get("mark_shipped", False)
+
+    for chunk in _chunks(rows):
+        codes = dict(chunk)
+        orders = list(
+            Order.objects.filter(order_number__in=list(codes))
+            .only("id", "order_number", "tracking_code", "status", "full_name", "phone", "total")
+        )
+        missing = sorted(set(codes) - {o.order_number for o in orders})
+
+        now = timezone.now()
+        changed = [o for o in orders if o.tracking_code != codes[o.order_number]]
+        for o in orders:
+            o.tracking_code = codes[o.order_number]
+            o.updated_at = now
+        with transaction.atomic():
+            Order.objects.bulk_update(orders, ["tracking_code", "updated_at"])  # un UPDATE (CASE) por lote
+            enqueue_tracking(changed)  # las ya enviadas; las que pasan a shipped lo llevan en ese aviso
+            if mark_shipped and orders:
+                transition(orders, "shipped", source="bulk", actor=job.created_by)
+
+        _progress(job, len(chunk), len(changed), [f"{n}: no existe" for n in missing])
+
+
+def _run_documents(job):
+    kind, fmt = job.params["doc"], job.params["format"]
+    purge_job_files()
+    docs = render_documents(
+        job.params["ids"],
+        kind,
+        progress=lambda n: _progress(job, n, n, []),
+    )
+    out = job_output_path(job.pk, fmt)
+    if fmt == "zip":
+        write_zip(docs, kind, out)
+    else:
+        write_merged_pdf(docs, out)
+
+
+RUNNERS = {
+    "status": _run_status,
+    "tracking": _run_tracking,
+    "documents": _run_documents,
+}
+
+
+def start_job(kind: str, params: dict, total: int, created_by: str = "") -> BulkJob:
+    """Crea el job en cola; lo toma run_bulk_jobs (ve la fila recién cuando la vista commitea)."""
+    return BulkJob.objects.create(kind=kind, params=params, total=total, created_by=created_by)
+
+
+# =========================
+# Worker (run_bulk_jobs)
+# =========================
+def recover_stale(now=None) -> tuple:
+    """
+    Jobs "running" sin heartbeat reciente (el proceso murió): a la cola de nuevo, o a failed
+    si ya se intentaron BULK_MAX_ATTEMPTS veces. Devuelve (reencolados, fallidos).
+    """
+    now = now or timezone.now()
+    stale = BulkJob.objects.filter(state="running", heartbeat_at__lt=now - timedelta(seconds=settings.BULK_HEARTBEAT_SECONDS))
+    failed = stale.filter(attempts__gte=settings.BULK_MAX_ATTEMPTS).update(state="failed", finished_at=now)
+    requeued = stale.update(state="queued", processed=0, changed=0)  # el progreso arranca de nuevo
+    if requeued or failed:
+        logger.warning("🔁 BulkJob: %s reencolado(s), %s fallido(s) sin heartbeat", requeued, failed)
+    return requeued, failed
+
+
+def claim_job():
+    """El job en cola más viejo, tomado con UPDATE condicional (pueden correr varios procesos)."""
+    for pk in BulkJob.objects.filter(state="queued").order_by("created_at", "pk").values_list("pk", flat=True)[:5]:
+        taken = BulkJob.objects.filter(pk=pk, state="queued").update(
+            state="running", attempts=F("attempts") + 1, heartbeat_at=timezone.now(),
+        )
+        if taken:
+            return BulkJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job) -> bool:
+    """Corre un job ya tomado. Devuelve True si terminó bien."""
+    try:
+        RUNNERS[job.kind](job)
+        BulkJob.objects.filter(pk=job.pk).update(state="done", finished_at=timezone.now())
+        return True
+    except Exception as e:
+        logger.exception("💥 BulkJob %s falló", job.pk)
+        BulkJob.objects.filter(pk=job.pk).update(state="failed", finished_at=timezone.now())
+        _progress(job, 0, 0, [str(e)])
+        return False
+
+
+def parse_tracking_csv(upload) -> tuple:
+    """
+    CSV con columnas order_number,tracking_code (header opcional).
+    Devuelve (rows, errores). La última fila de una orden repetida gana.
+    """
+    if upload.size > MAX_CSV_BYTES:
+        return [], ["El CSV es demasiado grande (máx. 1 MB)"]
+
+    text = upload.read().decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    rows, errors = {}, []
+    for i, row in enumerate(csv.reader(io.StringIO(text), dialect), start=1):
+        cells = [c.strip() for c in row]
+        if not any(cells):
+            continue
+        if i == 1 and cells[0].lower() in ("order_number", "orden", "order", "#orden"):
+            continue
+        if len(cells) < 2 or not cells[0] or not cells[1]:
+            errors.append(f"Línea {i}: faltan orden o tracking")
+            continue
+        rows[cells[0]] = cells[1][:80]
+
+    return [[k, v] for k, v in rows.items()], errors
@@ -0,0 +1,271 @@
+# orders/cache.py
+"""
+Cache de dos niveles para la app:
+
+    L1: LRU en memoria del proceso (APP_CACHE_L1_MAX_ENTRIES, TTL APP_CACHE_L1_TTL)
+    L2: el cache compartido de Django (CACHES["default"]: Redis, DB o archivos; ver settings)
+
+    from orders.cache import app_cache
+
+    cards = app_cache.get_or_set("catalog:cards", build, ttl=60, tags=["catalog"])
+    app_cache.invalidate_tags("catalog")
+
+- Tags: cada tag tiene una versión (token) en L2. Las entradas guardan las versiones con las
+  que se calcularon y dejan de valer cuando cambian. invalidate_tags() corre en un proceso;
+  los demás ven la versión nueva al revisar (como mucho cada APP_CACHE_TAG_CHECK_SECONDS),
+  sin pub/sub: funciona igual con Redis, DB o archivos.
+- Stampede: get_or_set calcula una vez por key (single-flight por proceso + lock en L2 entre
+  procesos); el resto espera el valor hasta APP_CACHE_WAIT_SECONDS y si no, calcula igual.
+- Métricas por proceso en app_cache.stats() (también en /healthz/).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# tags de la app
+CATALOG = "catalog"  # cards del catálogo (views.build_men_cards)
+PRICES = "prices"  # lista de precios (orders/pricing.py)
+
+_MISS = object()
+
+
+class _LRU:
+    """OrderedDict con tope de entradas y vencimiento (monotonic). Thread-safe."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, expires_at: float, value, tags: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value, tags)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    def __init__(self, alias: str = "default", prefix: str = "app", l1_max_entries: int = None,
+                 l1_ttl: float = None, tag_check_seconds: float = None, wait_seconds: float = None):
+        self.alias = alias
+        self.prefix = prefix
+        self.l1_ttl = settings.APP_CACHE_L1_TTL if l1_ttl is None else l1_ttl
+        self.tag_check_seconds = settings.APP_CACHE_TAG_CHECK_SECONDS if tag_check_seconds is None else tag_check_seconds
+        self.wait_seconds = settings.APP_CACHE_WAIT_SECONDS if wait_seconds is None else wait_seconds
+        self.l1 = _LRU(settings.APP_CACHE_L1_MAX_ENTRIES if l1_max_entries is None else l1_max_entries)
+
+        self._tags = {}  # tag -> (versión, monotonic de la última revisión)
+        self._tags_lock = threading.Lock()
+        self._flights = {}  # key -> threading.Event del que está calculando
+        self._flights_lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("l1_hits", "l2_hits", "misses", "stale", "sets", "loads", "load_waits", "invalidations"), 0
+        )
+        self._counters_lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _count(self, name: str, n: int = 1):
+        with self._counters_lock:
+            self._counters[name] += n
+
+    # =========================
+    # Tags
+    # =========================
+    def tag_versions(self, tags) -> dict:
+        """{tag: versión}. Lo revisado hace menos de tag_check_seconds sale de memoria."""
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return {}
+        now = time.monotonic()
+        with self._tags_lock:
+            known = {t: self._tags[t][0] for t in tags if t in self._tags and now - self._tags[t][1] < self.tag_check_seconds}
+        stale = [t for t in tags if t not in known]
+        if stale:
+            keys = {self._key(f"tag:{t}"): t for t in stale}
+            found = self.l2.get_many(list(keys))
+            for k, t in keys.items():
+                if k not in found:
+                    # sin versión (cache nuevo / evicted): una nueva invalida lo que hubiera con la vieja
+                    self.l2.add(k, uuid.uuid4().hex, None)
+                    found[k] = self.l2.get(k)
+            with self._tags_lock:
+                for k, t in keys.items():
+                    known[t] = found[k]
+                    self._tags[t] = (found[k], now)
+        return {t: known[t] for t in tags}
+
+    def invalidate_tags(self, *tags):
+        """Nueva versión para cada tag: todo lo cacheado con esos tags deja de valer."""
+        fresh = {t: uuid.uuid4().hex for t in tags}
+        if not fresh:
+            return
+        self.l2.set_many({self._key(f"tag:{t}"): v for t, v in fresh.items()}, None)
+        now = time.monotonic()
+        with self._tags_lock:
+            for t, v in fresh.items():
+                self._tags[t] = (v, now)
+        self._count("invalidations", len(fresh))
+
+    def _valid(self, tags: dict) -> bool:
+        return not tags or self.tag_versions(tags) == tags
+
+    # =========================
+    # get / set
+    # =========================
+    def get(self, key: str, default=None):
+        entry = self.l1.get(key)
+        if entry is not None:
+            if self._valid(entry[2]):
+                self._count("l1_hits")
+                return entry[1]
+            self.l1.delete(key)
+            self._count("stale")
+
+        payload = self.l2.get(self._key(key))
+        if payload is not None:
+            remaining = payload["e"] - time.time()
+            if remaining > 0 and self._valid(payload["t"]):
+                self.l1.set(key, time.monotonic() + min(self.l1_ttl, remaining), payload["v"], payload["t"])
+                self._count("l2_hits")
+                return payload["v"]
+            self._count("stale")
+
+        self._count("misses")
+        return default
+
+    def set(self, key: str, value, ttl: float, tags=(), tag_versions: dict = None):
+        """tag_versions: las leídas ANTES de calcular el valor (get_or_set), si no las actuales."""
+        versions = tag_versions if tag_versions is not None else self.tag_versions(tags)
+        self.l2.set(self._key(key), {"v": value, "t": versions, "e": time.time() + ttl}, ttl)
+        self.l1.set(key, time.monotonic() + min(self.l1_ttl, ttl), value, versions)
+        self._count("sets")
+
+    def delete(self, key: str):
+        self.l1.delete(key)
+        self.l2.delete(self._key(key))
+
+    def get_or_set(self, key: str, loader, ttl, tags=()):
+        """
+        Valor cacheado o loader() una sola vez. ttl: segundos o callable(valor) -> segundos
+        (ej. un token que trae su propio vencimiento).
+        """
+        value = self.get(key, _MISS)
+        if value is not _MISS:
+            return value
+
+        # single-flight en el proceso: el primero calcula, el resto espera su resultado
+        with self._flights_lock:
+            event = self._flights.get(key)
+            leader = event is None
+            if leader:
+                event = self._flights[key] = threading.Event()
+        if not leader:
+            self._count("load_waits")
+            event.wait(self.wait_seconds)
+            value = self.get(key, _MISS)
+            if value is not _MISS:
+                return value
+            return self._load(key, loader, ttl, tags)  # el otro falló o tardó demasiado
+
+        try:
+            return self._load(key, loader, ttl, tags, cross_process=True)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            event.set()
+
+    def _load(self, key, loader, ttl, tags, cross_process=False):
+        lock_key = self._key(f"lock:{key}")
+        locked = False
+        if cross_process:
+            # entre procesos: lock en L2; si otro worker ya está calculando, esperar su valor
+            locked = self.l2.add(lock_key, 1, max(1, int(self.wait_seconds * 2)))
+            if not locked:
+                self._count("load_waits")
+                deadline = time.monotonic() + self.wait_seconds
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self.get(key, _MISS)
+                    if value is not _MISS:
+                        return value
+
+        try:
+            versions = self.tag_versions(tags)  # antes de calcular: si invalidan mientras tanto, nace vencido
+            value = loader()
+            self._count("loads")
+            seconds = ttl(value) if callable(ttl) else ttl
+            if seconds and seconds > 0:
+                self.set(key, value, seconds, tags, tag_versions=versions)
+            return value
+        finally:
+            if locked:
+                self.l2.delete(lock_key)
+
+    # =========================
+    # Métricas
+    # =========================
+    def stats(self) -> dict:
+        with self._counters_lock:
+            data = dict(self._counters)
+        hits = data["l1_hits"] + data["l2_hits"]
+        lookups = hits + data["misses"]
+        data.update(
+            hit_ratio=round(hits / lookups, 3) if lookups else None,
+            l1_entries=len(self.l1),
+            l1_max_entries=self.l1.max_entries,
+            evictions=self.l1.evictions,
+            backend=self.l2.__class__.__name__,
+        )
+        return data
+
+    def clear_local(self):
+        """Vacía L1 y la vista de tags del proceso (post_fork / tests)."""
+        self.l1.clear()
+        with self._tags_lock:
+            self._tags.clear()
+
+
+app_cache = TwoTierCache()
+
+
+def invalidate_on_commit(*tags):
+    """invalidate_tags cuando commitee la transacción actual (si no hay, ya)."""
+    transaction.on_commit(lambda: app_cache.invalidate_tags(*tags))
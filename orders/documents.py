@@ -0,0 +1,161 @@
+# orders/documents.py
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Order
+
+# fitz / qrcode (orders/pdf.py) se importan recién al generar documentos: no pesan en el arranque
+
+DOC_VERSION = 2  # subir si cambia el layout: invalida todo el cache
+DOC_KINDS = {"slip": "packing-slip", "invoice": "comprobante"}
+POOL_CHUNK = 25
+JOB_FILES_TTL = 60 * 60 * 24
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _root() -> Path:
+    return Path(settings.DOCUMENTS_DIR)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Pool del proceso de jobs (run_bulk_jobs). spawn (no fork): el proceso ya tiene
+    threads (conexiones, logging) y forkear un proceso con threads no es seguro.
+    Chico (DOCUMENT_WORKERS): el render compite por CPU con la web en la misma máquina.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, settings.DOCUMENT_WORKERS)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def order_data(order) -> dict:
+    """Dict plano (picklable) con lo que imprime el documento. Usa items prefetcheados."""
+    return {
+        "order_number": order.order_number,
+        "created_at": timezone.localtime(order.created_at).strftime("%Y-%m-%d"),
+        "payment_method": order.get_payment_method_display(),
+        "tracking_code": order.tracking_code,
+        "full_name": order.full_name,
+        "phone": order.phone,
+        "address_line1": order.address_line1,
+        "address_line2": order.address_line2,
+        "city": order.city,
+        "department": order.department,
+        "country": order.country,
+        "notes": order.notes,
+        "subtotal": str(order.subtotal),
+        "shipping": str(order.shipping),
+        "discount": str(order.discount),
+        "total": str(order.total),
+        "items": [
+            {
+                "title": it.title,
+                "sleeve": it.sleeve,
+                "color": it.color,
+                "size": it.size,
+                "qty": it.qty,
+                "unit_price": str(it.unit_price),
+                "line_total": str(it.line_total),
+            }
+            for it in sorted(order.items.all(), key=lambda it: it.pk)
+        ],
+    }
+
+
+def cache_path(kind: str, data: dict) -> Path:
+    """El nombre ES el hash del contenido: si la orden no cambió, el PDF ya está."""
+    raw = json.dumps([DOC_VERSION, kind, data], sort_keys=True, ensure_ascii=False)
+    h = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return _root() / kind / h[:2] / f"{h}.pdf"
+
+
+def render_documents(order_ids, kind: str, progress=None) -> list:
+    """
+    [(order_number, path)] en orden de fecha. Lo cacheado no se vuelve a renderizar;
+    lo que falta va al pool en tasks de POOL_CHUNK documentos.
+    progress(n) se llama a medida que hay documentos listos.
+    """
+    if kind not in DOC_KINDS:
+        raise ValueError(f"Tipo de documento inválido: {kind}")
+
+    orders = Order.objects.filter(pk__in=list(order_ids)).prefetch_related("items").order_by("created_at")
+    docs, todo = [], []
+    for order in orders:
+        data = order_data(order)
+        path = cache_path(kind, data)
+        docs.append((order.order_number, path))
+        if not path.exists():
+            todo.append((data, str(path)))
+
+    if progress and len(docs) > len(todo):
+        progress(len(docs) - len(todo))
+
+    from .pdf import render_many, render_to_file
+
+    if len(todo) == 1:
+        render_to_file(kind, *todo[0])  # una sola: no vale la pena el pool
+        if progress:
+            progress(1)
+    elif todo:
+        pool = get_pool()
+        futures = {
+            pool.submit(render_many, kind, todo[i:i + POOL_CHUNK]): min(POOL_CHUNK, len(todo) - i)
+            for i in range(0, len(todo), POOL_CHUNK)
+        }
+        for fut in as_completed(futures):
+            fut.result()
+            if progress:
+                progress(futures[fut])
+
+    return docs
+
+
+def write_merged_pdf(docs, out_path: Path) -> Path:
+    import fitz
+
+    merged = fitz.open()
+    for _, path in docs:
+        with fitz.open(path) as doc:
+            merged.insert_pdf(doc)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    merged.save(out_path, garbage=3, deflate=True)
+    merged.close()
+    return out_path
+
+
+def write_zip(docs, kind: str, out_path: Path) -> Path:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_STORED) as zf:  # PDFs ya van comprimidos
+        for order_number, path in docs:
+            zf.write(path, arcname=f"{DOC_KINDS[kind]}-{order_number}.pdf")
+    return out_path
+
+
+def job_output_path(job_id: int, fmt: str) -> Path:
+    return _root() / "jobs" / f"{job_id}.{fmt}"
+
+
+def purge_job_files(max_age: int = JOB_FILES_TTL):
+    """Borra salidas de jobs viejas (el cache por hash se queda)."""
+    jobs_dir = _root() / "jobs"
+    if not jobs_dir.exists():
+        return
+    cutoff = time.time() - max_age
+    for f in jobs_dir.iterdir():
+        if f.stat().st_mtime < cutoff:
+            f.unlink(missing_ok=True)
@@ -0,0 +1,143 @@
+# orders/idempotency.py
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = timedelta(hours=24)
+MAX_KEY_LENGTH = 100
+TRANSIENT_STATUSES = {429, 503}
+# una key en processing más vieja que esto es de un request que murió (Wompi tarda hasta 30 s)
+PROCESSING_TIMEOUT = timedelta(minutes=2)
+
+
+def _replay(record: IdempotencyKey) -> HttpResponse:
+    response = HttpResponse(
+        record.response_body,
+        status=record.status_code,
+        content_type=record.content_type or "application/json",
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _in_progress() -> JsonResponse:
+    response = JsonResponse({
+        "ok": False,
+        "error": "IDEMPOTENCY_IN_PROGRESS",
+        "detail": "Tu pedido se está procesando. Intentá de nuevo en unos segundos.",
+    }, status=409)
+    response["Retry-After"] = "1"
+    return response
+
+
+def _lookup(key: str, fingerprint: str):
+    """Respuesta para una key ya tomada (replay / 409 / 422), o None si está libre."""
+    record = IdempotencyKey.objects.filter(key=key).first()
+    if record is None:
+        return None
+
+    now = timezone.now()
+    if record.expires_at <= now:
+        record.delete()
+        return None
+
+    if record.request_hash != fingerprint:
+        return JsonResponse({
+            "ok": False,
+            "error": "IDEMPOTENCY_KEY_REUSED",
+            "detail": "La Idempotency-Key ya se usó con otro pedido.",
+        }, status=422)
+
+    if record.state == "processing":
+        if record.created_at > now - PROCESSING_TIMEOUT:
+            return _in_progress()
+        # el request que la tomó murió a mitad (worker reciclado / deploy): se libera
+        IdempotencyKey.objects.filter(pk=record.pk, state="processing").delete()
+        return None
+
+    return _replay(record)
+
+
+def _release(record: IdempotencyKey):
+    IdempotencyKey.objects.filter(pk=record.pk, state="processing").delete()
+
+
+def idempotent(view):
+    """
+    Soporte de header Idempotency-Key para POSTs (create_order).
+
+    - Sin header: el view corre normal.
+    - Key ya usada: devuelve la respuesta guardada sin volver a validar,
+      bloquear stock ni llamar a Wompi.
+    - La key se toma en su propia transacción corta (state=processing) y el view corre
+      FUERA de ella: maneja sus transacciones (orden + stock commitean antes de llamar a
+      Wompi). Al terminar se guarda la respuesta en un segundo UPDATE.
+    - Duplicado concurrente: 409 mientras la primera está en processing.
+    - 429/503 o excepción: la key se libera para poder reintentar con la misma.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return HttpResponseBadRequest("Idempotency-Key inválido")
+
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        stored = _lookup(key, fingerprint)
+        if stored is not None:
+            return stored
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key,
+                    state="processing",
+                    request_hash=fingerprint,
+                    expires_at=timezone.now() + IDEMPOTENCY_TTL,
+                )
+        except IntegrityError:
+            # otro request con la misma key la tomó primero
+            return _lookup(key, fingerprint) or _in_progress()
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            _release(record)
+            raise
+
+        if response.status_code in TRANSIENT_STATUSES:
+            _release(record)  # el cliente tiene que poder reintentar con la misma key
+            return response
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            state="done",
+            status_code=response.status_code,
+            response_body=response.content.decode("utf-8"),
+            content_type=response.get("Content-Type", ""),
+        )
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    """Borra keys vencidas en lotes chicos (no bloquea la tabla). Devuelve el total borrado."""
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects
+            .filter(expires_at__lte=timezone.now())
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
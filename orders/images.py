@@ -0,0 +1,124 @@
+# orders/images.py
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from .assets import asset_url, is_cloudinary, static_key
+
+# Anchos generados para thumbnails responsivos (px)
+RESPONSIVE_WIDTHS = (320, 640, 960)
+RESPONSIVE_FORMATS = ("avif", "webp")
+RESPONSIVE_DIR = "images/resp"
+
+# tamaños de la grilla del catálogo (1 / 2 / 3 columnas, ver .grid en main.css)
+CARD_SIZES = "(min-width:1024px) 33vw, (min-width:720px) 50vw, 100vw"
+
+APP_STATIC_ROOT = Path(__file__).resolve().parent / "static"
+MANIFEST_PATH = APP_STATIC_ROOT / RESPONSIVE_DIR / "manifest.json"
+
+_QUALITY = {"avif": 55, "webp": 78}
+
+_manifest_cache = {"mtime": None, "data": {}}
+
+
+def load_manifest() -> dict:
+    """
+    Manifest {ruta_static: {"hash", "widths", "files": {fmt: {w: ruta}}}} (cacheado por mtime).
+    "widths" son los anchos pedidos al generar; las claves de "files" son los anchos reales.
+    """
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime
+    except OSError:
+        return {}
+
+    if _manifest_cache["mtime"] != mtime:
+        with open(MANIFEST_PATH, encoding="utf-8") as fh:
+            _manifest_cache["data"] = json.load(fh)
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["data"]
+
+
+def cloudinary_variant(url: str, width: int, fmt: str = "auto") -> str:
+    """Inserta la transformación de Cloudinary (ancho + formato) en la URL."""
+    head, tail = url.split("/image/upload/", 1)
+    return f"{head}/image/upload/w_{width},c_limit,f_{fmt},q_auto/{tail}"
+
+
+def responsive_sources(img: str):
+    """
+    srcset por formato para una imagen de card, o None si no hay variantes.
+    Formato: {"avif": "url 320w, ...", "webp": "...", "sizes": CARD_SIZES}
+    """
+    if not img:
+        return None
+
+    if is_cloudinary(img):
+        srcset = ", ".join(f"{cloudinary_variant(img, w)} {w}w" for w in RESPONSIVE_WIDTHS)
+        return {"auto": srcset, "sizes": CARD_SIZES}
+
+    entry = load_manifest().get(static_key(img))
+    if not entry:
+        return None
+
+    out = {"sizes": CARD_SIZES}
+    for fmt, files in entry["files"].items():
+        out[fmt] = ", ".join(
+            f"{asset_url(path)} {w}w"
+            for w, path in sorted(files.items(), key=lambda kv: int(kv[0]))
+        )
+    return out
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def render_variants(src_path: str, key: str, source_hash: str, out_root: str, widths, formats) -> dict:
+    """
+    Genera las variantes de una imagen (pensado para correr en un proceso aparte).
+    Los nombres llevan el hash del contenido original: images/resp/<nombre>.<hash>.<w>.<fmt>
+    No agranda: los anchos mayores que el original quedan en una sola variante a su ancho
+    real, y ese ancho es el del nombre, la clave del manifest y el descriptor del srcset.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+
+    stem = Path(key).with_suffix("").as_posix().replace("/", "-")
+    short = source_hash[:10]
+    files = {}
+
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGB")
+
+        for width in sorted({min(int(w), im.width) for w in widths}):
+            height = round(im.height * width / im.width)
+            resized = im.resize((width, height), Image.LANCZOS) if width != im.width else im
+
+            for fmt in formats:
+                rel = f"{RESPONSIVE_DIR}/{stem}.{short}.{width}.{fmt}"
+                dest = Path(out_root) / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                resized.save(dest, format=fmt.upper(), quality=_QUALITY.get(fmt, 75))
+                files.setdefault(fmt, {})[str(width)] = rel
+
+    return {"hash": source_hash, "widths": [int(w) for w in widths], "files": files}
+
+
+def write_manifest(data: dict):
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
@@ -0,0 +1,175 @@
+# orders/inventory.py
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import CATALOG, app_cache, invalidate_on_commit
+from .models import LowStockAlert, StockMovement, Variant
+
+logger = logging.getLogger(__name__)
+
+# Cache corto de disponibilidad por SKU (lo invalida cualquier cambio de stock)
+STOCK_CACHE_PREFIX = "stock:"
+STOCK_CACHE_TTL = 15  # segundos
+
+
+def get_availability(skus) -> dict:
+    """
+    {sku: cantidad disponible} para una lista de SKUs.
+    Lo cacheado sale de cache.get_many; lo que falta, de UNA query por índice único (sku).
+    SKUs inexistentes o inactivos -> 0.
+    """
+    keys = {f"{STOCK_CACHE_PREFIX}{sku}": sku for sku in skus}
+    if not keys:
+        return {}
+
+    cached = cache.get_many(list(keys))
+    result = {keys[k]: v for k, v in cached.items()}
+
+    missing = [sku for k, sku in keys.items() if k not in cached]
+    if missing:
+        rows = dict(
+            Variant.objects
+            .filter(sku__in=missing, active=True)
+            .values_list("sku", "inventory")
+        )
+        fresh = {sku: max(rows.get(sku, 0), 0) for sku in missing}
+        cache.set_many({f"{STOCK_CACHE_PREFIX}{sku}": qty for sku, qty in fresh.items()}, STOCK_CACHE_TTL)
+        result.update(fresh)
+
+    return result
+
+
+def invalidate_availability(skus):
+    keys = [f"{STOCK_CACHE_PREFIX}{sku}" for sku in skus]
+    if keys:
+        cache.delete_many(keys)
+
+
+def apply_stock_changes(changes, reason: str, order=None, actor: str = "", note: str = ""):
+    """
+    Aplica deltas de stock y los registra en el ledger.
+
+    changes: iterable de (variant, delta). Los variants deben venir bloqueados
+    (select_for_update) por quien llama, dentro de transaction.atomic().
+
+    Las alertas de low stock se disparan solo al cruzar el umbral
+    (ok -> low), no cada vez que se consulta el inventario.
+    """
+    movements = []
+    new_alerts = []
+    recovered_ids = []
+    sold_out_changed = False  # algo se agotó o volvió: cambia qué cards muestra el catálogo
+
+    for variant, delta in changes:
+        delta = int(delta)
+        if delta == 0:
+            continue
+
+        was_low = variant.low_stock
+        was_available = variant.inventory > 0
+        variant.inventory += delta
+        sold_out_changed |= was_available != (variant.inventory > 0)
+        variant.save(update_fields=["inventory", "updated_at"])  # save() mantiene low_stock
+
+        movements.append(StockMovement(
+            variant=variant,
+            sku=variant.sku,
+            delta=delta,
+            inventory_after=variant.inventory,
+            reason=reason,
+            order=order,
+            order_number=order.order_number if order else "",
+            actor=actor,
+            note=note[:255],
+        ))
+
+        if variant.low_stock and not was_low:
+            new_alerts.append(_alert(variant))
+        elif was_low and not variant.low_stock:
+            recovered_ids.append(variant.pk)
+
+    if movements:
+        StockMovement.objects.bulk_create(movements)
+        skus = [m.sku for m in movements]
+        transaction.on_commit(lambda: invalidate_availability(skus))
+    if sold_out_changed:
+        invalidate_on_commit(CATALOG)
+    _open_alerts(new_alerts)
+    _resolve_alerts(recovered_ids)
+
+    return movements
+
+
+def _alert(variant):
+    return LowStockAlert(
+        variant=variant,
+        sku=variant.sku,
+        inventory=variant.inventory,
+        threshold=variant.low_stock_threshold,
+    )
+
+
+def _open_alerts(alerts):
+    if alerts:
+        LowStockAlert.objects.bulk_create(alerts)
+        for a in alerts:
+            logger.warning("⚠️ Low stock %s: %s (umbral %s)", a.sku, a.inventory, a.threshold)
+
+
+def _resolve_alerts(variant_ids):
+    if variant_ids:
+        LowStockAlert.objects.filter(
+            variant_id__in=variant_ids,
+            resolved_at__isnull=True,
+        ).update(resolved_at=timezone.now())
+
+
+def sync_low_stock_alert(variant, was_low: bool):
+    """
+    Para cuando cambia el umbral (admin) y no el stock: si low_stock se dio vuelta,
+    abre o resuelve la alerta igual que apply_stock_changes. No va al ledger (delta 0).
+    variant ya guardado (save() recalculó low_stock).
+    """
+    if variant.low_stock and not was_low:
+        _open_alerts([_alert(variant)])
+    elif was_low and not variant.low_stock:
+        _resolve_alerts([variant.pk])
+
+
+def set_stock(variant, new_inventory: int, reason: str = "manual", actor: str = "", note: str = ""):
+    """Fija el inventario a un valor absoluto (registra el delta en el ledger)."""
+    return apply_stock_changes(
+        [(variant, int(new_inventory) - variant.inventory)],
+        reason,
+        actor=actor,
+        note=note,
+    )
+
+
+def record_initial_stock(variants, reason: str = "import", note: str = ""):
+    """
+    Registra el stock inicial de variants recién creados (seed / imports).
+    El inventario ya está guardado; solo se agrega la entrada al ledger.
+    """
+    movements = [
+        StockMovement(
+            variant=v,
+            sku=v.sku,
+            delta=v.inventory,
+            inventory_after=v.inventory,
+            reason=reason,
+            note=note[:255],
+        )
+        for v in variants
+        if v.inventory
+    ]
+    if movements:
+        StockMovement.objects.bulk_create(movements)
+    invalidate_availability([v.sku for v in variants])
+    app_cache.invalidate_tags(CATALOG)
+
+    _open_alerts([_alert(v) for v in variants if v.low_stock])
+    return movements
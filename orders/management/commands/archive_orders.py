@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.archive import archivable, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Mueve órdenes entregadas/canceladas viejas (con sus items) al archivo, en lotes (correr por cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ORDER_ARCHIVE_DAYS)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta lo que se movería")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if options["dry_run"]:
+            n = archivable(days).count()
+            self.stdout.write(f"Se archivarían {n} órdenes (> {days} días)")
+            return
+
+        moved = archive_orders(days, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Órdenes archivadas: {moved}"))
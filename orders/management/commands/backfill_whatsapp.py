@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from orders.models import Order, OrderItem
+from orders.whatsapp import refresh_whatsapp
+
+
+class Command(BaseCommand):
+    help = "Genera whatsapp_message / whatsapp_url de las órdenes de antes del cache (0015). Correr una vez."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        items = Prefetch("items", queryset=OrderItem.objects.select_related("variant").order_by("id"))
+        done, last_id = 0, 0
+        while True:
+            batch = list(
+                Order.objects.filter(whatsapp_url="", id__gt=last_id)
+                .order_by("id")
+                .prefetch_related(items)[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            for order in batch:
+                fields = refresh_whatsapp(order, order.items.all())
+            Order.objects.bulk_update(batch, fields)
+            done += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Mensajes de WhatsApp generados: {done}"))
@@ -0,0 +1,138 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+CHECKOUT_BODY = {
+    "full_name": "Bench",
+    "phone": "7000-0000",
+    "address_line1": "San Salvador",
+    "payment_method": "card",
+    "items": [{"sku": "BAS-CC-ML-NGR-M", "qty": 1}],
+}
+
+
+def _memory_mb(pid: int) -> float:
+    """
+    Memoria del master de gunicorn + workers, en MB. PSS (la memoria compartida se reparte
+    entre los procesos que la usan), así se ve lo que ahorra el preload; sin smaps, RSS.
+    """
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        return 0.0
+    total = 0
+    for p in pids:
+        for path, field in ((f"/proc/{p}/smaps_rollup", "Pss:"), (f"/proc/{p}/status", "VmRSS:")):
+            try:
+                with open(path) as f:
+                    kb = next((int(line.split()[1]) for line in f if line.startswith(field)), None)
+            except OSError:
+                continue
+            if kb is not None:
+                total += kb
+                break
+    return total / 1024
+
+
+def _pct(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark HTTP simple (RPS, latencias, memoria) contra un servidor ya levantado. "
+        "Ver la tabla de resultados en config/gunicorn.conf.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Ej. http://127.0.0.1:8000/api/catalog/")
+        parser.add_argument("--concurrency", "-c", type=int, default=16)
+        parser.add_argument("--duration", "-d", type=float, default=15.0, help="Segundos")
+        parser.add_argument("--checkout", action="store_true", help="POST de una orden de tarjeta (con wompi_simulator y RATE_LIMIT_ENABLED=0)")
+        parser.add_argument("--pid", type=int, default=0, help="PID del master de gunicorn para medir memoria")
+        parser.add_argument("--json", action="store_true", help="Salida en JSON (para comparar configuraciones)")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http":
+            raise CommandError("Solo http:// (el benchmark es contra el servidor local)")
+        path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        body = json.dumps(CHECKOUT_BODY).encode() if options["checkout"] else None
+        method = "POST" if body else "GET"
+        headers = {"Content-Type": "application/json"} if body else {}
+
+        deadline = time.monotonic() + options["duration"]
+        latencies, statuses, lock = [], {}, threading.Lock()
+        peak_mem = [0.0]
+
+        def client():
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            mine, codes = [], {}
+            while time.monotonic() < deadline:
+                t0 = time.monotonic()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    r = conn.getresponse()
+                    r.read()
+                    code = r.status
+                    if r.getheader("Connection", "").lower() == "close":
+                        conn.close()
+                except (OSError, http.client.HTTPException):
+                    code = "error"
+                    conn.close()
+                    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                mine.append(time.monotonic() - t0)
+                codes[code] = codes.get(code, 0) + 1
+            conn.close()
+            with lock:
+                latencies.extend(mine)
+                for k, v in codes.items():
+                    statuses[k] = statuses.get(k, 0) + v
+
+        def sample_memory():
+            while time.monotonic() < deadline:
+                peak_mem[0] = max(peak_mem[0], _memory_mb(options["pid"]))
+                time.sleep(0.5)
+
+        threads = [threading.Thread(target=client) for _ in range(options["concurrency"])]
+        if options["pid"]:
+            threads.append(threading.Thread(target=sample_memory))
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        ok = sum(v for k, v in statuses.items() if isinstance(k, int) and k < 400)
+        result = {
+            "url": options["url"],
+            "method": method,
+            "concurrency": options["concurrency"],
+            "requests": len(latencies),
+            "ok": ok,
+            "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+            "rps": round(ok / elapsed, 1),
+            "p50_ms": round(_pct(latencies, 50) * 1000, 1),
+            "p95_ms": round(_pct(latencies, 95) * 1000, 1),
+            "p99_ms": round(_pct(latencies, 99) * 1000, 1),
+            "mem_mb": round(peak_mem[0], 1),
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(
+            f"{method} {options['url']} · c={result['concurrency']} · {result['requests']} req ({result['statuses']})\n"
+            f"  RPS {result['rps']} · p50 {result['p50_ms']} ms · p95 {result['p95_ms']} ms · p99 {result['p99_ms']} ms"
+            + (f" · mem {result['mem_mb']} MB" if options["pid"] else "")
+        )
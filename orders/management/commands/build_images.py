@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from orders.images import (
+    APP_STATIC_ROOT,
+    RESPONSIVE_DIR,
+    RESPONSIVE_FORMATS,
+    RESPONSIVE_WIDTHS,
+    file_hash,
+    load_manifest,
+    render_variants,
+    write_manifest,
+)
+
+SOURCE_EXTS = {".webp", ".jpg", ".jpeg", ".png", ".heic", ".avif"}
+
+
+class Command(BaseCommand):
+    help = "Genera variantes responsivas (AVIF/WebP por ancho) de las imágenes del catálogo + manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", action="append", dest="dirs",
+                            help="Carpeta dentro de static a procesar (default: images/catalogo). Repetible.")
+        parser.add_argument("--workers", type=int, default=0, help="Procesos (default: CPUs)")
+        parser.add_argument("--force", action="store_true", help="Regenerar aunque no hayan cambiado")
+
+    def handle(self, *args, **options):
+        from PIL import features
+
+        formats = [f for f in RESPONSIVE_FORMATS if features.check(f)]
+        if not formats:
+            self.stderr.write("Pillow no soporta AVIF ni WebP en este entorno.")
+            return
+        if len(formats) < len(RESPONSIVE_FORMATS):
+            self.stdout.write(f"ℹ️ Formatos disponibles: {', '.join(formats)}")
+
+        dirs = options["dirs"] or ["images/catalogo"]
+        manifest = dict(load_manifest())
+
+        sources = {}
+        for d in dirs:
+            for path in sorted((APP_STATIC_ROOT / d).rglob("*")):
+                if path.suffix.lower() in SOURCE_EXTS and RESPONSIVE_DIR not in path.as_posix():
+                    sources[path.relative_to(APP_STATIC_ROOT).as_posix()] = path
+
+        # ---- detectar cambios por hash de contenido ----
+        todo = []
+        for key, path in sources.items():
+            h = file_hash(path)
+            entry = manifest.get(key)
+            up_to_date = (
+                entry
+                and entry.get("hash") == h
+                and entry.get("widths") == list(RESPONSIVE_WIDTHS)  # las claves de "files" son anchos reales
+                and all(entry["files"].get(fmt) for fmt in formats)
+                and all((APP_STATIC_ROOT / p).exists() for f in entry["files"].values() for p in f.values())
+            )
+            if options["force"] or not up_to_date:
+                todo.append((key, path, h))
+
+        skipped = len(sources) - len(todo)
+        workers = options["workers"] or os.cpu_count() or 1
+
+        done = 0
+        if todo:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = {
+                    pool.submit(render_variants, str(path), key, h, str(APP_STATIC_ROOT),
+                                RESPONSIVE_WIDTHS, formats): key
+                    for key, path, h in todo
+                }
+                for fut in as_completed(futures):
+                    key = futures[fut]
+                    try:
+                        new_entry = fut.result()
+                    except Exception as e:
+                        self.stderr.write(f"❌ {key}: {e}")
+                        continue
+
+                    self._remove_stale(manifest.get(key), new_entry)
+                    manifest[key] = new_entry
+                    done += 1
+
+        # imágenes borradas del origen
+        for key in [k for k in manifest if k not in sources and any(k.startswith(d) for d in dirs)]:
+            self._remove_stale(manifest.pop(key), None)
+
+        write_manifest(manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imágenes OK. Generadas: {done}, sin cambios: {skipped}, workers: {workers}"
+        ))
+
+    def _remove_stale(self, old_entry, new_entry):
+        if not old_entry:
+            return
+        keep = set()
+        if new_entry:
+            keep = {p for f in new_entry["files"].values() for p in f.values()}
+        for f in old_entry["files"].values():
+            for p in f.values():
+                if p not in keep:
+                    (APP_STATIC_ROOT / p).unlink(missing_ok=True)
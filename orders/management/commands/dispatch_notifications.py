@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.notifications import dispatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los avisos al cliente del outbox (WhatsApp / email / webhook) con reintentos. "
+        "Proceso aparte (Procfile: worker); con --once, un solo lote para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Vaciar lo pendiente una vez y salir")
+        parser.add_argument("--batch", type=int, default=settings.NOTIFY_BATCH)
+        parser.add_argument("--poll", type=float, default=settings.NOTIFY_POLL_SECONDS, help="Segundos entre lotes si no hay nada")
+
+    def handle(self, *args, **options):
+        total = {"sent": 0, "retry": 0, "failed": 0}
+        try:
+            while True:
+                close_old_connections()
+                report = dispatch(options["batch"])
+                for k in total:
+                    total[k] += report[k]
+                if report["claimed"]:
+                    self.stdout.write(
+                        f"📣 lote {report['claimed']}: enviados {report['sent']} · reintento {report['retry']} · fallidos {report['failed']}"
+                    )
+                    continue  # hay cola: el siguiente lote sin esperar
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_old_connections()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ enviados {total['sent']} · reintento {total['retry']} · fallidos {total['failed']}"
+        ))
@@ -0,0 +1,57 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.startup import profile
+
+
+def _ms(us: int) -> str:
+    return f"{us / 1000:8.1f}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Tiempo de import en frío de la app WSGI (python -X importtime en un proceso nuevo), "
+        "por módulo y por paquete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--urls", action="store_true", help="Importar también el URLconf (lo que hace gunicorn con preload)")
+        parser.add_argument("--runs", type=int, default=3, help="Arranques a medir; por módulo se toma el mínimo")
+        parser.add_argument("--top", type=int, default=25)
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **options):
+        report = profile(
+            urls=options["urls"],
+            runs=options["runs"],
+            top=options["top"],
+            settings_module=settings.SETTINGS_MODULE,
+        )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report))
+            return
+
+        budget = settings.STARTUP_IMPORT_BUDGET_MS
+        style = self.style.SUCCESS if report["import_ms"] <= budget else self.style.ERROR
+        self.stdout.write(style(
+            f"import {'WSGI + urls' if options['urls'] else 'WSGI'}: {report['import_ms']} ms "
+            f"(presupuesto {budget} ms) · proceso completo {report['wall_ms']} ms · "
+            f"{report['modules']} módulos · mejor de {report['runs']}"
+        ))
+        if report["heavy_loaded"]:
+            self.stdout.write(self.style.WARNING(f"⚠️ pesados cargados al arrancar: {', '.join(report['heavy_loaded'])}"))
+
+        self.stdout.write("\nacumulado (ms)  self (ms)  módulo")
+        for row in report["top_cumulative"]:
+            self.stdout.write(f"{_ms(row['cumulative_us'])}       {_ms(row['self_us'])}   {'  ' * row['depth']}{row['module']}")
+
+        self.stdout.write("\nself (ms)  módulo")
+        for row in report["top_self"]:
+            self.stdout.write(f"{_ms(row['self_us'])}   {row['module']}")
+
+        self.stdout.write("\nself (ms)  módulos  paquete")
+        for pkg in report["packages"]:
+            self.stdout.write(f"{_ms(pkg['self_us'])}   {pkg['modules']:7d}  {pkg['package']}")
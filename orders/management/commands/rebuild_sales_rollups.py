@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalcula los rollups de ventas desde las órdenes (cron nocturno: --days 7; sin args: todo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=0, help="Solo los últimos N días (0 = todo el historial)")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"]:
+            since = timezone.localdate() - timedelta(days=options["days"])
+
+        days, items = rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rollups: {days} filas por día, {items} filas por SKU"))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.reconcile import RECONCILE_BATCH, reconcile
+
+
+class Command(BaseCommand):
+    help = "Concilia órdenes de tarjeta abiertas contra Wompi (webhooks perdidos). Correr por cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Solo órdenes de los últimos N días")
+        parser.add_argument("--min-age", type=int, default=settings.WOMPI_RECONCILE_MIN_AGE_MINUTES,
+                            help="Minutos de gracia para el webhook")
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH)
+        parser.add_argument("--workers", type=int, default=settings.WOMPI_RECONCILE_WORKERS)
+        parser.add_argument("--dry-run", action="store_true", help="Consulta pero no cambia estados")
+
+    def handle(self, *args, **options):
+        report = reconcile(
+            min_age_minutes=options["min_age"],
+            days=options["days"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            dry_run=options["dry_run"],
+        )
+
+        verb = "Se marcarían pagadas" if options["dry_run"] else "Marcadas pagadas"
+        self.stdout.write(f"Consultadas: {report['checked']} · sin pago aprobado: {report['open']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {verb}: {len(report['paid'])}"))
+        for number in report["paid"]:
+            self.stdout.write(f"  {number}")
+
+        for number, reason in report["discrepancies"]:
+            self.stdout.write(self.style.WARNING(f"⚠️ {number}: {reason}"))
+        for number, error in report["errors"]:
+            self.stdout.write(self.style.ERROR(f"💥 {number}: {error}"))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.redis_stub import RedisStub
+
+
+class Command(BaseCommand):
+    help = "Levanta un Redis en memoria (protocolo RESP) para correr offline con cache compartido entre workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=6390)
+
+    def handle(self, *args, **options):
+        stub = RedisStub(host=options["host"], port=options["port"]).start()
+        self.stdout.write(self.style.SUCCESS(f"✅ Redis en memoria en {stub.url}"))
+        self.stdout.write(f"Apuntar el backend con:  REDIS_URL={stub.url}")
+        self.stdout.write("Ctrl+C para parar.")
+        try:
+            while True:
+                time.sleep(10)
+                self.stdout.write(f"keys {len(stub.data)} · comandos {stub.commands}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.bulk import claim_job, recover_stale, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre las acciones masivas del dashboard (estado / tracking / PDFs) en cola. "
+        "Proceso aparte (Procfile: jobs), no threads dentro de gunicorn; con --once, lo que haya y salir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Correr lo que haya en cola y salir")
+        parser.add_argument("--poll", type=float, default=settings.BULK_POLL_SECONDS, help="Segundos entre vueltas si no hay nada")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        try:
+            while True:
+                close_old_connections()
+                recover_stale()
+                job = claim_job()
+                if job:
+                    self.stdout.write(f"🔁 BulkJob #{job.pk} {job.kind} ({job.total}) intento {job.attempts}")
+                    if run_job(job):
+                        done += 1
+                    else:
+                        failed += 1
+                    continue  # puede haber más en cola
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_old_connections()
+        self.stdout.write(self.style.SUCCESS(f"✅ jobs listos {done} · fallidos {failed}"))
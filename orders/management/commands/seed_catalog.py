@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from orders.inventory import record_initial_stock
 from orders.models import Product, Variant
 
 SIZES = ["S", "M", "L", "XL", "XXL"]
@@ -34,6 +35,7 @@ class Command(BaseCommand):
 
         created = 0
         updated = 0
+        created_variants = []
 
         for card in cards:
             for size in SIZES:
@@ -57,6 +59,7 @@ class Command(BaseCommand):
 
                 if was_created:
                     created += 1
+                    created_variants.append(v)
                 else:
                     # opcional: actualizar datos si cambiaron (sin tocar inventory)
                     changed = False
@@ -69,4 +72,6 @@ class Command(BaseCommand):
                         v.save()
                         updated += 1
 
+        record_initial_stock(created_variants, reason="import", note="seed_catalog")
+
         self.stdout.write(self.style.SUCCESS(f"✅ Seed OK. Created: {created}, Updated: {updated}"))
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.wompi_sim import SimConfig, WompiSimulator
+
+
+def _latency(value: str) -> tuple:
+    lo, _, hi = value.partition(":")
+    return int(lo), int(hi or lo)
+
+
+class Command(BaseCommand):
+    help = "Levanta un Wompi SV falso (token, EnlacePago, Aplicativo + webhooks firmados) para carga e integración."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--secret", default="", help="Client secret para firmar (default: WOMPI_CLIENT_SECRET)")
+        parser.add_argument("--latency-ms", type=_latency, default=(0, 0), help="Latencia por request: 80 o 50:300")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de requests que fallan (500/503)")
+        parser.add_argument("--rps", type=float, default=0.0, help="Throttling global en req/s (0 = sin límite)")
+        parser.add_argument("--webhook-url", default="", help="Manda los webhooks acá en vez del urlWebhook del enlace")
+        parser.add_argument("--webhook-rate", type=float, default=5.0, help="Webhooks por segundo")
+        parser.add_argument("--auto-pay", type=float, default=0.0, help="Fracción de enlaces que se pagan solos")
+        parser.add_argument("--pay-delay", type=float, default=2.0, help="Segundos hasta el pago automático")
+        parser.add_argument("--bad-signature-rate", type=float, default=0.0, help="Fracción de webhooks con hash inválido")
+        parser.add_argument("--hash-header", default="wompi_hash",
+                            help="Header de la firma. Contra runserver usar Wompi-Hash (descarta headers con _)")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        secret = options["secret"] or settings.WOMPI_CLIENT_SECRET
+        if not secret:
+            raise CommandError("Falta el secret: --secret o WOMPI_CLIENT_SECRET (el backend tiene que usar el mismo)")
+
+        config = SimConfig(
+            secret=secret,
+            latency_ms=options["latency_ms"],
+            error_rate=options["error_rate"],
+            rps=options["rps"],
+            webhook_url=options["webhook_url"],
+            webhook_rate=options["webhook_rate"],
+            auto_pay=options["auto_pay"],
+            pay_delay=options["pay_delay"],
+            bad_signature_rate=options["bad_signature_rate"],
+            hash_header=options["hash_header"],
+            seed=options["seed"],
+        )
+        sim = WompiSimulator(config, host=options["host"], port=options["port"]).start()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Wompi simulado en {sim.url}"))
+        self.stdout.write("Apuntar el backend con:")
+        self.stdout.write(f"  WOMPI_API_BASE={sim.url}")
+        self.stdout.write(f"  WOMPI_TOKEN_URL={sim.url}/connect/token")
+        self.stdout.write("  WOMPI_CLIENT_SECRET=<el mismo secret>")
+        self.stdout.write("Ctrl+C para parar.")
+
+        try:
+            while True:
+                time.sleep(10)
+                self.stdout.write(self._summary(sim))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sim.stop()
+            self.stdout.write(self._summary(sim))
+
+    def _summary(self, sim) -> str:
+        s = sim.stats
+        return (
+            f"req {s['requests']} · 429 {s['throttled']} · err {s['errors']} · enlaces {s['links']} · "
+            f"pagos {s['payments']} · webhooks ok {s['webhooks_sent']} / fallidos {s['webhooks_failed']} "
+            f"/ hash malo {s['webhooks_bad_signature']} · en cola {sim.pending_webhooks()}"
+        )
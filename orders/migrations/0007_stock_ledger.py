@@ -0,0 +1,77 @@
+# Generated by Django 5.1 on 2026-10-19 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_low_stock(apps, schema_editor):
+    Variant = apps.get_model("orders", "Variant")
+    Variant.objects.filter(inventory__lte=models.F("low_stock_threshold")).update(low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_remove_product_variant_orderitem_variant_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=60)),
+                ('inventory', models.IntegerField()),
+                ('threshold', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=60)),
+                ('delta', models.IntegerField()),
+                ('inventory_after', models.IntegerField()),
+                ('reason', models.CharField(choices=[('checkout', 'Checkout'), ('manual', 'Ajuste manual'), ('import', 'Carga / import'), ('cancel', 'Liberado por cancelación')], max_length=20)),
+                ('order_number', models.CharField(blank=True, default='', max_length=20)),
+                ('actor', models.CharField(blank=True, default='', max_length=150)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(condition=models.Q(('low_stock', True)), fields=['low_stock'], name='variant_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='orders.variant'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='variant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='orders.variant'),
+        ),
+        migrations.AddIndex(
+            model_name='lowstockalert',
+            index=models.Index(condition=models.Q(('resolved_at__isnull', True)), fields=['variant'], name='lowstock_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['variant', '-created_at'], name='stockmove_variant_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1 on 2026-10-19 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('order_number', models.CharField(max_length=20, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('payment_link_created', 'Link de pago creado'), ('paid', 'Pagada'), ('processing', 'En proceso'), ('shipped', 'Enviada'), ('delivered', 'Entregada'), ('cancelled', 'Cancelada')], default='pending', max_length=30)),
+                ('country', models.CharField(default='El Salvador', max_length=50)),
+                ('full_name', models.CharField(max_length=120)),
+                ('phone', models.CharField(max_length=30)),
+                ('address_line1', models.CharField(max_length=180)),
+                ('address_line2', models.CharField(blank=True, default='', max_length=180)),
+                ('department', models.CharField(blank=True, default='', max_length=80)),
+                ('city', models.CharField(blank=True, default='', max_length=80)),
+                ('notes', models.TextField(blank=True, default='')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('shipping', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_method', models.CharField(choices=[('card', 'Tarjeta'), ('transfer', 'Transferencia')], default='card', max_length=20)),
+                ('payment_link', models.URLField(blank=True, default='')),
+                ('tracking_code', models.CharField(blank=True, default='', max_length=80)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('title', models.CharField(max_length=120)),
+                ('sleeve', models.CharField(max_length=50)),
+                ('color', models.CharField(max_length=50)),
+                ('size', models.CharField(max_length=10)),
+                ('fabric', models.CharField(default='Manta hindú', max_length=50)),
+                ('img', models.CharField(blank=True, default='', max_length=255)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('qty', models.PositiveIntegerField(default=1)),
+                ('line_total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_items', to='orders.variant')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_bulk_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bulkjob',
+            name='kind',
+            field=models.CharField(choices=[('status', 'Cambio de estado'), ('tracking', 'Tracking (CSV)'), ('documents', 'Documentos PDF')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_bulk_job_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='whatsapp_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='whatsapp_url',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
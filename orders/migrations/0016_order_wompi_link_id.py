@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_order_whatsapp_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='wompi_link_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='wompi_link_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='state',
+            field=models.CharField(choices=[('processing', 'Procesando'), ('done', 'Lista')], default='done', max_length=10),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-19 19:21
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+REVENUE_STATUSES = ("paid", "processing", "shipped", "delivered")  # = rollups.REVENUE_STATUSES
+
+
+def backfill_discount(apps, schema_editor):
+    SalesDay = apps.get_model("orders", "SalesDay")
+    totals = {}
+    for name in ("Order", "ArchivedOrder"):
+        rows = (
+            apps.get_model("orders", name).objects
+            .filter(status__in=REVENUE_STATUSES, discount__gt=0)
+            .annotate(day=TruncDate("created_at"))
+            .values("day", "department", "payment_method")
+            .annotate(disc=Sum("discount"))
+        )
+        for row in rows:
+            key = (row["day"], row["department"], row["payment_method"])
+            totals[key] = totals.get(key, 0) + row["disc"]
+    for (day, department, payment_method), discount in totals.items():
+        SalesDay.objects.filter(day=day, department=department, payment_method=payment_method).update(discount=discount)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0020_bulkjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesday',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_discount, migrations.RunPython.noop),
+    ]
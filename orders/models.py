@@ -1,6 +1,7 @@
 from django.db import models
 
-class Order(models.Model):
+class OrderBase(models.Model):
+    """Campos comunes de Order y ArchivedOrder (el archivo es una copia 1:1)."""
     STATUS_CHOICES = [
         ("pending", "Pendiente"),
         ("payment_link_created", "Link de pago creado"),
@@ -28,22 +29,49 @@ class Order(models.Model):
 
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     shipping = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # descuentos por cantidad (orders/pricing.py)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
     payment_method = models.CharField(max_length=20, default="card", choices=PAYMENT_CHOICES)
     payment_link = models.URLField(blank=True, default="")
+    wompi_link_id = models.CharField(max_length=64, blank=True, default="")  # idEnlace (para conciliar)
 
     tracking_code = models.CharField(max_length=80, blank=True, default="")  # opcional
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)  # 👈 nuevo
+
+    class Meta:
+        abstract = True
 
     def __str__(self):
         return self.order_number
 
+    @property
+    def whatsapp_customer_url(self):
+        """Reenviar el mismo mensaje al cliente (sin queries: usa el mensaje guardado)."""
+        from .whatsapp import customer_number, wa_link
+
+        message = getattr(self, "whatsapp_message", "")
+        if not message or not customer_number(self.phone):
+            return ""
+        return wa_link(customer_number(self.phone), message)
+
+
+class Order(OrderBase):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # 👈 nuevo
+
+    # mensaje + deep link ya renderizados (orders/whatsapp.py); se regeneran solo si cambian items/totales/link
+    whatsapp_message = models.TextField(blank=True, default="")
+    whatsapp_url = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            # dashboard: listado por fecha, con o sin filtro de estado
+            models.Index(fields=["status", "-created_at"], name="order_status_created_idx"),
+            models.Index(fields=["-created_at"], name="order_created_idx"),
+        ]
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
 
+class OrderItemBase(models.Model):
     title = models.CharField(max_length=120)
     sleeve = models.CharField(max_length=50)
     color = models.CharField(max_length=50)
@@ -54,15 +82,42 @@ class OrderItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     qty = models.PositiveIntegerField(default=1)
     line_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    variant = models.ForeignKey("Variant", null=True, blank=True, on_delete=models.SET_NULL, related_name="order_items")
 
+    class Meta:
+        abstract = True
 
     def save(self, *args, **kwargs):
         self.line_total = (self.unit_price or 0) * self.qty
         super().save(*args, **kwargs)
 
+
+class OrderItem(OrderItemBase):
+    order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
+    variant = models.ForeignKey("Variant", null=True, blank=True, on_delete=models.SET_NULL, related_name="order_items")
+
+
+# =========================
+# Archivo de órdenes (delivered/cancelled viejas)
+# =========================
+class ArchivedOrder(OrderBase):
+    """
+    Órdenes cerradas que movió `archive_orders`. Mismo id y número que tenían
+    en Order; created_at/updated_at se copian tal cual (sin auto_now).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedOrderItem(OrderItemBase):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name="items", on_delete=models.CASCADE)
+    variant = models.ForeignKey("Variant", null=True, blank=True, on_delete=models.SET_NULL, related_name="archived_order_items")
+
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 
 class Product(models.Model):
     title = models.CharField(max_length=120)
@@ -81,13 +136,23 @@ class Product(models.Model):
             self.slug = s
         super().save(*args, **kwargs)
 
+        from .cache import CATALOG, invalidate_on_commit
+
+        invalidate_on_commit(CATALOG)  # título en las cards
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["title"], name="product_title_idx"),  # orden del inventario
+        ]
+
     def __str__(self):
         return self.title
 
 
 
 class Variant(models.Model):
-    product = models.ForeignKey(Product, related_name="variants", on_delete=models.CASCADE)
+    # sin índice propio: variant_sort_idx (product, sleeve, color, size) ya lo cubre
+    product = models.ForeignKey(Product, related_name="variants", on_delete=models.CASCADE, db_index=False)
 
     sku = models.CharField(max_length=60, unique=True)
     sleeve = models.CharField(max_length=50)
@@ -106,9 +171,277 @@ class Variant(models.Model):
     compare_at = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
 
+    # flag mantenido en save() para que el filtro "low stock" use índice
+    low_stock = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["low_stock"],
+                name="variant_low_stock_idx",
+                condition=models.Q(low_stock=True),
+            ),
+            # catálogo: solo variants vendibles (índice parcial, queda chico)
+            models.Index(
+                fields=["product", "sleeve", "color"],
+                name="variant_in_stock_idx",
+                condition=models.Q(active=True, inventory__gt=0),
+            ),
+            # inventario del dashboard: product__title, sleeve, color, size
+            models.Index(fields=["product", "sleeve", "color", "size"], name="variant_sort_idx"),
+        ]
+
+    STOCK_FIELDS = {"inventory", "low_stock", "low_stock_threshold", "updated_at"}
+
     @property
     def is_low_stock(self):
         return self.inventory <= self.low_stock_threshold
 
+    def save(self, *args, **kwargs):
+        self.low_stock = self.is_low_stock
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & {"inventory", "low_stock_threshold"}:
+                update_fields.add("low_stock")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+        from .cache import CATALOG, invalidate_on_commit
+        from .pricing import PRICE_FIELDS, invalidate_on_commit as invalidate_prices
+
+        if update_fields is None or update_fields & PRICE_FIELDS:
+            invalidate_prices()  # la lista de precios en memoria se recarga (inventario solo no la toca)
+        if update_fields is None or update_fields - self.STOCK_FIELDS:
+            invalidate_on_commit(CATALOG)  # stock: el catálogo se invalida solo al agotarse / volver (inventory.py)
+
+    def delete(self, *args, **kwargs):
+        from .cache import CATALOG, invalidate_on_commit
+        from .pricing import invalidate_on_commit as invalidate_prices
+
+        invalidate_prices()
+        invalidate_on_commit(CATALOG)
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product.title} · {self.sleeve}/{self.color}/{self.size} ({self.sku})"
+
+
+class StockMovement(models.Model):
+    """
+    Ledger append-only de cambios de stock.
+    Cada fila guarda el delta aplicado y el inventario resultante.
+    """
+    REASON_CHOICES = [
+        ("checkout", "Checkout"),
+        ("manual", "Ajuste manual"),
+        ("import", "Carga / import"),
+        ("cancel", "Liberado por cancelación"),
+    ]
+
+    variant = models.ForeignKey(Variant, null=True, on_delete=models.SET_NULL, related_name="movements")
+    sku = models.CharField(max_length=60)  # se conserva aunque se borre el variant
+    delta = models.IntegerField()
+    inventory_after = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name="stock_movements")
+    order_number = models.CharField(max_length=20, blank=True, default="")
+    actor = models.CharField(max_length=150, blank=True, default="")
+    note = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["variant", "-created_at"], name="stockmove_variant_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("StockMovement es append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.sku} {self.delta:+d} ({self.reason})"
+
+
+class LowStockAlert(models.Model):
+    """
+    Se crea una sola vez cuando un variant cruza su umbral de low stock.
+    Se resuelve cuando el stock vuelve a subir por encima del umbral.
+    """
+    variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name="low_stock_alerts")
+    sku = models.CharField(max_length=60)
+    inventory = models.IntegerField()
+    threshold = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["variant"],
+                name="lowstock_open_idx",
+                condition=models.Q(resolved_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Low stock {self.sku} ({self.inventory}/{self.threshold})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada de un POST con header Idempotency-Key.
+    El índice único sobre `key` hace que solo un request la tome (state=processing);
+    al terminar queda la respuesta (state=done) para reproducirla.
+    """
+    STATE_CHOICES = [("processing", "Procesando"), ("done", "Lista")]
+
+    key = models.CharField(max_length=100, unique=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default="done")
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True, default="")
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# =========================
+# Rollups de ventas (analytics)
+# =========================
+class SalesDay(models.Model):
+    """
+    Ventas agregadas por día (fecha de la orden) + departamento + método de pago.
+    Las mantiene orders/rollups.py; el dashboard de ventas solo lee estas tablas.
+    """
+    day = models.DateField()
+    department = models.CharField(max_length=80, blank=True, default="")
+    payment_method = models.CharField(max_length=20)
+
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Order.discount (total ya lo descuenta)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "department", "payment_method"], name="salesday_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.department or '—'} {self.payment_method}"
+
+
+class SalesDayItem(models.Model):
+    """Unidades e ingreso por día + SKU (líneas sin SKU se agrupan por título)."""
+    day = models.DateField()
+    sku = models.CharField(max_length=60, blank=True, default="")
+    title = models.CharField(max_length=120)
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "sku", "title"], name="salesdayitem_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.sku or self.title}"
+
+
+class OrderStatusChange(models.Model):
+    """
+    Historial de transiciones de estado (lo escribe orders/transitions.py).
+    Como el ledger de stock: guarda order_number para sobrevivir al archivo.
+    """
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name="status_changes")
+    order_number = models.CharField(max_length=20, db_index=True)
+    from_status = models.CharField(max_length=30)
+    to_status = models.CharField(max_length=30)
+    source = models.CharField(max_length=20, blank=True, default="")  # dashboard / admin / webhook
+    actor = models.CharField(max_length=150, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.order_number}: {self.from_status} → {self.to_status}"
+
+
+class BulkJob(models.Model):
+    """
+    Acción masiva del dashboard (estado / tracking / PDFs). La corre `run_bulk_jobs` (Procfile: jobs)
+    por lotes; heartbeat_at se mueve con cada lote, así un job de un proceso muerto se detecta.
+    """
+    KIND_CHOICES = [("status", "Cambio de estado"), ("tracking", "Tracking (CSV)"), ("documents", "Documentos PDF")]
+    STATE_CHOICES = [("queued", "En cola"), ("running", "Corriendo"), ("done", "Listo"), ("failed", "Falló")]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default="queued")
+    params = models.JSONField(default=dict, blank=True)
+
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    changed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    created_by = models.CharField(max_length=150, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["state", "created_at"], name="bulkjob_state_created_idx")]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.state})"
+
+
+class Notification(models.Model):
+    """
+    Outbox de avisos al cliente (pagada / enviada / entregada / tracking).
+    Se escribe en la misma transacción que el cambio (orders/notifications.py) y lo envía
+    `python manage.py dispatch_notifications`, con reintentos: las vistas no esperan a nadie.
+    """
+    STATE_CHOICES = [("pending", "Pendiente"), ("sending", "Enviando"), ("sent", "Enviada"), ("failed", "Falló")]
+
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name="notifications")
+    order_number = models.CharField(max_length=20)
+    event = models.CharField(max_length=20)  # paid / shipped / delivered / tracking
+    channel = models.CharField(max_length=20)  # whatsapp / email / webhook / log
+    recipient = models.CharField(max_length=200, blank=True, default="")
+    payload = models.JSONField(default=dict, blank=True)  # datos de la orden al momento del cambio
+    dedupe_key = models.CharField(max_length=160, unique=True)  # el mismo aviso no se encola dos veces
+
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True, default="")  # dispatcher que lo tomó
+    locked_until = models.DateTimeField(null=True, blank=True)  # si el dispatcher muere, vuelve a la cola
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # dispatcher: pendientes que ya tocan, por orden de llegada
+            models.Index(
+                fields=["next_attempt_at"],
+                name="notification_due_idx",
+                condition=models.Q(state__in=["pending", "sending"]),
+            ),
+            models.Index(fields=["order_number"], name="notification_order_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_number} {self.event} → {self.channel} ({self.state})"
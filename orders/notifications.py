@@ -0,0 +1,344 @@
+# orders/notifications.py
+"""
+Avisos al cliente con outbox transaccional:
+
+    transition() / tracking  ->  Notification (misma transacción)  ->  dispatch_notifications
+
+- enqueue(): solo un bulk_create, dentro de la transacción de quien llama. Si el cambio se
+  revierte, el aviso tampoco existe; si commitea, se envía aunque el proceso muera después.
+  Las vistas y el webhook no esperan a WhatsApp / SMTP.
+- Canales (NOTIFY_CHANNELS): whatsapp (API de WhatsApp Cloud), email, webhook (POST JSON
+  firmado) y log (solo loguea: el default local). Se agregan con @channel("nombre").
+- dispatch(): toma un lote de pendientes (claim con UPDATE condicional: pueden correr varios
+  dispatchers), envía con un pool por canal (NOTIFY_CONCURRENCY) y reintenta con backoff
+  exponencial hasta NOTIFY_MAX_ATTEMPTS. 4xx = error permanente, no se reintenta.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification
+from .whatsapp import customer_number
+
+logger = logging.getLogger(__name__)
+
+STATUS_EVENTS = ("paid", "shipped", "delivered")
+
+MESSAGES = {
+    "paid": "✅ {hola}, recibimos el pago de tu pedido {order_number}. Ya entra a producción.",
+    "shipped": "📦 {hola}, tu pedido {order_number} va en camino.",
+    "delivered": "🙌 {hola}, tu pedido {order_number} figura como entregado. ¡Gracias por comprar en BASALTO!",
+    "tracking": "🚚 {hola}, tu pedido {order_number} ya tiene tracking: {tracking_code}",
+}
+
+
+class PermanentError(Exception):
+    """Reintentar no sirve (4xx, destinatario inválido): la notificación queda en failed."""
+
+
+# =========================
+# Encolar (dentro de la transacción del cambio)
+# =========================
+def _payload(order) -> dict:
+    return {
+        "order_number": order.order_number,
+        "name": (order.full_name or "").split(" ")[0],
+        "status": order.status,
+        "tracking_code": order.tracking_code,
+        "total": str(order.total),
+    }
+
+
+def enqueue(order_events) -> int:
+    """
+    order_events: [(order, event)]. Una fila por canal habilitado, un solo INSERT.
+    Lo repetido (misma orden + evento + canal, o el mismo tracking) se ignora.
+    """
+    events = set(settings.NOTIFY_EVENTS)
+    rows = []
+    for order, event in order_events:
+        if event not in events:
+            continue
+        payload = _payload(order)
+        for name in settings.NOTIFY_CHANNELS:
+            ch = CHANNELS.get(name)
+            recipient = ch.recipient(order) if ch else None
+            if recipient is None:
+                continue  # el canal no aplica (sin teléfono, sin destino configurado)
+            key = [order.order_number, event, name]
+            if event == "tracking":
+                key.append(order.tracking_code)
+            rows.append(Notification(
+                order=order,
+                order_number=order.order_number,
+                event=event,
+                channel=name,
+                recipient=recipient[:200],
+                payload=payload,
+                dedupe_key=":".join(key)[:160],
+            ))
+    if rows:
+        Notification.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def enqueue_tracking(orders) -> int:
+    """Tracking nuevo en órdenes ya enviadas (antes de enviarse, el aviso de shipped lo incluye)."""
+    return enqueue([(o, "tracking") for o in orders if o.status == "shipped" and o.tracking_code])
+
+
+def render_text(notification) -> str:
+    data = notification.payload
+    name = data.get("name") or ""
+    text = MESSAGES[notification.event].format(
+        hola=f"Hola {name}" if name else "Hola",
+        order_number=data.get("order_number", notification.order_number),
+        tracking_code=data.get("tracking_code") or "",
+    )
+    if notification.event == "shipped" and data.get("tracking_code"):
+        text += f" Tracking: {data['tracking_code']}"
+    return text
+
+
+# =========================
+# Canales
+# =========================
+CHANNELS = {}
+
+
+def channel(name):
+    """Registra un canal: recipient(order) -> str | None, send(notification, text)."""
+    def register(cls):
+        CHANNELS[name] = cls()
+        return cls
+    return register
+
+
+def _post(url, body, headers: dict = None):
+    """body: dict (va como JSON) o bytes ya serializados (lo firmado tiene que ser lo que viaja)."""
+    import requests
+
+    kwargs = {"data": body} if isinstance(body, bytes) else {"json": body}
+    r = requests.post(url, headers=headers or {}, timeout=settings.NOTIFY_TIMEOUT_SECONDS, **kwargs)
+    if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+        raise PermanentError(f"HTTP {r.status_code}: {r.text[:300]}")
+    if not r.ok:
+        raise RuntimeError(f"HTTP {r.status_code}: {r.text[:300]}")
+    return r
+
+
+@channel("log")
+class LogChannel:
+    """Solo loguea (local / staging): el flujo completo sin mandar nada."""
+
+    def recipient(self, order):
+        return order.phone or ""
+
+    def send(self, notification, text):
+        logger.info("📣 %s [%s] %s", notification.channel, notification.recipient, text)
+
+
+@channel("whatsapp")
+class WhatsAppChannel:
+    """
+    API de WhatsApp Cloud. Con plantilla aprobada para el evento (WHATSAPP_TEMPLATES) manda
+    la plantilla (parámetros: nombre, orden, tracking); si no, texto (solo llega si el cliente
+    escribió en las últimas 24 h, p. ej. por el link del checkout).
+    """
+
+    def recipient(self, order):
+        return customer_number(order.phone) or None
+
+    def send(self, notification, text):
+        if not (settings.WHATSAPP_TOKEN and settings.WHATSAPP_PHONE_NUMBER_ID):
+            raise PermanentError("WhatsApp sin WHATSAPP_TOKEN / WHATSAPP_PHONE_NUMBER_ID")
+        body = {"messaging_product": "whatsapp", "to": notification.recipient}
+        template = settings.WHATSAPP_TEMPLATES.get(notification.event)
+        if template:
+            data = notification.payload
+            params = [data.get("name") or "", notification.order_number]
+            if data.get("tracking_code"):
+                params.append(data["tracking_code"])
+            body.update(type="template", template={
+                "name": template,
+                "language": {"code": settings.WHATSAPP_TEMPLATE_LANG},
+                "components": [{"type": "body", "parameters": [{"type": "text", "text": p} for p in params]}],
+            })
+        else:
+            body.update(type="text", text={"body": text})
+        _post(
+            f"{settings.WHATSAPP_API_BASE}/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages",
+            body,
+            {"Authorization": f"Bearer {settings.WHATSAPP_TOKEN}"},
+        )
+
+
+@channel("email")
+class EmailChannel:
+    """El checkout no pide email: va a NOTIFY_EMAIL_TO (la tienda) con EMAIL_BACKEND."""
+
+    def recipient(self, order):
+        return ",".join(settings.NOTIFY_EMAIL_TO) or None
+
+    def send(self, notification, text):
+        from django.core.mail import send_mail
+
+        send_mail(
+            f"[BASALTO] {notification.order_number}: {notification.event}",
+            text,
+            settings.DEFAULT_FROM_EMAIL,
+            notification.recipient.split(","),
+        )
+
+
+@channel("webhook")
+class WebhookChannel:
+    """POST JSON a NOTIFY_WEBHOOK_URL (n8n / Zapier / SMS), firmado con HMAC-SHA256 del body."""
+
+    def recipient(self, order):
+        return settings.NOTIFY_WEBHOOK_URL or None
+
+    def send(self, notification, text):
+        body = {
+            "id": notification.dedupe_key,
+            "event": notification.event,
+            "order_number": notification.order_number,
+            "text": text,
+            "data": notification.payload,
+        }
+        raw = json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        signature = hmac.new(settings.NOTIFY_WEBHOOK_SECRET.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+        _post(notification.recipient, raw, {
+            "Content-Type": "application/json",
+            "X-Basalto-Signature": signature,
+            "Idempotency-Key": notification.dedupe_key,  # los reintentos mandan la misma
+        })
+
+
+# =========================
+# Dispatcher
+# =========================
+def _due(now):
+    # sending con lease vencido = un dispatcher que murió a mitad de lote
+    return Q(state="pending", next_attempt_at__lte=now) | Q(state="sending", locked_until__lt=now)
+
+
+def lease_seconds(limit: int) -> float:
+    """
+    Cuánto dura el claim de un lote. Holgado: aunque todo el lote vaya en serie y cada envío
+    agote NOTIFY_TIMEOUT_SECONDS (dos veces: connect + read), el lease no vence a mitad de lote
+    y otro dispatcher no reenvía lo que este todavía está mandando.
+    """
+    return max(settings.NOTIFY_LEASE_SECONDS, 2 * limit * settings.NOTIFY_TIMEOUT_SECONDS + 60)
+
+
+def claim_batch(limit: int) -> list:
+    """Toma hasta `limit` pendientes para este dispatcher (UPDATE condicional, sin SKIP LOCKED)."""
+    now = timezone.now()
+    ids = list(
+        Notification.objects.filter(_due(now)).order_by("next_attempt_at", "pk").values_list("pk", flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Notification.objects.filter(_due(now), pk__in=ids).update(
+        state="sending",
+        claim=token,
+        locked_until=now + timedelta(seconds=lease_seconds(limit)),
+    )
+    return list(Notification.objects.filter(claim=token, state="sending"))
+
+
+def _send(notification):
+    ch = CHANNELS.get(notification.channel)
+    try:
+        if ch is None:
+            raise PermanentError(f"Canal desconocido: {notification.channel}")
+        ch.send(notification, render_text(notification))
+        return notification, None, False
+    except PermanentError as e:
+        return notification, str(e), True
+    except Exception as e:  # red / 5xx / SMTP caído: se reintenta
+        return notification, f"{type(e).__name__}: {e}", False
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(settings.NOTIFY_RETRY_MAX_SECONDS, settings.NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)  # jitter: que los reintentos no lleguen todos juntos
+
+
+def dispatch(limit: int = None) -> dict:
+    """
+    Un lote: claim, envío en paralelo (pool por canal) y resultado en la base.
+    Los threads solo hablan con el proveedor; la base se toca desde este thread.
+    El resultado se guarda solo si el claim sigue siendo nuestro (filtro por token): si el
+    lease venció y otro dispatcher la tomó, no le pisamos el estado.
+    """
+    batch = claim_batch(limit or settings.NOTIFY_BATCH)
+    report = {"claimed": len(batch), "sent": 0, "retry": 0, "failed": 0}
+    if not batch:
+        return report
+
+    by_channel = {}
+    for n in batch:
+        by_channel.setdefault(n.channel, []).append(n)
+
+    results = []
+    pools = [
+        ThreadPoolExecutor(
+            max_workers=max(1, min(len(items), settings.NOTIFY_CONCURRENCY.get(name, settings.NOTIFY_DEFAULT_CONCURRENCY))),
+            thread_name_prefix=f"notify-{name}",
+        )
+        for name, items in by_channel.items()
+    ]
+    try:
+        futures = [pool.submit(_send, n) for pool, items in zip(pools, by_channel.values()) for n in items]
+        results = [f.result() for f in futures]
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    now = timezone.now()
+    token = batch[0].claim
+    sent = [n.pk for n, error, _ in results if error is None]
+    if sent:
+        report["sent"] = Notification.objects.filter(pk__in=sent, claim=token).update(
+            state="sent", sent_at=now, attempts=F("attempts") + 1, claim="", locked_until=None, last_error="",
+        )
+
+    for n, error, permanent in results:
+        if error is None:
+            continue
+        attempts = n.attempts + 1
+        gave_up = permanent or attempts >= settings.NOTIFY_MAX_ATTEMPTS
+        updated = Notification.objects.filter(pk=n.pk, claim=token).update(
+            state="failed" if gave_up else "pending",
+            attempts=attempts,
+            next_attempt_at=now if gave_up else now + timedelta(seconds=_retry_delay(attempts)),
+            claim="",
+            locked_until=None,
+            last_error=error[:2000],
+        )
+        if not updated:
+            continue  # el lease venció y la tomó otro dispatcher: el resultado es suyo
+        report["failed" if gave_up else "retry"] += 1
+        log = logger.warning if gave_up else logger.info
+        log("📣 %s %s → %s: intento %s %s: %s", n.order_number, n.event, n.channel, attempts,
+            "falló (sin más reintentos)" if gave_up else "falló", error)
+    return report
+
+
+def requeue(queryset) -> int:
+    """Vuelve a la cola las fallidas (admin): desde cero intentos."""
+    return queryset.filter(state="failed").update(
+        state="pending", attempts=0, next_attempt_at=timezone.now(), last_error="",
+    )
@@ -0,0 +1,208 @@
+# orders/pdf.py
+"""
+Render de documentos PDF (packing slip / comprobante) con PyMuPDF + qrcode.
+
+Sin Django a propósito: corre en procesos del pool (spawn) y solo recibe
+dicts planos armados por orders/documents.py.
+"""
+import functools
+import io
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+import qrcode
+
+SLIP_SIZE = fitz.paper_rect("a6")
+INVOICE_SIZE = fitz.paper_rect("letter")
+
+# TTF embebida (DejaVu Sans, ver fonts/LICENSE-DejaVu.txt): las base-14 (helv / hebo) solo
+# dibujan Latin-1 y los títulos del catálogo traen "—"; se embebe el subset que se usa.
+FONT = "basalto"
+FONT_BOLD = "basalto-bold"
+FONT_FILES = {
+    FONT: os.path.join(os.path.dirname(__file__), "fonts", "DejaVuSans.ttf"),
+    FONT_BOLD: os.path.join(os.path.dirname(__file__), "fonts", "DejaVuSans-Bold.ttf"),
+}
+INK = (0.07, 0.07, 0.07)
+MUTED = (0.36, 0.36, 0.36)
+LINE = (0.90, 0.89, 0.85)
+
+
+def qr_png(text: str, box_size: int = 6) -> bytes:
+    qr = qrcode.QRCode(border=1, box_size=box_size, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(text)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def qr_text(data: dict) -> str:
+    """Lo que lee el escáner en bodega: número de orden (+ tracking si ya hay)."""
+    if data.get("tracking_code"):
+        return f"{data['order_number']}|{data['tracking_code']}"
+    return data["order_number"]
+
+
+@functools.lru_cache(maxsize=None)
+def _font_buffer(name: str) -> bytes:
+    with open(FONT_FILES[name], "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def _font(name: str) -> fitz.Font:
+    """Para medir anchos (misma fuente que la que se embebe)."""
+    return fitz.Font(fontbuffer=_font_buffer(name))
+
+
+def _finish(doc) -> bytes:
+    doc.subset_fonts()  # solo los glifos usados: el PDF no carga la TTF entera
+    out = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return out
+
+
+class _Writer:
+    """Cursor vertical simple sobre una página (márgenes fijos)."""
+
+    def __init__(self, page, margin=18):
+        for name in FONT_FILES:
+            page.insert_font(fontname=name, fontbuffer=_font_buffer(name))  # el doc la embebe una vez
+        self.page = page
+        self.margin = margin
+        self.width = page.rect.width - 2 * margin
+        self.y = margin
+
+    def text(self, s, size=9, bold=False, color=INK, x=None, gap=3):
+        self.y += size
+        self.page.insert_text((x if x is not None else self.margin, self.y), s, fontname=FONT_BOLD if bold else FONT,
+                              fontsize=size, color=color)
+        self.y += gap
+
+    def box(self, s, size=9, color=INK, height=None):
+        rect = fitz.Rect(self.margin, self.y, self.margin + self.width, self.y + (height or size * 4))
+        self.page.insert_textbox(rect, s, fontname=FONT, fontsize=size, color=color)
+        self.y = rect.y1 + 2
+
+    def rule(self, gap=6):
+        self.y += gap / 2
+        self.page.draw_line((self.margin, self.y), (self.margin + self.width, self.y), color=LINE, width=0.8)
+        self.y += gap / 2
+
+    def right(self, s, size=9, bold=False, color=INK, offset=0):
+        """Texto alineado a la derecha (a `offset` pt del borde) en la línea actual; no mueve el cursor."""
+        w = _font(FONT_BOLD if bold else FONT).text_length(s, fontsize=size)
+        self.page.insert_text((self.margin + self.width - offset - w, self.y), s,
+                              fontname=FONT_BOLD if bold else FONT, fontsize=size, color=color)
+
+    def columns(self, values, size=9, bold=False, color=INK, width=70):
+        """Columnas numéricas alineadas a la derecha (la última pegada al margen)."""
+        for i, v in enumerate(reversed(values)):
+            self.right(v, size=size, bold=bold, color=color, offset=i * width)
+
+
+def _header(w, data, title, qr_size):
+    page = w.page
+    qr_rect = fitz.Rect(page.rect.width - w.margin - qr_size, w.margin, page.rect.width - w.margin, w.margin + qr_size)
+    page.insert_image(qr_rect, stream=qr_png(qr_text(data)))
+
+    w.text("BASALTO", size=12, bold=True)
+    w.text(title, size=8, color=MUTED)
+    w.text(data["order_number"], size=14, bold=True, gap=2)
+    w.text(f"{data['created_at']} · {data['payment_method']}", size=8, color=MUTED)
+    if data.get("tracking_code"):
+        w.text(f"Tracking: {data['tracking_code']}", size=8, color=MUTED)
+    w.y = max(w.y, qr_rect.y1 + 4)
+    w.rule()
+
+
+def _address(w, data, size=9):
+    w.text(f"{data['full_name']} · {data['phone']}", size=size, bold=True)
+    line = data["address_line1"] + (f", {data['address_line2']}" if data.get("address_line2") else "")
+    w.box(line, size=size, height=size * 2.6)
+    place = ", ".join(p for p in (data.get("city"), data.get("department")) if p)
+    w.text(f"{place} · {data['country']}" if place else data["country"], size=size)
+
+
+def render_slip(data: dict) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=SLIP_SIZE.width, height=SLIP_SIZE.height)
+    w = _Writer(page, margin=16)
+
+    _header(w, data, "Packing slip", qr_size=64)
+    _address(w, data)
+    w.rule()
+
+    for it in data["items"]:
+        if w.y > page.rect.height - 60:  # muchas líneas: página nueva
+            page = doc.new_page(width=SLIP_SIZE.width, height=SLIP_SIZE.height)
+            w = _Writer(page, margin=16)
+            w.text(f"{data['order_number']} (cont.)", size=9, bold=True)
+            w.rule()
+        w.text(f"{it['qty']} ×  {it['title']}", size=9, bold=True, gap=1)
+        w.text(f"{it['sleeve']} · {it['color']} · {it['size']}", size=8, color=MUTED, x=w.margin + 18)
+
+    if data.get("notes"):
+        w.rule()
+        w.box(f"Notas: {data['notes']}", size=8, color=MUTED, height=40)
+
+    return _finish(doc)
+
+
+def render_invoice(data: dict) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=INVOICE_SIZE.width, height=INVOICE_SIZE.height)
+    w = _Writer(page, margin=42)
+
+    _header(w, data, "Comprobante de compra", qr_size=84)
+    _address(w, data, size=10)
+    w.rule(gap=14)
+
+    w.text("Producto", size=8, bold=True, color=MUTED, gap=0)
+    w.columns(["Cant.", "Precio", "Total"], size=8, bold=True, color=MUTED)
+    w.rule()
+    for it in data["items"]:
+        if w.y > page.rect.height - 120:
+            page = doc.new_page(width=INVOICE_SIZE.width, height=INVOICE_SIZE.height)
+            w = _Writer(page, margin=42)
+        w.text(it["title"], size=10, gap=0)
+        w.columns([str(it["qty"]), f"${it['unit_price']}", f"${it['line_total']}"], size=10)
+        w.y += 2
+        w.text(f"{it['sleeve']} · {it['color']} · {it['size']}", size=8, color=MUTED)
+
+    w.rule(gap=14)
+    for label, key in (("Subtotal", "subtotal"), ("Descuento", "discount"), ("Envío", "shipping")):
+        if key == "discount" and float(data.get(key) or 0) == 0:
+            continue
+        sign = "-" if key == "discount" else ""
+        w.text(label, size=10, gap=0)
+        w.right(f"{sign}${data[key]}", size=10)
+        w.y += 4
+    w.text("Total", size=12, bold=True, gap=0)
+    w.right(f"${data['total']}", size=12, bold=True)
+
+    return _finish(doc)
+
+
+RENDERERS = {
+    "slip": render_slip,
+    "invoice": render_invoice,
+}
+
+
+def render_to_file(kind: str, data: dict, path: str) -> str:
+    """Worker del pool: renderiza y escribe atómico (tmp + rename) en el cache."""
+    pdf = RENDERERS[kind](data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    return path
+
+
+def render_many(kind: str, jobs: list) -> list:
+    """Un task del pool = varios documentos (menos ida y vuelta entre procesos)."""
+    return [render_to_file(kind, data, path) for data, path in jobs]
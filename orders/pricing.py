@@ -0,0 +1,210 @@
+# orders/pricing.py
+"""
+Precios del carrito desde una lista de precios en memoria.
+
+- PriceList: snapshot {sku: precio} de los Variant activos, cargado con UNA query y
+  compartido por checkout, catálogo y /api/stock/. Cotizar un carrito no hace queries.
+- Versión: la del tag PRICES de orders/cache.py. Variant.save() la cambia al tocar
+  precio / compare_at / active (on_commit); cada proceso la revisa como mucho cada
+  PRICE_LIST_CHECK_SECONDS y recarga si cambió.
+  ⚠️ queryset.update() / bulk_update no pasan por save(): llamar bump_price_list_version().
+- Reglas: envío por departamento (o default, gratis desde SHIPPING_FREE_FROM) y
+  descuentos por cantidad (BUNDLE_DISCOUNTS). Ver settings.
+"""
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import PRICES, app_cache
+from .models import Variant
+
+PRICE_FIELDS = {"price", "compare_at", "active", "sku"}  # los que cambian la lista
+
+CENT = Decimal("0.01")
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class PricingError(ValueError):
+    """SKU que no está en la lista (no existe o inactivo)."""
+
+    def __init__(self, skus):
+        self.skus = list(skus)
+        super().__init__(f"SKU no existe o inactivo: {', '.join(self.skus)}")
+
+
+def money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class PriceEntry:
+    price: Decimal
+    compare_at: Decimal
+
+
+@dataclass(frozen=True)
+class PriceList:
+    version: str
+    entries: dict = field(repr=False)
+    loaded_at: float = 0.0
+
+    def get(self, sku: str):
+        return self.entries.get(sku)
+
+    def prices(self, skus) -> dict:
+        """{sku: "30.00"} para los que están en la lista (para el front)."""
+        return {sku: str(e.price) for sku in skus if (e := self.entries.get(sku))}
+
+
+# =========================
+# Versión + snapshot
+# =========================
+def _current_version() -> str:
+    return app_cache.tag_versions([PRICES])[PRICES]
+
+
+def _load(version: str) -> PriceList:
+    # del primario: el snapshot es del proceso entero (ver orders/replica.py)
+    rows = Variant.objects.using("default").filter(active=True).values_list("sku", "price", "compare_at")
+    entries = {sku: PriceEntry(money(price), money(compare_at)) for sku, price, compare_at in rows}
+    return PriceList(version=version, entries=entries, loaded_at=time.time())
+
+
+def get_price_list() -> PriceList:
+    """Snapshot del proceso; revisa la versión compartida cada PRICE_LIST_CHECK_SECONDS."""
+    global _snapshot, _checked_at
+    snap = _snapshot
+    if snap is not None and time.monotonic() - _checked_at < settings.PRICE_LIST_CHECK_SECONDS:
+        return snap
+
+    with _lock:
+        # la versión se lee ANTES de cargar: si cambia mientras cargamos, la próxima revisión recarga
+        version = _current_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _load(version)
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def bump_price_list_version():
+    """Invalida la lista en todos los procesos (y la del actual, ya)."""
+    global _snapshot
+    app_cache.invalidate_tags(PRICES)
+    with _lock:
+        _snapshot = None
+
+
+def invalidate_on_commit():
+    transaction.on_commit(bump_price_list_version)
+
+
+# =========================
+# Reglas
+# =========================
+def _norm(text: str) -> str:
+    s = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return " ".join(s.lower().split())
+
+
+def shipping_for(department: str, subtotal: Decimal) -> Decimal:
+    free_from = money(settings.SHIPPING_FREE_FROM)
+    if free_from > 0 and subtotal >= free_from:
+        return money(0)
+    by_dept = {_norm(k): v for k, v in settings.SHIPPING_BY_DEPARTMENT.items()}
+    return money(by_dept.get(_norm(department), settings.SHIPPING_DEFAULT))
+
+
+def _best_bundle(lines):
+    """(regla, líneas elegibles) del tramo con más descuento que el carrito alcanza, o (None, [])."""
+    best, best_lines = None, []
+    for rule in settings.BUNDLE_DISCOUNTS:
+        prefix = rule.get("sku_prefix", "")
+        eligible = [ln for ln in lines if ln.sku.startswith(prefix)]
+        if sum(ln.qty for ln in eligible) < int(rule["min_qty"]):
+            continue
+        if best is None or Decimal(str(rule["percent"])) > Decimal(str(best["percent"])):
+            best, best_lines = rule, eligible
+    return best, best_lines
+
+
+# =========================
+# Cotización
+# =========================
+@dataclass
+class QuoteLine:
+    sku: str
+    qty: int
+    unit_price: Decimal
+    compare_at: Decimal
+    line_total: Decimal
+
+
+@dataclass
+class Quote:
+    lines: list
+    subtotal: Decimal
+    discount: Decimal
+    discount_label: str
+    shipping: Decimal
+    total: Decimal
+    version: str
+
+    def as_dict(self) -> dict:
+        return {
+            "lines": [
+                {"sku": ln.sku, "qty": ln.qty, "unit_price": str(ln.unit_price),
+                 "compare_at": str(ln.compare_at), "line_total": str(ln.line_total)}
+                for ln in self.lines
+            ],
+            "subtotal": str(self.subtotal),
+            "discount": str(self.discount),
+            "discount_label": self.discount_label,
+            "shipping": str(self.shipping),
+            "total": str(self.total),
+            "price_list_version": self.version,
+        }
+
+
+def price_cart(items, department: str = "", price_list: PriceList = None) -> Quote:
+    """
+    items: [(sku, qty)] en el orden del carrito (un SKU puede repetirse).
+    Las líneas salen en el mismo orden. PricingError si algún SKU no está en la lista.
+    """
+    price_list = price_list or get_price_list()
+
+    missing = list(dict.fromkeys(sku for sku, _ in items if price_list.get(sku) is None))
+    if missing:
+        raise PricingError(missing)
+
+    lines = []
+    for sku, qty in items:
+        entry = price_list.get(sku)
+        lines.append(QuoteLine(sku, int(qty), entry.price, entry.compare_at, money(entry.price * int(qty))))
+
+    subtotal = money(sum((ln.line_total for ln in lines), Decimal("0")))
+
+    rule, eligible = _best_bundle(lines)
+    discount, label = money(0), ""
+    if rule:
+        base = sum((ln.line_total for ln in eligible), Decimal("0"))
+        discount = money(base * Decimal(str(rule["percent"])) / 100)
+        label = rule.get("label") or f"{rule['percent']}% por {rule['min_qty']}+"
+
+    shipping = shipping_for(department, subtotal - discount) if lines else money(0)
+    return Quote(
+        lines=lines,
+        subtotal=subtotal,
+        discount=discount,
+        discount_label=label,
+        shipping=shipping,
+        total=subtotal - discount + shipping,
+        version=price_list.version,
+    )
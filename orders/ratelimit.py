@@ -0,0 +1,154 @@
+# orders/ratelimit.py
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows (solo dev): el lock queda por proceso
+    fcntl = None
+
+PREFIX = "rl:"
+COUNTER_TTL = 60 * 60 * 24 * 8  # contadores diarios del dashboard (una semana)
+LOCK_FILE = os.path.join(tempfile.gettempdir(), "basalto-ratelimit.lock")
+
+_thread_lock = threading.Lock()
+
+
+# =========================
+# Contadores atómicos
+# =========================
+@contextmanager
+def _counter_lock():
+    """
+    add/incr de los caches de archivos y DB son leer-y-escribir: sin lock, dos workers leen
+    el mismo valor y uno de los incrementos se pierde. Lock de threads + flock entre procesos
+    (el cache de archivos es del host, así que alcanza). Redis no pasa por acá.
+    """
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(LOCK_FILE, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _incr(key: str, ttl: int, delta: int = 1) -> int:
+    """Suma `delta` al contador (lo crea si no existe) y devuelve el valor resultante."""
+    cache = caches["default"]
+    if isinstance(cache, RedisCache):
+        # INCRBY + EXPIRE en un pipeline: atómico en el servidor. Los enteros van sin serializar,
+        # así que cache.get() / get_many() los leen igual.
+        k = cache.make_and_validate_key(key)
+        pipe = cache._cache.get_client(k, write=True).pipeline()
+        pipe.incrby(k, delta)
+        pipe.expire(k, ttl)
+        return pipe.execute()[0]
+
+    with _counter_lock():
+        if delta > 0 and cache.add(key, delta, ttl):
+            return delta
+        try:
+            return cache.incr(key, delta)
+        except ValueError:  # expiró entre add e incr (o ya no está lo que se quería deshacer)
+            if delta < 0:
+                return 0
+            cache.set(key, delta, ttl)
+            return delta
+
+
+def client_ip(request) -> str:
+    """IP del cliente detrás de RATE_LIMIT_PROXY_COUNT proxies (X-Forwarded-For)."""
+    proxies = getattr(settings, "RATE_LIMIT_PROXY_COUNT", 0)
+    xff = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if proxies and xff:
+        hops = [h.strip() for h in xff.split(",") if h.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def normalize_phone(phone: str) -> str:
+    return re.sub(r"\D", "", phone or "")[-8:]  # El Salvador: 8 dígitos, sin prefijo 503
+
+
+def check(rules, now=None):
+    """
+    Sliding window aproximada (ventana actual + anterior ponderada) en el cache compartido.
+
+    rules: [(nombre, key, limit, window_seconds), ...]
+    Devuelve (None, 0) si pasa, o (nombre_de_la_regla, retry_after_segundos) si no.
+
+    Primero se incrementa (atómico) y se compara lo que devolvió el incremento: N requests en
+    paralelo ven N valores distintos y pasan solo los que entran en el cupo. Si alguna regla
+    bloquea, se deshacen los incrementos (los bloqueados no consumen cupo).
+    """
+    now = now or time.time()
+    slots = []
+    for name, key, limit, window in rules:
+        cur = int(now // window)
+        k_cur = f"{PREFIX}{key}:{window}:{cur}"
+        k_prev = f"{PREFIX}{key}:{window}:{cur - 1}"
+        slots.append((name, limit, window, now - cur * window, k_cur, k_prev))
+
+    # la ventana anterior ya cerró: leerla aparte no abre carreras
+    prev_counts = caches["default"].get_many([s[5] for s in slots])
+
+    taken = []
+    blocked = None
+    for name, limit, window, elapsed, k_cur, k_prev in slots:
+        n = _incr(k_cur, window * 2)
+        taken.append((k_cur, window))
+        prev_n = prev_counts.get(k_prev, 0)
+        remaining = window - elapsed
+        cur_n = n - 1  # los que entraron antes que este
+        if prev_n * remaining / window + cur_n >= limit:
+            if cur_n >= limit or not prev_n:
+                retry = remaining
+            else:
+                # cuánto falta para que el peso de la ventana anterior deje lugar
+                retry = remaining - (limit - cur_n) * window / prev_n
+            blocked = name, max(1, math.ceil(retry))
+            break
+
+    if blocked:
+        for k_cur, window in taken:
+            _incr(k_cur, window * 2, -1)
+        return blocked
+    return None, 0
+
+
+def order_rules(request, payment_method: str, phone: str):
+    limits = settings.ORDER_RATE_LIMITS.get(payment_method, {})
+    rules = []
+    if "ip" in limits:
+        rules.append((f"{payment_method}:ip", f"order:{payment_method}:ip:{client_ip(request)}", *limits["ip"]))
+    phone_key = normalize_phone(phone)
+    if "phone" in limits and phone_key:
+        rules.append((f"{payment_method}:phone", f"order:{payment_method}:phone:{phone_key}", *limits["phone"]))
+    return rules
+
+
+def record_blocked(rule_name: str):
+    _incr(f"{PREFIX}blocked:{timezone.localdate().isoformat()}:{rule_name}", COUNTER_TTL)
+
+
+def blocked_counters(day=None) -> dict:
+    """{"card:ip": n, "card:phone": n, ...} para el dashboard."""
+    day = (day or timezone.localdate()).isoformat()
+    names = [f"{m}:{k}" for m, limits in settings.ORDER_RATE_LIMITS.items() for k in limits]
+    values = caches["default"].get_many([f"{PREFIX}blocked:{day}:{n}" for n in names])
+    return {n: values.get(f"{PREFIX}blocked:{day}:{n}", 0) for n in names}
@@ -0,0 +1,117 @@
+# orders/reconcile.py
+"""
+Conciliación de pagos con Wompi: para cuando el webhook no llegó (o llegó con mal hash).
+
+Recorre las órdenes de tarjeta abiertas en lotes, consulta cada enlace en paralelo
+(pool de threads acotado, un solo token compartido) y aplica lo que falte con
+transition(): si la orden ya estaba pagada, no pasa nada (idempotente).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Order
+from .transitions import transition
+from .wompi import get_payment_link_status, get_wompi_token
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("pending", "payment_link_created")
+RECONCILE_BATCH = 100
+
+
+def open_card_orders(min_age_minutes: int, days: int):
+    now = timezone.now()
+    return Order.objects.filter(
+        payment_method="card",
+        status__in=OPEN_STATUSES,
+        created_at__lte=now - timedelta(minutes=min_age_minutes),
+        created_at__gte=now - timedelta(days=days),
+    )
+
+
+def _batches(qs, size):
+    """Paginado por pk (no OFFSET): las órdenes que pasan a paid salen del filtro sin saltear otras."""
+    last = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last).order_by("pk").only("id", "order_number", "total", "wompi_link_id")[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].pk
+
+
+def _amount_matches(order, amount) -> bool:
+    if amount is None:
+        return True  # el API no mandó monto: no hay con qué comparar
+    try:
+        return Decimal(str(amount)).quantize(Decimal("0.01")) == order.total
+    except InvalidOperation:
+        return False
+
+
+def _fetch(order):
+    try:
+        return order, get_payment_link_status(order.wompi_link_id), None
+    except Exception as e:  # un enlace que falla no frena el lote
+        return order, None, str(e)
+
+
+def reconcile(min_age_minutes=None, days=30, batch_size=RECONCILE_BATCH, workers=None, dry_run=False) -> dict:
+    """
+    Devuelve un reporte:
+      checked, paid (movidas a paid), open (sin pago aprobado),
+      discrepancies [(order_number, motivo)], errors [(order_number, error)]
+    """
+    if min_age_minutes is None:
+        min_age_minutes = settings.WOMPI_RECONCILE_MIN_AGE_MINUTES
+    workers = workers or settings.WOMPI_RECONCILE_WORKERS
+
+    report = {"checked": 0, "paid": [], "open": 0, "discrepancies": [], "errors": []}
+    qs = open_card_orders(min_age_minutes, days)
+
+    # sin idEnlace no hay qué consultar (órdenes de antes de guardarlo, o Wompi no lo devolvió)
+    for number in qs.filter(wompi_link_id="").values_list("order_number", flat=True):
+        report["discrepancies"].append((number, "sin idEnlace: revisar a mano en Wompi"))
+
+    qs = qs.exclude(wompi_link_id="")
+    if not qs.exists():
+        return report
+
+    get_wompi_token()  # calentar el token antes de abrir los threads
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wompi-reconcile") as pool:
+        for batch in _batches(qs, batch_size):
+            to_pay = []
+            for order, status, error in pool.map(_fetch, batch):
+                report["checked"] += 1
+                if error:
+                    report["errors"].append((order.order_number, error))
+                elif not status["found"]:
+                    report["discrepancies"].append((order.order_number, f"enlace {order.wompi_link_id} no existe en Wompi"))
+                elif not status["paid"]:
+                    report["open"] += 1
+                elif not _amount_matches(order, status["amount"]):
+                    report["discrepancies"].append(
+                        (order.order_number, f"pagada en Wompi por ${status['amount']} pero el total es ${order.total}")
+                    )
+                else:
+                    to_pay.append(order)
+
+            if to_pay and not dry_run:
+                moved, skipped = transition(to_pay, "paid", source="reconcile")
+                for o in skipped:  # cambió de estado mientras consultábamos (ej. la cancelaron)
+                    report["discrepancies"].append((o.order_number, f"pagada en Wompi pero está {o.get_status_display()}"))
+                report["paid"] += [o.order_number for o in moved]
+            elif to_pay:
+                report["paid"] += [o.order_number for o in to_pay]
+
+    if report["paid"]:
+        logger.info("✅ Conciliación: %s orden(es) marcadas pagadas: %s", len(report["paid"]), report["paid"])
+    for number, reason in report["discrepancies"]:
+        logger.warning("⚠️ Conciliación %s: %s", number, reason)
+    return report
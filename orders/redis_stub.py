@@ -0,0 +1,214 @@
+# orders/redis_stub.py
+"""
+Redis de mentira en localhost (protocolo RESP2) para correr offline: tests, carga local
+con varios workers de gunicorn compartiendo cache, sin instalar redis-server.
+
+    with RedisStub() as stub:
+        # REDIS_URL = stub.url
+        ...
+
+o  python manage.py redis_stub --port 6390  +  REDIS_URL=redis://127.0.0.1:6390/0
+
+Solo los comandos que usa el backend de Redis de Django (get/set/mget/mset/incr/expire/...,
+MULTI/EXEC del pipeline). Todo en memoria, un lock global, sin persistencia.
+"""
+import socketserver
+import threading
+import time
+
+
+class _Error(Exception):
+    pass
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, _Error):
+        return b"-ERR " + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(v) for v in value)
+    return b"$%d\r\n" % len(value) + bytes(value) + b"\r\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline (redis-cli / telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        stub = self.server.stub
+        queued = None  # MULTI abierto
+        while True:
+            args = self._read_command()
+            if not args:
+                return
+            name = args[0].upper().decode()
+
+            if name == "MULTI":
+                queued = []
+                reply = "OK"
+            elif name == "EXEC":
+                reply = [stub.execute(cmd) for cmd in (queued or [])]
+                queued = None
+            elif name == "DISCARD":
+                queued = None
+                reply = "OK"
+            elif queued is not None:
+                queued.append(args)
+                reply = "QUEUED"
+            else:
+                reply = stub.execute(args)
+
+            self.wfile.write(_encode(reply))
+            if name == "QUIT":
+                return
+
+
+class RedisStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.data = {}  # key -> (valor, vence_en | None)
+        self.lock = threading.Lock()
+        self.commands = 0
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # =========================
+    # Comandos
+    # =========================
+    def _live(self, key):
+        item = self.data.get(key)
+        if item and item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return item
+
+    def execute(self, args):
+        name, args = args[0].upper().decode(), args[1:]
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return _Error(f"unknown command '{name}'")
+        with self.lock:
+            self.commands += 1
+            try:
+                return handler(*args)
+            except (TypeError, ValueError, IndexError):
+                return _Error(f"wrong arguments for '{name}'")
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_quit(self):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_client(self, *args):
+        return "OK"  # CLIENT SETINFO del handshake de redis-py
+
+    def cmd_get(self, key):
+        item = self._live(key)
+        return item[0] if item else None
+
+    def cmd_set(self, key, value, *opts):
+        opts = [o.upper() for o in opts]
+        expires = None
+        for flag, scale in ((b"EX", 1), (b"PX", 0.001)):
+            if flag in opts:
+                expires = time.monotonic() + int(opts[opts.index(flag) + 1]) * scale
+        exists = self._live(key) is not None
+        if (b"NX" in opts and exists) or (b"XX" in opts and not exists):
+            return None
+        self.data[key] = (value, expires)
+        return "OK"
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(k) for k in keys]
+
+    def cmd_mset(self, *pairs):
+        for i in range(0, len(pairs), 2):
+            self.data[pairs[i]] = (pairs[i + 1], None)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(1 for k in keys if self._live(k) is not None and self.data.pop(k, None))
+
+    def cmd_exists(self, *keys):
+        return sum(1 for k in keys if self._live(k) is not None)
+
+    def cmd_expire(self, key, seconds):
+        item = self._live(key)
+        if not item:
+            return 0
+        self.data[key] = (item[0], time.monotonic() + int(seconds))
+        return 1
+
+    def cmd_persist(self, key):
+        item = self._live(key)
+        if not item or item[1] is None:
+            return 0
+        self.data[key] = (item[0], None)
+        return 1
+
+    def cmd_ttl(self, key):
+        item = self._live(key)
+        if not item:
+            return -2
+        return -1 if item[1] is None else max(0, round(item[1] - time.monotonic()))
+
+    def cmd_incrby(self, key, delta):
+        item = self._live(key)
+        value = int(item[0] if item else 0) + int(delta)
+        self.data[key] = (str(value).encode(), item[1] if item else None)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_decrby(self, key, delta):
+        return self.cmd_incrby(key, -int(delta))
+
+    def cmd_dbsize(self):
+        return len(self.data)
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        return "OK"
@@ -0,0 +1,97 @@
+# orders/replica.py
+"""
+Lecturas a la réplica (si hay DATABASE_REPLICA_URL), solo donde se pide explícitamente:
+
+    @read_replica()             # vista entera (dashboard, exports)
+    with read_replica(): ...    # un bloque
+
+Todo lo demás, y cualquier escritura, va a `default`.
+
+⚠️ Lo que termina en un cache compartido (cards del catálogo, lista de precios) se lee
+con .using("default") aunque el request esté en read_replica(): si no, el atraso de la
+réplica queda cacheado para todos hasta el próximo vencimiento.
+
+Read-after-write: si un request escribe, el cliente queda "pegado" al primario
+REPLICA_PIN_SECONDS (cookie), así quien acaba de comprar ve su orden y el stock
+descontado aunque la réplica venga atrasada. Dentro del mismo request, después
+de una escritura también se lee del primario, y dentro de transaction.atomic()
+siempre (select_for_update y compañía no tienen sentido en la réplica).
+"""
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA = "replica"
+PIN_COOKIE = "db_pin"
+
+_use_replica = ContextVar("use_replica", default=False)
+_pinned = ContextVar("replica_pinned", default=False)
+_wrote = ContextVar("replica_wrote", default=False)
+
+
+def has_replica() -> bool:
+    return REPLICA in connections.databases
+
+
+class read_replica(ContextDecorator):
+    def _recreate_cm(self):
+        return type(self)()  # como decorador: una instancia por llamada (threads de gunicorn)
+
+    def __enter__(self):
+        self._token = _use_replica.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _use_replica.reset(self._token)
+        return False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _use_replica.get()
+            and not _pinned.get()
+            and not _wrote.get()
+            and not connections["default"].in_atomic_block
+            and has_replica()
+        ):
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # misma base (la réplica es copia del primario)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaPinMiddleware:
+    """Marca el request como pegado al primario (cookie) y la renueva si el request escribió."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = _pinned.set(PIN_COOKIE in request.COOKIES)
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and has_replica():
+                response.set_cookie(
+                    PIN_COOKIE, "1",
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                    samesite="Lax",
+                    secure=request.is_secure(),
+                )
+            return response
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
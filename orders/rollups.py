@@ -0,0 +1,153 @@
+# orders/rollups.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Order,
+    OrderItem,
+    SalesDay,
+    SalesDayItem,
+)
+
+# estados que cuentan como venta (ya pagada)
+REVENUE_STATUSES = ("paid", "processing", "shipped", "delivered")
+
+
+def _bump(model, key: dict, defaults=None, **deltas):
+    """Suma deltas a la fila `key` (la crea en 0 si no existe). UPDATE con F(): sin carreras."""
+    obj, _ = model.objects.get_or_create(**key, defaults=defaults or {})
+    model.objects.filter(pk=obj.pk).update(**{f: F(f) + v for f, v in deltas.items()})
+
+
+def _day_totals():
+    return {"orders": 0, "units": 0, "subtotal": Decimal("0"), "shipping": Decimal("0"),
+            "discount": Decimal("0"), "total": Decimal("0")}
+
+
+def apply_orders(orders, sign: int = 1):
+    """
+    Suma (sign=1) o resta (sign=-1) un lote de órdenes en los rollups.
+    Los items salen de UNA query; los deltas se acumulan por fila de rollup
+    y se aplica un UPDATE por fila (no por orden).
+    El día es la fecha local de la orden (igual que en rebuild()).
+    """
+    orders = list(orders)
+    if not orders:
+        return
+
+    items_by_order = defaultdict(list)
+    for it in OrderItem.objects.filter(order_id__in=[o.pk for o in orders]).select_related("variant"):
+        items_by_order[it.order_id].append(it)
+
+    days = defaultdict(_day_totals)
+    lines = defaultdict(lambda: {"units": 0, "revenue": Decimal("0"), "product_id": None})
+
+    for order in orders:
+        day = timezone.localdate(order.created_at)
+        items = items_by_order[order.pk]
+
+        d = days[(day, order.department, order.payment_method)]
+        d["orders"] += 1
+        d["units"] += sum(it.qty for it in items)
+        d["subtotal"] += order.subtotal
+        d["shipping"] += order.shipping
+        d["discount"] += order.discount
+        d["total"] += order.total
+
+        for it in items:
+            sku = it.variant.sku if it.variant_id else ""
+            line = lines[(day, sku, it.title[:120])]
+            line["units"] += it.qty
+            line["revenue"] += it.line_total
+            if it.variant_id:
+                line["product_id"] = it.variant.product_id
+
+    with transaction.atomic():
+        for (day, department, payment_method), d in days.items():
+            _bump(
+                SalesDay,
+                {"day": day, "department": department, "payment_method": payment_method},
+                **{k: sign * v for k, v in d.items()},
+            )
+        for (day, sku, title), line in lines.items():
+            _bump(
+                SalesDayItem,
+                {"day": day, "sku": sku, "title": title},
+                defaults={"product_id": line["product_id"]},
+                units=sign * line["units"],
+                revenue=sign * line["revenue"],
+            )
+
+
+def rebuild(since=None) -> tuple:
+    """
+    Recalcula los rollups desde Order + ArchivedOrder (todo, o desde `since`).
+    Corrige cualquier desvío de los updates incrementales (p.ej. qty editada después del pago).
+    Devuelve (filas SalesDay, filas SalesDayItem).
+    """
+    days = defaultdict(_day_totals)
+    items = {}
+
+    for order_model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+        orders = order_model.objects.filter(status__in=REVENUE_STATUSES)
+        lines = item_model.objects.filter(order__status__in=REVENUE_STATUSES)
+        if since:
+            orders = orders.filter(created_at__date__gte=since)
+            lines = lines.filter(order__created_at__date__gte=since)
+
+        for row in (
+            orders.annotate(day=TruncDate("created_at"))
+            .values("day", "department", "payment_method")
+            .annotate(n=Count("id"), sub=Sum("subtotal"), ship=Sum("shipping"), disc=Sum("discount"), tot=Sum("total"))
+        ):
+            d = days[(row["day"], row["department"], row["payment_method"])]
+            d["orders"] += row["n"]
+            d["subtotal"] += row["sub"] or 0
+            d["shipping"] += row["ship"] or 0
+            d["discount"] += row["disc"] or 0
+            d["total"] += row["tot"] or 0
+
+        for row in (
+            lines.annotate(day=TruncDate("order__created_at"))
+            .values("day", department=F("order__department"), payment_method=F("order__payment_method"))
+            .annotate(units=Sum("qty"))
+        ):
+            days[(row["day"], row["department"], row["payment_method"])]["units"] += row["units"] or 0
+
+        for row in (
+            lines.annotate(
+                day=TruncDate("order__created_at"),
+                sku=Coalesce(F("variant__sku"), Value("")),
+            )
+            .values("day", "sku", "title")
+            .annotate(units=Sum("qty"), revenue=Sum("line_total"), product_id=F("variant__product_id"))
+        ):
+            key = (row["day"], row["sku"], row["title"][:120])
+            it = items.setdefault(key, {"units": 0, "revenue": Decimal("0"), "product_id": row["product_id"]})
+            it["units"] += row["units"] or 0
+            it["revenue"] += row["revenue"] or 0
+
+    with transaction.atomic():
+        day_qs, item_qs = SalesDay.objects.all(), SalesDayItem.objects.all()
+        if since:
+            day_qs, item_qs = day_qs.filter(day__gte=since), item_qs.filter(day__gte=since)
+        day_qs.delete()
+        item_qs.delete()
+
+        SalesDay.objects.bulk_create(
+            [SalesDay(day=d, department=dep, payment_method=pm, **v) for (d, dep, pm), v in days.items()],
+            batch_size=1000,
+        )
+        SalesDayItem.objects.bulk_create(
+            [SalesDayItem(day=d, sku=sku, title=title, **v) for (d, sku, title), v in items.items()],
+            batch_size=1000,
+        )
+
+    return len(days), len(items)
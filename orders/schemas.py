@@ -0,0 +1,149 @@
+# orders/schemas.py
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from pydantic_core import PydanticCustomError
+
+# Límites: payloads más grandes se rechazan antes de tocar la DB
+MAX_BODY_BYTES = 32 * 1024
+MAX_ITEMS = 50
+MAX_QTY = 99
+
+
+def _blank(v):
+    # null / números -> string; el strip lo hace str_strip_whitespace
+    return "" if v is None else str(v)
+
+
+class CheckoutItem(BaseModel):
+    """
+    Una línea del carrito: solo {sku, qty}. Título, talla, precio e imagen salen del
+    Variant / la lista de precios (orders/pricing.py); lo demás que mande el front se ignora.
+    """
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    sku: str = Field("", max_length=60, validate_default=True)
+    qty: int = 1
+
+    @field_validator("sku", mode="before")
+    @classmethod
+    def _text(cls, v):
+        return _blank(v)
+
+    @field_validator("sku")
+    @classmethod
+    def _required(cls, v):
+        if not v:
+            raise PydanticCustomError("sku", "Producto sin SKU")
+        return v
+
+    @field_validator("qty", mode="before")
+    @classmethod
+    def _qty(cls, v):
+        # "2" / 2 / 2.0 sí; "dos", 2.5, true, null no: mejor un 400 que cobrar otra cantidad
+        try:
+            if isinstance(v, bool) or float(v) != int(float(v)):
+                raise ValueError
+            qty = int(float(v))
+        except (TypeError, ValueError, OverflowError):
+            raise PydanticCustomError("qty", "Cantidad inválida")
+        if qty < 1:
+            raise PydanticCustomError("qty", "La cantidad mínima es 1")
+        if qty > MAX_QTY:
+            raise PydanticCustomError("qty", f"Máximo {MAX_QTY} unidades por producto")
+        return qty
+
+
+class CheckoutPayload(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    country: str = Field("El Salvador", max_length=50)
+    payment_method: Literal["card", "transfer"] = "card"
+
+    full_name: str = Field("", max_length=120, validate_default=True)
+    phone: str = Field("", max_length=30, validate_default=True)
+    address_line1: str = Field("", max_length=180, validate_default=True)
+    address_line2: str = Field("", max_length=180)
+    department: str = Field("", max_length=80)
+    city: str = Field("", max_length=80)
+    notes: str = Field("", max_length=1000)
+
+    items: list[CheckoutItem] = Field(default_factory=list, max_length=MAX_ITEMS, validate_default=True)
+
+    @field_validator("country", "full_name", "phone", "address_line1", "address_line2",
+                     "department", "city", "notes", mode="before")
+    @classmethod
+    def _text(cls, v):
+        return _blank(v)
+
+    @field_validator("country")
+    @classmethod
+    def _country_lock(cls, v):
+        if (v or "El Salvador").lower() != "el salvador":
+            raise PydanticCustomError("country", "Solo enviamos a El Salvador")
+        return "El Salvador"
+
+    @field_validator("payment_method", mode="before")
+    @classmethod
+    def _method(cls, v):
+        s = str(v or "card").strip().lower()
+        if s not in ("card", "transfer"):
+            raise PydanticCustomError("payment_method", "Método de pago inválido")
+        return s
+
+    @field_validator("full_name", "phone", "address_line1")
+    @classmethod
+    def _required(cls, v):
+        if not v:
+            raise PydanticCustomError("required", "Faltan datos de envío")
+        return v
+
+    @field_validator("items", mode="before")
+    @classmethod
+    def _items_list(cls, v):
+        return v or []
+
+    @field_validator("items")
+    @classmethod
+    def _not_empty(cls, v):
+        if not v:
+            raise PydanticCustomError("items", "Carrito vacío")
+        return v
+
+
+class CartQuotePayload(BaseModel):
+    """POST /api/cart/quote/: totales del carrito (envío según departamento) antes de confirmar."""
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    department: str = Field("", max_length=80)
+    items: list[CheckoutItem] = Field(default_factory=list, max_length=MAX_ITEMS)
+
+    @field_validator("department", mode="before")
+    @classmethod
+    def _text(cls, v):
+        return _blank(v)
+
+    @field_validator("items", mode="before")
+    @classmethod
+    def _items_list(cls, v):
+        return v or []
+
+
+_GENERIC_MESSAGES = {
+    "json_invalid": "JSON inválido",
+    "model_type": "JSON inválido",
+    "string_too_long": "Texto demasiado largo",
+    "too_long": f"Máximo {MAX_ITEMS} productos por pedido",
+}
+
+
+def error_fields(exc: ValidationError) -> list:
+    """[{"field": "items.0.size", "message": "Talla inválida"}, ...]"""
+    out = []
+    for err in exc.errors(include_url=False, include_context=False, include_input=False):
+        field = ".".join(str(p) for p in err["loc"])
+        msg = _GENERIC_MESSAGES.get(err["type"], err["msg"])
+        if err["type"] == "string_too_long" and field:
+            msg = f"{msg}: {field}"
+        out.append({"field": field, "message": msg})
+    return out
@@ -0,0 +1,114 @@
+# orders/startup.py
+"""
+Perfil de arranque: corre un Python nuevo con `-X importtime` importando la app WSGI
+(y opcionalmente el URLconf, lo que hace el master de gunicorn con preload) y arma un
+reporte por módulo y por paquete.
+
+    python manage.py profile_startup --urls --runs 3
+
+Sin Django a propósito (solo subprocess + parseo): lo usa también el test de presupuesto.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# lo que no tiene que cargarse al arrancar: se importa en el código que lo usa
+# (documents/pdf, images, wompi). Si aparece en el reporte, alguien lo subió al tope de un módulo.
+HEAVY_MODULES = ("fitz", "qrcode", "PIL", "pillow_heif", "requests", "urllib3")
+
+WSGI_SCRIPT = "import config.wsgi"
+URLS_SCRIPT = WSGI_SCRIPT + "\nfrom django.urls import get_resolver\nget_resolver().url_patterns"
+
+# import time:       self [us] |  cumulative | imported package
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    [{"module", "self_us", "cumulative_us", "depth"}] en el orden en que Python los imprime
+    (hijos antes que el padre). depth 0 = import directo del script.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        rows.append({
+            "module": m.group(4),
+            "self_us": int(m.group(1)),
+            "cumulative_us": int(m.group(2)),
+            "depth": (len(m.group(3)) - 1) // 2,
+        })
+    return rows
+
+
+def run_importtime(script: str = WSGI_SCRIPT, settings_module: str = "config.settings") -> dict:
+    """Un arranque en frío: {"wall_ms", "modules": parse_importtime(...), "loaded": set de módulos}."""
+    code = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"{script}\n"
+        "print(round((time.perf_counter() - t0) * 1000, 1))\n"
+        "print(' '.join(sys.modules))\n"
+    )
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module, "PYTHONDONTWRITEBYTECODE": "1"}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"El import falló:\n{proc.stderr[-2000:]}")
+    import_ms, loaded = proc.stdout.strip().splitlines()[-2:]
+    return {
+        "wall_ms": round((time.perf_counter() - started) * 1000, 1),  # incluye el arranque del intérprete
+        "import_ms": float(import_ms),
+        "modules": parse_importtime(proc.stderr),
+        "loaded": set(loaded.split()),
+    }
+
+
+def _package(module: str) -> str:
+    return module.split(".")[0]
+
+
+def build_report(runs: list, top: int = 25) -> dict:
+    """
+    Junta varios arranques: por módulo se queda con el mínimo (menos ruido que el promedio).
+    self = lo que tarda el módulo en sí; cumulative = con todo lo que importa.
+    """
+    best = {}
+    for run in runs:
+        for row in run["modules"]:
+            prev = best.get(row["module"])
+            if prev is None or row["cumulative_us"] < prev["cumulative_us"]:
+                best[row["module"]] = row
+
+    packages = {}
+    for row in best.values():
+        pkg = packages.setdefault(_package(row["module"]), {"package": _package(row["module"]), "self_us": 0, "modules": 0})
+        pkg["self_us"] += row["self_us"]
+        pkg["modules"] += 1
+
+    loaded = set.intersection(*(run["loaded"] for run in runs)) if runs else set()
+    return {
+        "runs": len(runs),
+        "import_ms": min(run["import_ms"] for run in runs),
+        "wall_ms": min(run["wall_ms"] for run in runs),
+        "modules": len(best),
+        "self_total_ms": round(sum(r["self_us"] for r in best.values()) / 1000, 1),
+        "top_cumulative": sorted(best.values(), key=lambda r: -r["cumulative_us"])[:top],
+        "top_self": sorted(best.values(), key=lambda r: -r["self_us"])[:top],
+        "packages": sorted(packages.values(), key=lambda p: -p["self_us"])[:top],
+        "heavy_loaded": sorted(m for m in HEAVY_MODULES if m in loaded),
+    }
+
+
+def profile(urls: bool = False, runs: int = 1, top: int = 25, settings_module: str = "config.settings") -> dict:
+    script = URLS_SCRIPT if urls else WSGI_SCRIPT
+    return build_report([run_importtime(script, settings_module) for _ in range(max(1, runs))], top=top)
@@ -0,0 +1,20 @@
+# orders/storage.py
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticStorage(CompressedManifestStaticFilesStorage):
+    """
+    Manifest + gzip/brotli precomprimidos en collectstatic (WhiteNoise).
+
+    Con WHITENOISE_MANIFEST_STRICT = False, un archivo que no está en el
+    manifest (p.ej. subido después del build) se sirve con su nombre original
+    en lugar de romper el render del template.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.manifest_strict:
+                raise
+            return name
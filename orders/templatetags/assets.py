@@ -0,0 +1,23 @@
+from django import template
+from django.utils.html import format_html
+
+from orders.assets import asset_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def asset(path):
+    """{% asset "images/banners/1.webp" %} o {% asset card.img %} -> URL final (hash + CDN)."""
+    return asset_url(path)
+
+
+@register.simple_tag
+def preload_image(path, media=""):
+    """<link rel=preload> para imágenes above-the-fold (hero)."""
+    url = asset_url(path)
+    if not url:
+        return ""
+    if media:
+        return format_html('<link rel="preload" as="image" href="{}" media="{}" fetchpriority="high">', url, media)
+    return format_html('<link rel="preload" as="image" href="{}" fetchpriority="high">', url)
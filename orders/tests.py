@@ -1,3 +1,1703 @@
-from django.test import TestCase
+import hashlib
+import http.client
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
 
-# Create your tests here.
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import unquote
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections, transaction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from pydantic import ValidationError
+
+from . import notifications, pricing, wompi
+from .archive import archive_batch, archive_orders
+from .bulk import claim_job, recover_stale, run_job, start_job
+from .cache import TwoTierCache, app_cache
+from .idempotency import PROCESSING_TIMEOUT, idempotent
+from .inventory import apply_stock_changes, get_availability, record_initial_stock, set_stock
+from .views import CATALOG_PAGE_SIZE, build_men_cards
+from .models import ArchivedOrder, ArchivedOrderItem, BulkJob, IdempotencyKey, LowStockAlert, Notification, Order, OrderItem, OrderStatusChange, Product, SalesDay, SalesDayItem, StockMovement, Variant
+from .assets import asset_url
+from .images import CARD_SIZES, render_variants, responsive_sources
+from .pdf import RENDERERS
+from . import replica
+from .replica import read_replica
+from .schemas import CheckoutItem
+from . import ratelimit
+from .redis_stub import RedisStub
+from .pricing import PriceEntry, PriceList, PricingError, price_cart
+from .reconcile import reconcile
+from .rollups import rebuild
+from .transitions import transition
+from .startup import HEAVY_MODULES, URLS_SCRIPT, WSGI_SCRIPT, run_importtime
+from .wompi_redirect import validate_redirect_hash_payment_link
+from .wompi_sim import SimConfig, WompiSimulator, sign
+from .wompi_stub import WompiStub
+
+STATUSES = [key for key, _ in Order.STATUS_CHOICES]
+
+# cache propio por test (el de archivos se comparte entre corridas y con el dev server)
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}}
+
+
+def _variant(sku, price="25.00", inventory=10, product=None, **kwargs):
+    product = product or Product.objects.get_or_create(title="Camisa Test", slug="camisa-test")[0]
+    fields = {"sleeve": "Manga larga", "color": "Negro", "size": "M", **kwargs}
+    return Variant.objects.create(product=product, sku=sku, price=Decimal(price), inventory=inventory, **fields)
+
+
+class FreshCachesMixin:
+    """Lista de precios y cache de dos niveles desde cero (TestCase no corre on_commit)."""
+
+    def setUp(self):
+        super().setUp()
+        app_cache.clear_local()
+        pricing.bump_price_list_version()
+
+
+def _full_scan(plan: str, table: str) -> bool:
+    """True si el plan recorre la tabla entera (SQLite: 'SCAN t' sin índice, Postgres: 'Seq Scan on t')."""
+    if f"Seq Scan on {table}" in plan:
+        return True
+    return bool(re.search(rf"\bSCAN {table}\b(?! USING)", plan))
+
+
+class HotQueryIndexTests(TestCase):
+    """EXPLAIN de las queries calientes (dashboard, webhook, catálogo, inventario) con 100k filas."""
+
+    ROWS = 100_000
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        Order.objects.bulk_create(
+            [
+                Order(
+                    order_number=f"BAS-T-{i:06d}",
+                    status=STATUSES[i % len(STATUSES)],
+                    full_name="Cliente",
+                    phone="70000000",
+                    address_line1="San Salvador",
+                )
+                for i in range(cls.ROWS)
+            ],
+            batch_size=5000,
+        )
+        # created_at es auto_now_add: se reparte después para que el orden importe
+        with connection.cursor() as cur:
+            cur.execute(
+                f"UPDATE {Order._meta.db_table} SET created_at = %s WHERE id %% 2 = 0",
+                [now - timedelta(days=30)],
+            )
+
+        products = Product.objects.bulk_create(
+            [Product(title=f"Producto {i:03d}", slug=f"producto-{i:03d}") for i in range(200)]
+        )
+        Variant.objects.bulk_create(
+            [
+                Variant(
+                    product=products[i % len(products)],
+                    sku=f"T-{i:06d}",
+                    sleeve="Manga larga" if i % 2 else "Manga corta",
+                    color=f"C{i % 12}",
+                    size=["S", "M", "L", "XL", "XXL"][i % 5],
+                    inventory=5 if i % 50 == 0 else 0,  # ~2% vendible, como un catálogo con historial
+                    active=i % 7 != 0,
+                )
+                for i in range(cls.ROWS)
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE")
+
+    def assertUsesIndex(self, qs, index):
+        plan = qs.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_dashboard_orders_by_status(self):
+        qs = Order.objects.filter(status="paid").order_by("-created_at")[:25]
+        self.assertUsesIndex(qs, "order_status_created_idx")
+
+    def test_dashboard_orders_latest(self):
+        qs = Order.objects.order_by("-created_at")[:25]
+        self.assertUsesIndex(qs, "order_created_idx")
+
+    def test_dashboard_status_counts(self):
+        plan = Order.objects.filter(status="pending").only("id").explain()
+        self.assertFalse(_full_scan(plan, Order._meta.db_table), plan)
+
+    def test_wompi_callback_lookup(self):
+        qs = Order.objects.filter(
+            order_number="BAS-T-000123",
+            status__in=["pending", "payment_link_created"],
+        )
+        plan = qs.explain()
+        self.assertFalse(_full_scan(plan, Order._meta.db_table), plan)
+
+    def test_catalog_in_stock_variants(self):
+        qs = Variant.objects.filter(active=True, inventory__gt=0).select_related("product")
+        self.assertUsesIndex(qs, "variant_in_stock_idx")
+
+    def test_inventory_sort(self):
+        qs = Variant.objects.select_related("product").order_by("product__title", "sleeve", "color", "size")[:50]
+        plan = qs.explain()
+        self.assertIn("product_title_idx", plan, plan)
+        self.assertIn("variant_sort_idx", plan, plan)
+
+
+class AdminQueryCountTests(TestCase):
+    """Changelists del admin con 50k órdenes: queries fijas por página, sin N+1 ni COUNT extra."""
+
+    ROWS = 50_000
+
+    @classmethod
+    def setUpTestData(cls):
+        Order.objects.bulk_create(
+            [
+                Order(
+                    order_number=f"BAS-A-{i:06d}",
+                    status=STATUSES[i % len(STATUSES)],
+                    full_name="Cliente",
+                    phone="70000000",
+                    address_line1="San Salvador",
+                    department=["San Salvador", "La Libertad", "Santa Ana"][i % 3],
+                )
+                for i in range(cls.ROWS)
+            ],
+            batch_size=5000,
+        )
+        product = Product.objects.create(title="Camisa", slug="camisa")
+        cls.variants = Variant.objects.bulk_create(
+            [Variant(product=product, sku=f"A-{i:03d}", sleeve="Manga larga", color="Negro", size=s, inventory=5)
+             for i, s in enumerate(["S", "M", "L", "XL", "XXL"] * 40)]
+        )
+        orders = list(Order.objects.order_by("-id")[:500])
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=o, variant=cls.variants[(i + k) % len(cls.variants)], title="Camisa",
+                          sleeve="Manga larga", color="Negro", size="M", unit_price=25, qty=1, line_total=25)
+                for i, o in enumerate(orders)
+                for k in range(2)
+            ]
+        )
+        cls.admin = User.objects.create_superuser("admin", "a@a.com", "x")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        return [q["sql"] for q in ctx.captured_queries]
+
+    def assertNoPerRowQueries(self, queries, limit):
+        # sesión + usuario + COUNT + página + filtros / date_hierarchy: no depende de las filas (100 por página)
+        self.assertLessEqual(len(queries), limit, "\n".join(queries))
+
+    def test_order_changelist(self):
+        queries = self._queries(reverse("admin:orders_order_changelist"))
+        self.assertNoPerRowQueries(queries, 8)
+        counts = [q for q in queries if "COUNT(" in q.upper() and "orders_orderitem" not in q]
+        self.assertEqual(len(counts), 1, counts)  # solo el del paginador (show_full_result_count=False)
+
+    def test_order_changelist_filtered(self):
+        url = reverse("admin:orders_order_changelist") + "?status__exact=paid&department=Santa+Ana"
+        self.assertNoPerRowQueries(self._queries(url), 8)
+
+    def test_orderitem_changelist(self):
+        queries = self._queries(reverse("admin:orders_orderitem_changelist"))
+        self.assertNoPerRowQueries(queries, 8)
+        self.assertFalse([q for q in queries if re.search(r'FROM "orders_order" WHERE .*"id" = ', q)])
+
+    def test_order_change_view_with_items(self):
+        order = Order.objects.filter(items__isnull=False).first()
+        queries = self._queries(reverse("admin:orders_order_change", args=[order.pk]))
+        # variant por autocomplete: ni un <select> con todos los variants ni su Variant.__str__ por opción
+        self.assertNoPerRowQueries(queries, 12)
+
+    def test_variant_autocomplete(self):
+        url = reverse("admin:autocomplete") + "?term=A-01&app_label=orders&model_name=orderitem&field_name=variant"
+        queries = self._queries(url)
+        self.assertNoPerRowQueries(queries, 5)
+
+
+def _link(tx=None):
+    body = {"idEnlace": 0, "urlEnlace": "https://lk.wompi.sv/x"}
+    if tx:
+        body["transacciones"] = [tx]
+    return {"status": 200, "body": body}
+
+
+class ReconcileTests(TestCase):
+    """Conciliación contra un Wompi local que responde respuestas grabadas."""
+
+    RECORDINGS = {
+        "POST /connect/token": {"status": 200, "body": {"access_token": "tok", "expires_in": 3600}},
+        "GET /EnlacePago/101": _link({"idTransaccion": "tx-101", "esAprobada": True, "monto": 33.0}),
+        "GET /EnlacePago/102": _link({"idTransaccion": "tx-102", "resultadoTransaccion": "ExitosaAprobada", "monto": 10.0}),
+        "GET /EnlacePago/103": _link({"idTransaccion": "tx-103", "esAprobada": False, "monto": 20.0}),
+        "GET /EnlacePago/104": _link(),
+        "GET /EnlacePago/106": {"status": 500, "body": {"error": "boom"}},
+        # 105 no está grabado: el stub responde 404
+    }
+
+    def setUp(self):
+        self.stub = WompiStub(self.RECORDINGS).start()
+        self.addCleanup(self.stub.stop)
+        settings_ctx = override_settings(
+            WOMPI_API_BASE=self.stub.url,
+            WOMPI_TOKEN_URL=f"{self.stub.url}/connect/token",
+        )
+        settings_ctx.enable()
+        self.addCleanup(settings_ctx.disable)
+        wompi.forget_token()
+        self.addCleanup(wompi.forget_token)
+
+        def order(n, link_id, total, status="payment_link_created", method="card"):
+            return Order.objects.create(
+                order_number=f"BAS-R-{n}", status=status, payment_method=method, wompi_link_id=link_id,
+                total=Decimal(total), full_name="Cliente", phone="70000000", address_line1="San Salvador",
+            )
+
+        self.paid = order(1, "101", "33.00")
+        self.mismatch = order(2, "102", "20.00")
+        self.declined = order(3, "103", "20.00")
+        self.open = order(4, "104", "20.00")
+        self.missing = order(5, "105", "20.00")
+        self.broken = order(6, "106", "20.00")
+        self.no_link = order(7, "", "20.00")
+        self.transfer = order(8, "101", "33.00", status="pending", method="transfer")
+        Order.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+    def test_reconcile_applies_missing_payments_once(self):
+        with self.assertLogs("orders.reconcile", "INFO"):
+            report = reconcile(workers=4, batch_size=3)
+
+        self.assertEqual(report["paid"], ["BAS-R-1"])
+        self.assertEqual(report["checked"], 6)
+        self.assertEqual(report["open"], 2)
+        self.assertEqual([n for n, _ in report["errors"]], ["BAS-R-6"])
+        self.assertEqual(
+            sorted(n for n, _ in report["discrepancies"]),
+            ["BAS-R-2", "BAS-R-5", "BAS-R-7"],
+        )
+
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, "paid")
+        self.assertEqual(self.paid.status_changes.get().source, "reconcile")
+        for o in (self.mismatch, self.declined, self.open, self.transfer):
+            o.refresh_from_db()
+            self.assertNotEqual(o.status, "paid")
+
+        # un solo token para todos los threads
+        self.assertEqual(self.stub.hits.count(("POST", "/connect/token")), 1)
+
+        # segunda pasada: nada nuevo que aplicar
+        with self.assertLogs("orders.reconcile", "WARNING"):
+            again = reconcile(workers=4, batch_size=3)
+        self.assertEqual(again["paid"], [])
+        self.assertEqual(self.paid.status_changes.count(), 1)
+
+    def test_dry_run_does_not_change_status(self):
+        with self.assertLogs("orders.reconcile", "INFO"):
+            report = reconcile(dry_run=True)
+        self.assertEqual(report["paid"], ["BAS-R-1"])
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, "payment_link_created")
+
+
+class StartupImportTests(SimpleTestCase):
+    """Arranque en frío en un proceso nuevo (lo que paga cada deploy / worker sin preload)."""
+
+    def test_wsgi_cold_import_within_budget(self):
+        run = run_importtime(WSGI_SCRIPT)
+        self.assertLessEqual(
+            run["import_ms"], settings.STARTUP_IMPORT_BUDGET_MS,
+            "import config.wsgi se pasó del presupuesto: ver python manage.py profile_startup",
+        )
+        self.assertTrue(run["modules"])
+
+    def test_heavy_dependencies_are_lazy(self):
+        # ni la app WSGI ni el URLconf (views / api / documents) cargan PDF, imágenes o el cliente HTTP
+        run = run_importtime(URLS_SCRIPT)
+        self.assertEqual([m for m in HEAVY_MODULES if m in run["loaded"]], [])
+
+
+class PdfUnicodeTests(SimpleTestCase):
+    """Los títulos del catálogo traen "—" (accessories.json / catalogo.json): fuera de Latin-1."""
+
+    TITLE = "Camisa Cuello Chino — Negro"
+
+    def _data(self):
+        item = {"title": self.TITLE, "sleeve": "Manga larga", "color": "Negro", "size": "M",
+                "qty": 2, "unit_price": "25.00", "line_total": "50.00"}
+        return {
+            "order_number": "BAS-P-1", "created_at": "2026-10-19", "payment_method": "Tarjeta",
+            "tracking_code": "", "full_name": "Ana Núñez", "phone": "7777-1111",
+            "address_line1": "Col. Escalón — casa 4", "address_line2": "", "city": "San Salvador",
+            "department": "San Salvador", "country": "El Salvador", "notes": "",
+            "subtotal": "50.00", "shipping": "3.50", "discount": "0", "total": "53.50",
+            "items": [item],
+        }
+
+    def _text(self, pdf_bytes):
+        import fitz
+
+        with fitz.open(stream=pdf_bytes) as doc:
+            return "".join(page.get_text() for page in doc)
+
+    def test_slip_and_invoice_keep_unicode_titles(self):
+        for kind, render in RENDERERS.items():
+            with self.subTest(kind=kind):
+                text = self._text(render(self._data()))
+                self.assertIn(self.TITLE, text)
+                self.assertIn("Ana Núñez", text)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_ENABLED=False)
+class IdempotencyTests(FreshCachesMixin, TestCase):
+    """create_order con Idempotency-Key: replay, body distinto, processing y errores transitorios."""
+
+    def setUp(self):
+        super().setUp()
+        _variant("IDEM-M", inventory=10)
+
+    def _post(self, key, qty=1, phone="7777-1111"):
+        body = {"full_name": "Ana", "phone": phone, "address_line1": "Col. Escalón",
+                "payment_method": "transfer", "items": [{"sku": "IDEM-M", "qty": qty}]}
+        return self.client.post("/api/orders/create/", json.dumps(body), content_type="application/json",
+                                headers={"Idempotency-Key": key})
+
+    def test_replay_returns_same_order(self):
+        first = self._post("k-1")
+        second = self._post("k-1")
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(first.json()["order_number"], second.json()["order_number"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Variant.objects.get(sku="IDEM-M").inventory, 9)  # el stock se descontó una vez
+        self.assertEqual(IdempotencyKey.objects.get(key="k-1").state, "done")
+
+    def test_reused_key_with_other_body(self):
+        self._post("k-2")
+        r = self._post("k-2", qty=2)
+        self.assertEqual(r.status_code, 422)
+        self.assertEqual(r.json()["error"], "IDEMPOTENCY_KEY_REUSED")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_concurrent_duplicate_gets_409(self):
+        body = {"full_name": "Ana", "phone": "7777-1111", "address_line1": "Col. Escalón",
+                "payment_method": "transfer", "items": [{"sku": "IDEM-M", "qty": 1}]}
+        raw = json.dumps(body)
+        IdempotencyKey.objects.create(
+            key="k-3", state="processing", request_hash=hashlib.sha256(raw.encode()).hexdigest(),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        r = self.client.post("/api/orders/create/", raw, content_type="application/json",
+                             headers={"Idempotency-Key": "k-3"})
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r["Retry-After"], "1")
+        self.assertEqual(Order.objects.count(), 0)
+
+        # el request que la tomó murió: pasado el timeout se libera y el reintento crea la orden
+        IdempotencyKey.objects.filter(key="k-3").update(created_at=timezone.now() - PROCESSING_TIMEOUT - timedelta(seconds=1))
+        r = self.client.post("/api/orders/create/", raw, content_type="application/json",
+                             headers={"Idempotency-Key": "k-3"})
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_transient_errors_release_the_key(self):
+        responses = [HttpResponse(status=429), HttpResponse(status=503), JsonResponse({"ok": True})]
+        view = idempotent(lambda request: responses.pop(0))
+        factory = RequestFactory()
+
+        def call():
+            return view(factory.post("/x", "{}", content_type="application/json", headers={"Idempotency-Key": "k-4"}))
+
+        self.assertEqual(call().status_code, 429)
+        self.assertFalse(IdempotencyKey.objects.filter(key="k-4").exists())
+        self.assertEqual(call().status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.filter(key="k-4").exists())
+        self.assertEqual(call().status_code, 200)
+        self.assertEqual(call()["Idempotent-Replayed"], "true")  # ya no llama al view
+
+    def test_exception_releases_the_key(self):
+        def boom(request):
+            raise RuntimeError("boom")
+
+        request = RequestFactory().post("/x", "{}", content_type="application/json", headers={"Idempotency-Key": "k-5"})
+        with self.assertRaises(RuntimeError):
+            idempotent(boom)(request)
+        self.assertFalse(IdempotencyKey.objects.filter(key="k-5").exists())
+
+
+class TransitionTests(TestCase):
+    """transition(): permitidas / saltadas, stock al cancelar, signo de los rollups y UPDATE perdido."""
+
+    def setUp(self):
+        self.variant = _variant("TR-M", price="20.00", inventory=10)
+        self.seq = 0
+
+    def _order(self, status="pending", qty=2):
+        """Como el checkout: la orden saca stock por el ledger."""
+        self.seq += 1
+        with transaction.atomic():
+            order = Order.objects.create(
+                order_number=f"BAS-T-{self.seq}", status=status, full_name="Cliente", phone="70000000",
+                address_line1="San Salvador", department="San Salvador", payment_method="transfer",
+                subtotal=Decimal("20.00") * qty, total=Decimal("20.00") * qty,
+            )
+            variant = Variant.objects.select_for_update().get(pk=self.variant.pk)
+            apply_stock_changes([(variant, -qty)], "checkout", order=order)
+            OrderItem.objects.create(order=order, variant=variant, title="Camisa", sleeve="Manga larga",
+                                     color="Negro", size="M", unit_price=Decimal("20.00"), qty=qty)
+        return order
+
+    def _inventory(self):
+        return Variant.objects.get(pk=self.variant.pk).inventory
+
+    def test_allowed_and_skipped(self):
+        pending, shipped = self._order(), self._order(status="shipped")
+        moved, skipped = transition([pending, shipped], "paid", source="test")
+        self.assertEqual([o.pk for o in moved], [pending.pk])
+        self.assertEqual([o.pk for o in skipped], [shipped.pk])
+        self.assertEqual(Order.objects.get(pk=pending.pk).status, "paid")
+        self.assertEqual(Order.objects.get(pk=shipped.pk).status, "shipped")
+        change = OrderStatusChange.objects.get()
+        self.assertEqual((change.order_id, change.from_status, change.to_status), (pending.pk, "pending", "paid"))
+
+    def test_cancel_releases_stock_once(self):
+        order = self._order(qty=3)
+        self.assertEqual(self._inventory(), 7)
+        transition([order], "cancelled")
+        self.assertEqual(self._inventory(), 10)
+        moved, skipped = transition([order], "cancelled")  # cancelled -> cancelled no existe: se salta
+        self.assertEqual((moved, len(skipped)), ([], 1))
+        self.assertEqual(self._inventory(), 10)
+        self.assertEqual(StockMovement.objects.filter(order=order, reason="cancel").count(), 1)
+
+    def test_rollups_sign(self):
+        order = self._order(qty=2)
+        transition([order], "paid")
+        day = SalesDay.objects.get()
+        self.assertEqual((day.orders, day.units, day.total), (1, 2, Decimal("40.00")))
+        transition([order], "cancelled")  # sale de los estados de venta: resta
+        day.refresh_from_db()
+        self.assertEqual((day.orders, day.units, day.total), (0, 0, Decimal("0.00")))
+
+    def test_lost_update_is_skipped(self):
+        """Otra transacción la canceló después de leerla: el UPDATE condicional no la toca y no hay efectos."""
+        stale, fresh = self._order(), self._order()
+        Order.objects.filter(pk=stale.pk).update(status="cancelled")
+        rows = mock.Mock()
+        rows.filter.return_value.order_by.return_value = [stale, fresh]  # lo que vio antes del cambio
+        with mock.patch.object(Order.objects, "select_for_update", return_value=rows):
+            moved, skipped = transition([stale, fresh], "paid")
+        self.assertEqual([o.pk for o in moved], [fresh.pk])
+        self.assertEqual([(o.pk, o.status) for o in skipped], [(stale.pk, "cancelled")])
+        self.assertEqual(list(OrderStatusChange.objects.values_list("order_id", flat=True)), [fresh.pk])
+        self.assertEqual(SalesDay.objects.get().orders, 1)
+
+
+class BulkJobTests(TestCase):
+    """Los jobs los corre run_bulk_jobs (no un thread del worker web); los huérfanos vuelven a la cola."""
+
+    def setUp(self):
+        def order(n, status="pending", tracking=""):
+            return Order.objects.create(
+                order_number=f"BAS-B-{n}", status=status, tracking_code=tracking, full_name="Cliente",
+                phone="70000000", address_line1="San Salvador",
+            )
+
+        self.orders = [order(1), order(2, "delivered"), order(3, "paid", "TRK-3")]
+
+    def test_queued_until_worker_claims(self):
+        job = start_job("status", {"ids": [o.pk for o in self.orders], "status": "cancelled"}, total=3)
+        self.assertEqual(BulkJob.objects.get(pk=job.pk).state, "queued")
+
+        claimed = claim_job()
+        self.assertEqual((claimed.pk, claimed.state, claimed.attempts), (job.pk, "running", 1))
+        self.assertIsNone(claim_job())  # ya tomado
+        self.assertTrue(run_job(claimed))
+
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.processed, job.changed), ("done", 3, 2))
+        self.assertEqual(job.errors, ["BAS-B-2: Entregada"])
+
+    def test_tracking_counts_only_changed(self):
+        rows = [["BAS-B-1", "TRK-1"], ["BAS-B-3", "TRK-3"], ["BAS-X", "TRK-X"]]
+        job = start_job("tracking", {"rows": rows}, total=3)
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.processed, job.changed), ("done", 3, 1))
+        self.assertEqual(job.errors, ["BAS-X: no existe"])
+
+    @override_settings(BULK_HEARTBEAT_SECONDS=60, BULK_MAX_ATTEMPTS=2)
+    def test_stale_running_jobs_are_requeued_then_failed(self):
+        job = start_job("status", {"ids": [self.orders[0].pk], "status": "cancelled"}, total=1)
+        claim_job()
+        BulkJob.objects.filter(pk=job.pk).update(processed=1)
+
+        self.assertEqual(recover_stale(), (0, 0))  # heartbeat reciente: sigue corriendo
+        later = timezone.now() + timedelta(seconds=61)
+        self.assertEqual(recover_stale(later), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.processed), ("queued", 0))
+
+        claim_job()  # segundo intento, también muere
+        self.assertEqual(recover_stale(later + timedelta(seconds=61)), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.state, "failed")
+        self.assertIsNotNone(job.finished_at)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    """Dos TwoTierCache sobre el mismo locmem = dos procesos con el mismo Redis."""
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def _pair(self, **kwargs):
+        return TwoTierCache(prefix="t", **kwargs), TwoTierCache(prefix="t", **kwargs)
+
+    def test_tag_invalidation_reaches_other_process(self):
+        a, b = self._pair(tag_check_seconds=5)
+        a.set("cards", ["v1"], ttl=60, tags=["catalog"])
+        self.assertEqual(b.get("cards"), ["v1"])  # de L2, queda en el L1 de b
+        self.assertEqual(b.stats()["l2_hits"], 1)
+
+        a.invalidate_tags("catalog")
+        self.assertIsNone(a.get("cards"))  # el que invalida lo ve ya
+
+        now = time.monotonic()
+        with mock.patch("orders.cache.time.monotonic", return_value=now + 1):
+            self.assertEqual(b.get("cards"), ["v1"])  # b revisa tags cada 5 s: todavía no
+        with mock.patch("orders.cache.time.monotonic", return_value=now + 6):
+            self.assertIsNone(b.get("cards"))  # ni en L1 ni en L2
+        self.assertGreaterEqual(b.stats()["stale"], 1)
+
+        b.set("cards", ["v2"], ttl=60, tags=["catalog"])
+        self.assertEqual(a.get("cards"), ["v2"])
+
+    def test_single_flight_and_l2_lock(self):
+        a, b = self._pair(wait_seconds=5)
+        calls = []
+        start = threading.Barrier(8)
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"n": len(calls)}
+
+        results = []
+
+        def worker(cache):
+            start.wait()
+            results.append(cache.get_or_set("slow", loader, ttl=60))
+
+        threads = [threading.Thread(target=worker, args=(a if i % 2 else b,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)  # un cálculo entre los dos "procesos"
+        self.assertEqual(results, [{"n": 1}] * 8)
+        self.assertGreaterEqual(a.stats()["load_waits"] + b.stats()["load_waits"], 7)
+        self.assertIsNone(caches["default"].get("t:lock:slow"))  # el lock se suelta
+
+    def test_l1_lru_eviction(self):
+        a, b = self._pair(l1_max_entries=2)
+        a.set("k1", 1, ttl=60)
+        a.set("k2", 2, ttl=60)
+        a.get("k1")  # k1 pasa a ser el más reciente
+        a.set("k3", 3, ttl=60)
+        self.assertIsNone(a.l1.get("k2"))
+        self.assertIsNotNone(a.l1.get("k1"))
+        self.assertEqual((len(a.l1), a.stats()["evictions"]), (2, 1))
+        self.assertEqual(a.get("k2"), 2)  # sigue en L2
+        self.assertEqual(a.stats()["l2_hits"], 1)
+
+    def test_l1_ttl_expiry(self):
+        a, _ = self._pair(l1_ttl=5)
+        a.set("k", "v", ttl=60)
+        now = time.monotonic()
+        with mock.patch("orders.cache.time.monotonic", return_value=now + 4):
+            self.assertEqual(a.get("k"), "v")
+        self.assertEqual(a.stats()["l1_hits"], 1)
+        with mock.patch("orders.cache.time.monotonic", return_value=now + 6):
+            self.assertEqual(a.get("k"), "v")  # vencido en L1: vuelve de L2
+            self.assertEqual(a.stats()["l2_hits"], 1)
+
+
+class InlineExecutor:
+    """ThreadPoolExecutor que corre en el mismo thread (y la misma transacción del TestCase)."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class FakeChannel:
+    """Canal de prueba: outcomes[order_number] = excepción a levantar (o nada = enviado)."""
+
+    def __init__(self):
+        self.outcomes = {}
+        self.sent = []
+
+    def recipient(self, order):
+        return order.phone or None
+
+    def send(self, notification, text):
+        outcome = self.outcomes.get(notification.order_number)
+        if callable(outcome):
+            outcome = outcome(notification)
+        if outcome:
+            raise outcome
+        self.sent.append((notification.order_number, notification.event))
+
+
+@override_settings(NOTIFY_CHANNELS=["fake"], NOTIFY_RETRY_BASE_SECONDS=30, NOTIFY_MAX_ATTEMPTS=3,
+                   NOTIFY_TIMEOUT_SECONDS=10, NOTIFY_LEASE_SECONDS=120)
+class NotificationDispatchTests(TestCase):
+    """Outbox: dedupe al encolar, claim con lease, backoff, errores permanentes, requeue y claim perdido."""
+
+    def setUp(self):
+        self.fake = FakeChannel()
+        patcher = mock.patch.dict(notifications.CHANNELS, {"fake": self.fake})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.order = Order.objects.create(
+            order_number="BAS-N-1", status="paid", full_name="Ana Núñez", phone="70000000",
+            address_line1="San Salvador", tracking_code="TRK-1",
+        )
+
+    def test_enqueue_dedupes(self):
+        notifications.enqueue([(self.order, "paid")])
+        notifications.enqueue([(self.order, "paid"), (self.order, "nope")])  # repetido + evento no habilitado
+        self.assertEqual(Notification.objects.count(), 1)
+
+        self.order.status = "shipped"
+        notifications.enqueue_tracking([self.order])
+        notifications.enqueue_tracking([self.order])
+        self.order.tracking_code = "TRK-2"  # tracking nuevo: otro aviso
+        notifications.enqueue_tracking([self.order])
+        self.assertEqual(
+            sorted(Notification.objects.values_list("dedupe_key", flat=True)),
+            ["BAS-N-1:paid:fake", "BAS-N-1:tracking:fake:TRK-1", "BAS-N-1:tracking:fake:TRK-2"],
+        )
+
+    def test_claim_and_lease(self):
+        notifications.enqueue([(self.order, "paid")])
+        before = timezone.now()
+        batch = notifications.claim_batch(50)
+        self.assertEqual(len(batch), 1)
+        n = batch[0]
+        self.assertEqual(n.state, "sending")
+        self.assertTrue(n.claim)
+        # el lease cubre el lote entero aunque cada envío agote el timeout
+        self.assertGreater(n.locked_until, before + timedelta(seconds=50 * 10))
+        self.assertEqual(notifications.claim_batch(50), [])  # tomado
+
+        Notification.objects.update(locked_until=timezone.now() - timedelta(seconds=1))  # dispatcher muerto
+        again = notifications.claim_batch(50)
+        self.assertEqual([x.pk for x in again], [n.pk])
+        self.assertNotEqual(again[0].claim, n.claim)
+
+    def test_sent(self):
+        notifications.enqueue([(self.order, "paid")])
+        report = notifications.dispatch()
+        self.assertEqual((report["claimed"], report["sent"]), (1, 1))
+        n = Notification.objects.get()
+        self.assertEqual((n.state, n.attempts, n.claim, n.locked_until), ("sent", 1, "", None))
+        self.assertEqual(self.fake.sent, [("BAS-N-1", "paid")])
+
+    def test_retry_with_backoff_then_gives_up(self):
+        self.fake.outcomes["BAS-N-1"] = RuntimeError("HTTP 503")
+        notifications.enqueue([(self.order, "paid")])
+
+        for attempt, base in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.assertEqual(notifications.dispatch()["retry"], 1)
+            n = Notification.objects.get()
+            self.assertEqual((n.state, n.attempts), ("pending", attempt))
+            self.assertIn("HTTP 503", n.last_error)
+            delay = (n.next_attempt_at - before).total_seconds()
+            self.assertTrue(base * 0.8 - 1 <= delay <= base * 1.2 + 1, delay)  # exponencial + jitter
+            self.assertEqual(notifications.dispatch()["claimed"], 0)  # todavía no toca
+            Notification.objects.update(next_attempt_at=timezone.now())
+
+        self.assertEqual(notifications.dispatch()["failed"], 1)  # NOTIFY_MAX_ATTEMPTS=3
+        self.assertEqual(Notification.objects.get().state, "failed")
+
+    def test_permanent_error_fails_at_once(self):
+        self.fake.outcomes["BAS-N-1"] = notifications.PermanentError("HTTP 400")
+        notifications.enqueue([(self.order, "paid")])
+        self.assertEqual(notifications.dispatch()["failed"], 1)
+        n = Notification.objects.get()
+        self.assertEqual((n.state, n.attempts, n.last_error), ("failed", 1, "HTTP 400"))
+
+    def test_requeue(self):
+        notifications.enqueue([(self.order, "paid")])
+        Notification.objects.update(state="failed", attempts=3, last_error="x")
+        self.assertEqual(notifications.requeue(Notification.objects.all()), 1)
+        n = Notification.objects.get()
+        self.assertEqual((n.state, n.attempts, n.last_error), ("pending", 0, ""))
+        self.assertEqual(notifications.dispatch()["sent"], 1)
+
+    def test_lost_claim_does_not_overwrite(self):
+        """Si el lease vence a mitad del envío y otro dispatcher la toma, el resultado viejo no pisa."""
+        def stolen(notification):
+            Notification.objects.filter(pk=notification.pk).update(claim="otro", locked_until=timezone.now())
+            return RuntimeError("timeout")
+
+        self.fake.outcomes["BAS-N-1"] = stolen
+        notifications.enqueue([(self.order, "paid")])
+        with mock.patch.object(notifications, "ThreadPoolExecutor", InlineExecutor):  # misma conexión que el test
+            report = notifications.dispatch()
+        self.assertEqual((report["claimed"], report["retry"], report["failed"]), (1, 0, 0))
+        n = Notification.objects.get()
+        self.assertEqual((n.state, n.claim, n.attempts), ("sending", "otro", 0))
+
+
+@override_settings(
+    SHIPPING_DEFAULT="3.00",
+    SHIPPING_BY_DEPARTMENT={"San Salvador": "2.50", "Morazán": "4.50"},
+    SHIPPING_FREE_FROM="100",
+    BUNDLE_DISCOUNTS=[
+        {"min_qty": 3, "percent": "10", "label": "3+ camisas", "sku_prefix": "BAS-CC-"},
+        {"min_qty": 5, "percent": "15", "label": "5+"},
+    ],
+)
+class PriceCartTests(SimpleTestCase):
+    """price_cart sobre una lista fija: totales, tramo de descuento elegido y envío."""
+
+    PRICES = PriceList("v1", {
+        "BAS-CC-NEG-M": PriceEntry(Decimal("25.00"), Decimal("30.00")),
+        "BAS-CC-BLA-L": PriceEntry(Decimal("25.00"), Decimal("0.00")),
+        "BAS-GO-1": PriceEntry(Decimal("10.00"), Decimal("0.00")),
+    })
+
+    # (items, departamento, subtotal, descuento, etiqueta, envío, total)
+    CASES = [
+        ([("BAS-CC-NEG-M", 1)], "San Salvador", "25.00", "0.00", "", "2.50", "27.50"),
+        ([("BAS-CC-NEG-M", 1)], "  morazan ", "25.00", "0.00", "", "4.50", "29.50"),  # sin tildes / espacios
+        ([("BAS-CC-NEG-M", 1)], "", "25.00", "0.00", "", "3.00", "28.00"),
+        ([("BAS-CC-NEG-M", 2), ("BAS-CC-BLA-L", 1)], "San Salvador", "75.00", "7.50", "3+ camisas", "2.50", "70.00"),
+        ([("BAS-CC-NEG-M", 2), ("BAS-GO-1", 1)], "", "60.00", "0.00", "", "3.00", "63.00"),  # 3 items, 2 camisas
+        ([("BAS-CC-NEG-M", 3), ("BAS-GO-1", 2)], "", "95.00", "14.25", "5+", "3.00", "83.75"),  # 15% > 10%
+        ([("BAS-CC-NEG-M", 4)], "", "100.00", "10.00", "3+ camisas", "3.00", "93.00"),  # gratis va después del descuento
+        ([("BAS-CC-NEG-M", 4), ("BAS-CC-BLA-L", 1)], "", "125.00", "18.75", "5+", "0.00", "106.25"),
+        ([], "", "0.00", "0.00", "", "0.00", "0.00"),
+    ]
+
+    def test_table(self):
+        for items, department, subtotal, discount, label, shipping, total in self.CASES:
+            with self.subTest(items=items, department=department):
+                quote = price_cart(items, department, price_list=self.PRICES)
+                self.assertEqual(
+                    (quote.subtotal, quote.discount, quote.discount_label, quote.shipping, quote.total),
+                    (Decimal(subtotal), Decimal(discount), label, Decimal(shipping), Decimal(total)),
+                )
+                self.assertEqual(quote.version, "v1")
+
+    def test_lines_keep_cart_order(self):
+        quote = price_cart([("BAS-GO-1", 2), ("BAS-CC-NEG-M", 1), ("BAS-GO-1", 1)], price_list=self.PRICES)
+        self.assertEqual([(ln.sku, ln.qty, ln.line_total) for ln in quote.lines], [
+            ("BAS-GO-1", 2, Decimal("20.00")), ("BAS-CC-NEG-M", 1, Decimal("25.00")), ("BAS-GO-1", 1, Decimal("10.00")),
+        ])
+        self.assertEqual(quote.lines[1].compare_at, Decimal("30.00"))
+
+    def test_unknown_sku(self):
+        with self.assertRaises(PricingError) as ctx:
+            price_cart([("NOPE", 1), ("BAS-GO-1", 1), ("NOPE", 2)], price_list=self.PRICES)
+        self.assertEqual(ctx.exception.skus, ["NOPE"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRICE_LIST_CHECK_SECONDS=0)
+class PriceListVersionTests(FreshCachesMixin, TestCase):
+    """Variant.save() cambia la versión "prices" al commitear, solo si tocó precio / active / sku."""
+
+    def setUp(self):
+        super().setUp()
+        self.variant = _variant("PL-M", price="25.00")
+
+    def test_price_change_bumps_version(self):
+        before = pricing.get_price_list()
+        self.assertEqual(before.get("PL-M").price, Decimal("25.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.inventory = 3
+            self.variant.save(update_fields=["inventory"])
+        self.assertEqual(pricing.get_price_list().version, before.version)  # stock no toca la lista
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.price = Decimal("27.50")
+            self.variant.save(update_fields=["price"])
+        after = pricing.get_price_list()
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(after.get("PL-M").price, Decimal("27.50"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.active = False
+            self.variant.save()
+        self.assertIsNone(pricing.get_price_list().get("PL-M"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_PROXY_COUNT=1,
+                   ORDER_RATE_LIMITS={"card": {"ip": (3, 60), "phone": (5, 60)}})
+class RateLimitTests(SimpleTestCase):
+    """Ventana deslizante (actual + anterior ponderada) e IP del cliente detrás del proxy."""
+
+    T0 = 6000.0  # inicio exacto de una ventana de 60 s
+
+    def setUp(self):
+        caches["default"].clear()
+        self.factory = RequestFactory()
+
+    def _request(self, xff="", remote="10.0.0.1"):
+        meta = {"REMOTE_ADDR": remote}
+        if xff:
+            meta["HTTP_X_FORWARDED_FOR"] = xff
+        return self.factory.post("/api/orders/create/", **meta)
+
+    def test_window_blocks_at_limit_and_rolls_over(self):
+        rules = [("card:ip", "order:card:ip:1.1.1.1", 3, 60)]
+        for i in range(3):
+            self.assertEqual(ratelimit.check(rules, now=self.T0 + i), (None, 0))
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 10), ("card:ip", 50))
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 11), ("card:ip", 49))  # bloqueado no suma
+
+        # ventana siguiente: la anterior pesa entera al principio y se va desvaneciendo
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 60)[0], "card:ip")
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 80), (None, 0))  # 3 * 40/60 + 0 = 2
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 81), (None, 0))  # 3 * 39/60 + 1 = 2.95
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 82)[0], "card:ip")  # 3 * 38/60 + 2 >= 3
+
+        # dos ventanas después ya no queda nada
+        for i in range(3):
+            self.assertEqual(ratelimit.check(rules, now=self.T0 + 180 + i), (None, 0))
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 183)[0], "card:ip")
+
+    def test_all_rules_must_pass(self):
+        ip = ("card:ip", "order:card:ip:1.1.1.1", 3, 60)
+        phone = ("card:phone", "order:card:phone:77778888", 1, 60)
+        self.assertEqual(ratelimit.check([ip, phone], now=self.T0), (None, 0))
+        self.assertEqual(ratelimit.check([ip, phone], now=self.T0 + 1)[0], "card:phone")
+        # el bloqueo por teléfono no gastó cupo de la IP
+        self.assertEqual(ratelimit.check([ip], now=self.T0 + 2), (None, 0))
+        self.assertEqual(ratelimit.check([ip], now=self.T0 + 3), (None, 0))
+        self.assertEqual(ratelimit.check([ip], now=self.T0 + 4)[0], "card:ip")
+
+    def test_client_ip_behind_proxy(self):
+        self.assertEqual(ratelimit.client_ip(self._request("200.1.1.1")), "200.1.1.1")
+        # lo que agrega nuestro proxy es el último salto; lo de antes lo escribe el cliente
+        self.assertEqual(ratelimit.client_ip(self._request("6.6.6.6, 200.1.1.1")), "200.1.1.1")
+        with override_settings(RATE_LIMIT_PROXY_COUNT=0):
+            self.assertEqual(ratelimit.client_ip(self._request("6.6.6.6")), "10.0.0.1")
+        with override_settings(RATE_LIMIT_PROXY_COUNT=2):
+            self.assertEqual(ratelimit.client_ip(self._request("200.1.1.1")), "10.0.0.1")  # menos saltos que proxies
+
+    def test_spoofed_forwarded_for_does_not_bypass(self):
+        for i in range(3):
+            rules = ratelimit.order_rules(self._request(f"6.6.6.{i}, 200.1.1.1"), "card", f"7777-000{i}")
+            self.assertEqual(ratelimit.check(rules, now=self.T0 + i), (None, 0))
+        rules = ratelimit.order_rules(self._request("9.9.9.9, 8.8.8.8, 200.1.1.1"), "card", "7777-0009")
+        self.assertEqual(rules[0][1], "order:card:ip:200.1.1.1")
+        self.assertEqual(ratelimit.check(rules, now=self.T0 + 5)[0], "card:ip")
+
+
+class RateLimitConcurrencyTests(SimpleTestCase):
+    """Ráfaga en paralelo contra el mismo cupo: pasan exactamente `limit`, con cada backend."""
+
+    THREADS, LIMIT = 16, 5
+
+    def _burst(self):
+        rules = [("card:ip", "order:card:ip:1.1.1.1", self.LIMIT, 60)]
+        start = threading.Barrier(self.THREADS)
+        results = []
+
+        def hit():
+            start.wait()
+            results.append(ratelimit.check(rules, now=6000.0)[0])
+
+        threads = [threading.Thread(target=hit) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results.count(None), self.LIMIT)
+        self.assertEqual(results.count("card:ip"), self.THREADS - self.LIMIT)
+        # los bloqueados deshicieron su incremento
+        self.assertEqual(caches["default"].get("rl:order:card:ip:1.1.1.1:60:100"), self.LIMIT)
+
+    def test_locmem(self):
+        with override_settings(CACHES=LOCMEM_CACHES):
+            caches["default"].clear()
+            self._burst()
+
+    def test_file_cache(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp,
+        }}):
+            self._burst()
+
+    def test_redis(self):
+        with RedisStub() as stub, override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": stub.url,
+        }}):
+            self._burst()
+            ratelimit.record_blocked("card:ip")
+            self.assertEqual(ratelimit.blocked_counters()["card:ip"], 1)
+
+
+class CheckoutQtyTests(TestCase):
+    """qty inválida = 400 con el campo, no una unidad cobrada en silencio."""
+
+    def test_item_qty(self):
+        for raw, qty in (("2", 2), (3, 3), (4.0, 4), (" 5 ", 5)):
+            self.assertEqual(CheckoutItem(sku="X", qty=raw).qty, qty)
+        for raw in ("dos", "", None, True, 2.5, 0, -1, 100):
+            with self.subTest(qty=raw), self.assertRaises(ValidationError):
+                CheckoutItem(sku="X", qty=raw)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_create_order_rejects_bad_qty(self):
+        body = {"full_name": "Ana", "phone": "7777-1111", "address_line1": "Col. Escalón",
+                "payment_method": "transfer", "items": [{"sku": "X-M", "qty": 1}, {"sku": "X-L", "qty": "0"}]}
+        r = self.client.post("/api/orders/create/", json.dumps(body), content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn({"field": "items.1.qty", "message": "La cantidad mínima es 1"}, r.json()["fields"])
+        self.assertEqual(Order.objects.count(), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogCachePrimaryTests(FreshCachesMixin, TestCase):
+    """Las cards (y la lista de precios) van al cache compartido: se arman del primario aunque el request use la réplica."""
+
+    def test_built_from_primary_inside_read_replica(self):
+        _variant("CAT-NEG-M", price="25.00", inventory=4)
+        # un request nuevo (no escribió) con réplica: el router mandaría las lecturas a "replica" (acá no existe)
+        wrote = replica._wrote.set(False)
+        self.addCleanup(replica._wrote.reset, wrote)
+        with mock.patch("orders.replica.has_replica", return_value=True), read_replica():
+            cards = build_men_cards()
+        self.assertEqual(len(cards), 1)
+        self.assertIn("CAT-NEG-M", str(cards[0]))
+
+
+SIM_SECRET = "sim-secret"
+
+
+@override_settings(CACHES=LOCMEM_CACHES, WOMPI_CLIENT_SECRET=SIM_SECRET)
+class WompiSimulatorRoundTripTests(LiveServerTestCase):
+    """Lo que firma el simulador lo tiene que aceptar el backend real (webhook y redirect)."""
+
+    def setUp(self):
+        self.sim = WompiSimulator(SimConfig(secret=SIM_SECRET, webhook_rate=0, hash_header="Wompi-Hash")).start()
+        self.addCleanup(self.sim.stop)
+        settings_ctx = override_settings(WOMPI_API_BASE=self.sim.url, WOMPI_TOKEN_URL=f"{self.sim.url}/connect/token")
+        settings_ctx.enable()
+        self.addCleanup(settings_ctx.disable)
+        wompi.forget_token()
+        self.addCleanup(wompi.forget_token)
+
+        self.order = Order.objects.create(
+            order_number="BAS-SIM-1", status="payment_link_created", total=Decimal("33.50"),
+            full_name="Cliente", phone="70000000", address_line1="San Salvador",
+        )
+        _, self.link_id = wompi.create_payment_link(
+            self.order.order_number, 33.5,
+            success_url=f"{self.live_server_url}{reverse('orders:payment_success')}",
+            webhook_url=f"{self.live_server_url}{reverse('orders:wompi_callback')}",
+        )
+
+    def _pay(self) -> str:
+        """GET /pay/<id> como el navegador del cliente; devuelve el Location del redirect."""
+        host, port = self.sim.url.removeprefix("http://").split(":")
+        conn = http.client.HTTPConnection(host, int(port), timeout=5)
+        conn.request("GET", f"/pay/{self.link_id}")
+        r = conn.getresponse()
+        r.read()
+        conn.close()
+        self.assertEqual(r.status, 302)
+        return r.getheader("Location")
+
+    def test_signed_webhook_marks_order_paid(self):
+        self._pay()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and self.sim.stats["webhooks_sent"] == 0:
+            time.sleep(0.05)
+        self.assertEqual(self.sim.stats["webhooks_sent"], 1)  # 2xx del backend
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        self.assertEqual(OrderStatusChange.objects.get(order=self.order).source, "webhook")
+
+        # con otro secret la firma no pasa
+        raw = json.dumps({"IdExterno": self.order.order_number}).encode()
+        r = self.client.post(reverse("orders:wompi_callback"), raw, content_type="application/json",
+                             headers={"Wompi-Hash": sign("otro-secret", raw)})
+        self.assertEqual(r.status_code, 401)
+
+    def test_redirect_hash_validates(self):
+        location = self._pay()
+        base, _, query = location.partition("?")
+        self.assertEqual(base, f"{self.live_server_url}{reverse('orders:payment_success')}")
+        q = QueryDict(query)
+        self.assertEqual((q["identificadorEnlaceComercio"], q["idEnlace"], q["monto"]),
+                         ("BAS-SIM-1", self.link_id, "33.50"))
+        self.assertTrue(validate_redirect_hash_payment_link(q))
+
+        tampered = q.copy()
+        tampered["monto"] = "1.00"
+        self.assertFalse(validate_redirect_hash_payment_link(tampered))
+
+        r = self.client.get(f"{reverse('orders:payment_success')}?{query}")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.context["redirect_ok"])
+
+
+class ResponsiveImageTests(SimpleTestCase):
+    """Un original más chico que los anchos pedidos no genera variantes con descriptores falsos."""
+
+    def test_small_source_manifest_and_srcset(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "chica.png"
+            Image.new("RGB", (500, 750), "black").save(src)
+            entry = render_variants(str(src), "images/catalogo/chica.png", "ab" * 32, tmp, (320, 640, 960), ("webp",))
+
+            self.assertEqual(entry["widths"], [320, 640, 960])
+            self.assertEqual(entry["files"], {"webp": {
+                "320": f"images/resp/images-catalogo-chica.{'ab' * 5}.320.webp",
+                "500": f"images/resp/images-catalogo-chica.{'ab' * 5}.500.webp",
+            }})
+            for w, rel in entry["files"]["webp"].items():
+                with Image.open(Path(tmp) / rel) as im:
+                    self.assertEqual(im.size, (int(w), int(w) * 3 // 2))
+
+        with mock.patch("orders.images.load_manifest", return_value={"images/catalogo/chica.png": entry}):
+            sources = responsive_sources("/static/images/catalogo/chica.png")
+        self.assertEqual(sources, {
+            "sizes": CARD_SIZES,
+            "webp": f"/static/images/resp/images-catalogo-chica.{'ab' * 5}.320.webp 320w, "
+                    f"/static/images/resp/images-catalogo-chica.{'ab' * 5}.500.webp 500w",
+        })
+
+
+@override_settings(NOTIFY_CHANNELS=["log"])
+class ArchiveTests(TestCase):
+    """archive_batch: cerradas y viejas pasan al archivo con sus items y sus ids; el resto no se toca."""
+
+    def setUp(self):
+        self.variant = _variant("ARC-M")
+        self.seq = 0
+
+    def _order(self, status, days_old, items=2):
+        self.seq += 1
+        order = Order.objects.create(
+            order_number=f"BAS-A-{self.seq}", status=status, full_name="Cliente", phone="70000000",
+            address_line1="San Salvador", total=Decimal("20.00") * items,
+        )
+        for _ in range(items):
+            OrderItem.objects.create(order=order, variant=self.variant, title="Camisa", sleeve="Manga larga",
+                                     color="Negro", size="M", unit_price=Decimal("20.00"), qty=1)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return order
+
+    def test_moves_old_closed_orders_with_items(self):
+        delivered, cancelled = self._order("delivered", 200), self._order("cancelled", 365, items=1)
+        recent, open_old = self._order("delivered", 10), self._order("shipped", 400)
+        item_ids = set(OrderItem.objects.filter(order__in=[delivered, cancelled]).values_list("id", flat=True))
+        OrderStatusChange.objects.create(order=delivered, order_number=delivered.order_number,
+                                         from_status="shipped", to_status="delivered")
+
+        self.assertEqual(archive_batch(180, batch_size=1), 1)  # un lote chico: la más vieja por id
+        self.assertEqual(archive_orders(180), 1)
+
+        self.assertEqual(set(ArchivedOrder.objects.values_list("id", flat=True)), {delivered.pk, cancelled.pk})
+        self.assertEqual(set(ArchivedOrderItem.objects.values_list("id", flat=True)), item_ids)
+        archived = ArchivedOrder.objects.get(pk=delivered.pk)
+        self.assertEqual((archived.order_number, archived.status, archived.total),
+                         (delivered.order_number, "delivered", Decimal("40.00")))
+        self.assertEqual(archived.items.count(), 2)
+
+        self.assertEqual(set(Order.objects.values_list("id", flat=True)), {recent.pk, open_old.pk})
+        self.assertEqual(OrderItem.objects.filter(order__in=[recent, open_old]).count(), 4)
+        change = OrderStatusChange.objects.get()
+        self.assertEqual((change.order_id, change.order_number), (None, delivered.order_number))
+        self.assertEqual(archive_batch(180), 0)
+
+    def test_waits_for_pending_notifications(self):
+        order = self._order("delivered", 200)
+        notifications.enqueue([(order, "delivered")])
+
+        self.assertEqual(archive_batch(180), 0)  # el aviso todavía no salió
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+
+        self.assertEqual(notifications.dispatch()["sent"], 1)
+        self.assertEqual(archive_batch(180), 1)
+        n = Notification.objects.get()
+        self.assertEqual((n.order_id, n.order_number, n.state), (None, order.order_number, "sent"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_ENABLED=False)
+class StockAvailabilityTests(FreshCachesMixin, TestCase):
+    """Disponibilidad por SKU: cache corto + UNA query para lo que falta; se invalida al commitear."""
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        self.black = _variant("AV-NEG-M", inventory=5)
+        self.white = _variant("AV-BLA-M", inventory=0)
+        _variant("AV-OFF-M", inventory=9, active=False)
+
+    def test_batched_lookup_and_unknown_skus(self):
+        with CaptureQueriesContext(connection) as ctx:
+            stock = get_availability(["AV-NEG-M", "AV-BLA-M", "AV-OFF-M", "NOPE"])
+        self.assertEqual(stock, {"AV-NEG-M": 5, "AV-BLA-M": 0, "AV-OFF-M": 0, "NOPE": 0})
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(get_availability(["AV-NEG-M", "NOPE"]), {"AV-NEG-M": 5, "NOPE": 0})
+        self.assertEqual(len(ctx.captured_queries), 0)  # todo del cache
+
+        self.assertEqual(get_availability([]), {})
+
+    def test_invalidated_on_commit(self):
+        get_availability(["AV-NEG-M"])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                variant = Variant.objects.select_for_update().get(pk=self.black.pk)
+                apply_stock_changes([(variant, -2)], "manual")
+            self.assertEqual(get_availability(["AV-NEG-M"]), {"AV-NEG-M": 5})  # sin commit: sigue lo cacheado
+        self.assertEqual(get_availability(["AV-NEG-M"]), {"AV-NEG-M": 3})
+
+    def test_stock_endpoint(self):
+        r = self.client.get("/api/stock/?skus=AV-NEG-M,AV-BLA-M,AV-NEG-M,NOPE")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {
+            "ok": True,
+            "stock": {"AV-NEG-M": 5, "AV-BLA-M": 0, "NOPE": 0},
+            "prices": {"AV-NEG-M": "25.00", "AV-BLA-M": "25.00"},
+        })
+        self.assertIn("private", r["Cache-Control"])
+        self.assertEqual(self.client.get("/api/stock/?skus=").status_code, 400)
+
+    def test_create_order_precheck_rejects(self):
+        body = {"full_name": "Ana", "phone": "7777-1111", "address_line1": "Col. Escalón",
+                "payment_method": "transfer", "items": [{"sku": "AV-NEG-M", "qty": 6}]}
+        r = self.client.post("/api/orders/create/", json.dumps(body), content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("Sin stock para AV-NEG-M (stock 5, requerido 6)", r.content.decode())
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(Variant.objects.get(pk=self.black.pk).inventory, 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogApiTests(FreshCachesMixin, TestCase):
+    """GET /api/catalog/: páginas de CATALOG_PAGE_SIZE, kind validado, ETag y 304."""
+
+    SHIRTS = CATALOG_PAGE_SIZE * 2 + 1  # dos páginas llenas + una con una sola card
+
+    def setUp(self):
+        super().setUp()
+        for i in range(self.SHIRTS):
+            _variant(f"CAT-C{i:02d}-M", color=f"Color {i:02d}")  # una card por color
+        _variant("CAT-CAP-UNI", size="UNI", color="Negro")
+
+    def _get(self, **params):
+        return self.client.get("/api/catalog/", params)
+
+    def test_page_boundaries(self):
+        first = self._get().json()
+        self.assertEqual((first["kind"], first["page"], first["num_pages"], first["count"], first["next_page"]),
+                         ("shirts", 1, 3, self.SHIRTS, 2))
+        self.assertEqual(len(first["results"]), CATALOG_PAGE_SIZE)
+
+        pages = [self._get(page=n).json() for n in (1, 2, 3)]
+        self.assertEqual([len(p["results"]) for p in pages], [CATALOG_PAGE_SIZE, CATALOG_PAGE_SIZE, 1])
+        self.assertIsNone(pages[2]["next_page"])
+        colors = [c["color"] for p in pages for c in p["results"]]
+        self.assertEqual(len(set(colors)), self.SHIRTS)  # sin repetidas ni perdidas entre páginas
+
+        self.assertEqual(self._get(page=99).json()["page"], 3)  # fuera de rango: la última
+        self.assertEqual(self._get(page="x").json()["page"], 1)
+        self.assertEqual(len(self._get(per_page=1000).json()["results"]), self.SHIRTS)  # tope 48
+        self.assertEqual(len(self._get(per_page=0).json()["results"]), 1)
+
+        caps = self._get(kind="caps").json()
+        self.assertEqual((caps["count"], caps["results"][0]["sku_map"]), (1, {"UNI": "CAT-CAP-UNI"}))
+
+    def test_invalid_kind(self):
+        self.assertEqual(self._get(kind="shoes").status_code, 400)
+
+    def test_etag_and_304(self):
+        r = self._get(page=2)
+        self.assertEqual(r.status_code, 200)
+        etag = r["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("max-age=60", r["Cache-Control"])
+
+        again = self.client.get("/api/catalog/", {"page": 2}, headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again["ETag"], etag)
+
+        other = self.client.get("/api/catalog/", {"page": 1}, headers={"If-None-Match": etag})
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other["ETag"], etag)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StockLedgerTests(FreshCachesMixin, TestCase):
+    """inventory.py: un StockMovement por delta y alertas solo al cruzar el umbral."""
+
+    def setUp(self):
+        super().setUp()
+        self.v = _variant("LED-NEG-M", inventory=10, low_stock_threshold=3)
+
+    def _apply(self, *deltas, reason="manual"):
+        with transaction.atomic():
+            v = Variant.objects.select_for_update().get(pk=self.v.pk)
+            apply_stock_changes([(v, d) for d in deltas], reason, actor="ana", note="x" * 300)
+        self.v.refresh_from_db()
+
+    def _open_alerts(self):
+        return LowStockAlert.objects.filter(variant=self.v, resolved_at__isnull=True)
+
+    def test_one_movement_per_delta(self):
+        self._apply(-2, 0, 5, -1)  # el 0 no deja rastro
+        moves = list(StockMovement.objects.filter(variant=self.v).order_by("id"))
+        self.assertEqual([(m.delta, m.inventory_after) for m in moves], [(-2, 8), (5, 13), (-1, 12)])
+        self.assertEqual(self.v.inventory, 12)
+        self.assertEqual({(m.sku, m.reason, m.actor, len(m.note)) for m in moves}, {("LED-NEG-M", "manual", "ana", 255)})
+
+    def test_alert_once_on_crossing_and_resolved_on_recovery(self):
+        self._apply(-6)  # 10 -> 4: todavía ok
+        self.assertFalse(self.v.low_stock)
+        self.assertFalse(LowStockAlert.objects.exists())
+
+        self._apply(-1)  # 4 -> 3: cruza
+        self.assertTrue(self.v.low_stock)
+        alert = self._open_alerts().get()
+        self.assertEqual((alert.inventory, alert.threshold), (3, 3))
+
+        self._apply(-1)  # sigue bajo: nada nuevo
+        self._apply(1)
+        self.assertEqual(LowStockAlert.objects.count(), 1)
+
+        self._apply(5)  # 3 -> 8: se recupera
+        self.assertFalse(self.v.low_stock)
+        self.assertFalse(self._open_alerts().exists())
+        alert.refresh_from_db()
+        self.assertIsNotNone(alert.resolved_at)
+
+        self._apply(-6)  # vuelve a caer: alerta nueva
+        self.assertEqual(self._open_alerts().count(), 1)
+        self.assertEqual(LowStockAlert.objects.count(), 2)
+
+    def test_set_stock_records_the_delta(self):
+        with transaction.atomic():
+            set_stock(self.v, 2, actor="ana")
+            set_stock(self.v, 2)  # mismo valor: sin movimiento
+        self.assertEqual(
+            list(StockMovement.objects.filter(variant=self.v).values_list("delta", "inventory_after")),
+            [(-8, 2)],
+        )
+        self.assertEqual(self._open_alerts().count(), 1)
+
+    def test_record_initial_stock(self):
+        product = self.v.product
+        new = [
+            Variant.objects.create(product=product, sku="INI-1", sleeve="Manga corta", color="Azul", size="M", inventory=7),
+            Variant.objects.create(product=product, sku="INI-2", sleeve="Manga corta", color="Azul", size="L", inventory=0),
+            Variant.objects.create(product=product, sku="INI-3", sleeve="Manga corta", color="Azul", size="S", inventory=2),
+        ]
+        moves = record_initial_stock(new, note="seed")
+        self.assertEqual([(m.sku, m.delta, m.inventory_after, m.reason) for m in moves],
+                         [("INI-1", 7, 7, "import"), ("INI-3", 2, 2, "import")])  # sin stock: sin entrada
+        self.assertEqual(sorted(LowStockAlert.objects.values_list("sku", flat=True)), ["INI-2", "INI-3"])
+
+    def test_migration_0007_backfills_low_stock(self):
+        from django.apps import apps
+        from importlib import import_module
+
+        ok = _variant("LED-NEG-L", inventory=4, low_stock_threshold=3)
+        Variant.objects.filter(pk__in=[self.v.pk, ok.pk]).update(low_stock=False)
+        Variant.objects.filter(pk=self.v.pk).update(inventory=3)  # en el borde: cuenta como bajo
+
+        import_module("orders.migrations.0007_stock_ledger").backfill_low_stock(apps, None)
+
+        self.assertEqual(
+            dict(Variant.objects.filter(pk__in=[self.v.pk, ok.pk]).values_list("sku", "low_stock")),
+            {"LED-NEG-M": True, "LED-NEG-L": False},
+        )
+
+    def test_admin_threshold_change_opens_and_resolves_alert(self):
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "x"))
+        url = reverse("admin:orders_variant_change", args=[self.v.pk])
+
+        def post(threshold):
+            r = self.client.post(url, {
+                "product": self.v.product_id, "sku": self.v.sku, "sleeve": self.v.sleeve,
+                "color": self.v.color, "size": self.v.size, "fabric": self.v.fabric, "img": "",
+                "price": "25.00", "compare_at": "0", "low_stock_threshold": threshold, "active": "on",
+            })
+            self.assertEqual(r.status_code, 302)
+            self.v.refresh_from_db()
+
+        post(12)  # 10 <= 12: ahora es bajo
+        self.assertTrue(self.v.low_stock)
+        alert = self._open_alerts().get()
+        self.assertEqual((alert.inventory, alert.threshold), (10, 12))
+
+        post(11)  # sigue bajo: no duplica
+        self.assertEqual(LowStockAlert.objects.count(), 1)
+
+        post(3)
+        self.assertFalse(self.v.low_stock)
+        self.assertFalse(self._open_alerts().exists())
+        self.assertFalse(StockMovement.objects.exists())  # el umbral no es un movimiento de stock
+
+
+class SalesRollupTests(TestCase):
+    """Los rollups incrementales (transition -> apply_orders) tienen que dar lo mismo que rebuild()."""
+
+    def setUp(self):
+        self.shirt = _variant("RU-NEG-M", price="20.00", inventory=50)
+        self.cap = _variant("RU-CAP-UNI", price="15.00", inventory=50, size="UNI")
+        self.seq = 0
+
+    def _order(self, created_at, department, payment_method, lines, discount="0.00", shipping="3.50"):
+        self.seq += 1
+        subtotal = sum(Decimal(v.price) * qty for v, qty in lines)
+        order = Order.objects.create(
+            order_number=f"BAS-R-{self.seq}", full_name="Cliente", phone="70000000", address_line1="Centro",
+            department=department, payment_method=payment_method, subtotal=subtotal, shipping=Decimal(shipping),
+            discount=Decimal(discount), total=subtotal + Decimal(shipping) - Decimal(discount),
+        )
+        for v, qty in lines:
+            OrderItem.objects.create(order=order, variant=v, title="Camisa" if v is self.shirt else "Gorra",
+                                     sleeve=v.sleeve, color=v.color, size=v.size, unit_price=v.price, qty=qty)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    @staticmethod
+    def _snapshot():
+        days = SalesDay.objects.values_list("day", "department", "payment_method", "orders", "units",
+                                            "subtotal", "shipping", "discount", "total")
+        items = SalesDayItem.objects.values_list("day", "sku", "title", "product_id", "units", "revenue")
+        # filas en cero (todo lo que entró después salió) equivalen a no tener fila
+        return ({r[:3]: r[3:] for r in days if any(r[3:])}, {r[:3]: r[3:] for r in items if any(r[4:])})
+
+    def test_rebuild_matches_incremental(self):
+        local = timezone.get_current_timezone()
+        late = timezone.now().astimezone(local).replace(hour=23, minute=30) - timedelta(days=3)  # ya es "mañana" en UTC
+        early = late.replace(hour=0, minute=15)
+        old = timezone.now() - timedelta(days=200)
+
+        a = self._order(late, "San Salvador", "wompi", [(self.shirt, 3)], discount="6.00")
+        b = self._order(early, "San Salvador", "wompi", [(self.shirt, 1), (self.cap, 2)])
+        c = self._order(early, "La Libertad", "transfer", [(self.cap, 4)], discount="3.00")
+        d = self._order(late, "San Salvador", "wompi", [(self.shirt, 2)], discount="2.00")  # pagada y cancelada
+        e = self._order(old, "Santa Ana", "wompi", [(self.shirt, 5)], discount="10.00")     # termina archivada
+        self._order(late, "San Salvador", "transfer", [(self.cap, 1)])                     # nunca pagada
+
+        transition([a, b, d, e], "paid")
+        transition([c], "processing")
+        transition([d], "cancelled")
+        transition([e], "shipped")
+        transition([e], "delivered")
+        Notification.objects.update(state="sent")  # con avisos en el outbox no se archiva
+        self.assertEqual(archive_orders(180), 1)
+
+        incremental = self._snapshot()
+        sa = incremental[0][(timezone.localdate(late), "San Salvador", "wompi")]
+        self.assertEqual(sa[:2], (2, 6))  # a + b: 23:30 y 00:15 son el mismo día local; d se canceló
+        self.assertEqual(sa[-2:], (Decimal("6.00"), Decimal("111.00")))
+        self.assertEqual(sum(r[4] for r in incremental[0].values()), Decimal("19.00"))  # descuentos: a + c + e
+
+        self.assertEqual(rebuild(), tuple(map(len, incremental)))
+        self.assertEqual(self._snapshot(), incremental)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    ReplicaRouter / ReplicaPinMiddleware / read_replica contra un alias "replica" espejo de la base
+    de test (MIRROR: misma base, otra conexión). TransactionTestCase: lo escrito se commitea y la
+    réplica lo ve, como en producción sin atraso.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # el alias se agrega acá (no en settings) para que el resto de la suite siga sin réplica;
+        # después de super(): el runner no lo conoce y no hay que crearle base de test
+        super().setUpClass()
+        primary = connections["default"].settings_dict
+        connections.settings[replica.REPLICA] = {**primary, "TEST": {**primary["TEST"], "MIRROR": "default"}}
+        cls.databases = cls.databases | {replica.REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[replica.REPLICA].close()
+        del connections[replica.REPLICA]
+        del connections.settings[replica.REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        self.variant = _variant("RR-NEG-M", inventory=10)
+
+    def _new_request(self):
+        """Como al entrar un request: todavía no escribió (el setUp sí, en este mismo contexto)."""
+        token = replica._wrote.set(False)
+        self.addCleanup(replica._wrote.reset, token)
+
+    def _read(self):
+        """(skus, queries al primario, queries a la réplica)"""
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections[replica.REPLICA]) as mirror:
+            skus = list(Variant.objects.values_list("sku", flat=True))
+        return skus, len(primary), len(mirror)
+
+    def test_reads_go_to_replica(self):
+        self._new_request()
+        self.assertTrue(replica.has_replica())
+        with read_replica():
+            self.assertEqual(self._read(), (["RR-NEG-M"], 0, 1))
+        self.assertEqual(self._read(), (["RR-NEG-M"], 1, 0))  # fuera de read_replica: primario
+
+    def test_writes_and_atomic_go_to_primary(self):
+        self._new_request()
+        with read_replica():
+            with transaction.atomic():
+                self.assertEqual(self._read(), (["RR-NEG-M"], 1, 0))
+            self.assertEqual(self._read(), (["RR-NEG-M"], 0, 1))  # salió del atomic sin escribir
+
+            with CaptureQueriesContext(connections[replica.REPLICA]) as mirror:
+                Variant.objects.filter(pk=self.variant.pk).update(sku="RR-NEG-L")
+            self.assertEqual(len(mirror), 0)
+            self.assertEqual(self._read(), (["RR-NEG-L"], 1, 0))  # después de escribir: read-after-write del primario
+
+    def test_pin_cookie_after_post(self):
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        inventory = reverse("orders:dashboard_inventory")
+
+        def get():
+            with CaptureQueriesContext(connections[replica.REPLICA]) as mirror:
+                r = self.client.get(inventory)
+            self.assertEqual(r.status_code, 200)
+            return r, len(mirror)
+
+        r, on_replica = get()
+        self.assertGreater(on_replica, 0)
+        self.assertNotIn(replica.PIN_COOKIE, r.cookies)  # solo leyó: no se pega
+
+        r = self.client.post(reverse("orders:dashboard_variant_set_stock", args=[self.variant.pk]), {"inventory": "7"})
+        self.assertEqual(r.status_code, 302)
+        pin = r.cookies[replica.PIN_COOKIE]
+        self.assertEqual(pin["max-age"], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(pin["httponly"])
+
+        r, on_replica = get()  # el client manda la cookie: todo al primario
+        self.assertEqual(on_replica, 0)
+        self.assertContains(r, "RR-NEG-M")
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_ENABLED=False, BASALTO_WHATSAPP_NUMBER="50370000000")
+class WhatsappMessageTests(FreshCachesMixin, TestCase):
+    """whatsapp_message / whatsapp_url: se guardan en el checkout y se regeneran al cambiar items o envío."""
+
+    def setUp(self):
+        super().setUp()
+        self.variant = _variant("WA-NEG-M", inventory=10)
+        self.staff = User.objects.create_superuser("admin", "a@example.com", "x")
+
+    def _checkout(self, qty=2):
+        body = {"full_name": "Ana", "phone": "7777-1111", "address_line1": "Col. Escalón",
+                "payment_method": "transfer", "items": [{"sku": "WA-NEG-M", "qty": qty}]}
+        r = self.client.post("/api/orders/create/", json.dumps(body), content_type="application/json")
+        self.assertEqual(r.status_code, 200, r.content)
+        return Order.objects.get(order_number=r.json()["order_number"]), r.json()
+
+    def test_set_at_checkout(self):
+        order, data = self._checkout()
+        self.assertIn(f"Pedido BASALTO: {order.order_number}", order.whatsapp_message)
+        self.assertIn("x2 — $25.00 | SKU WA-NEG-M", order.whatsapp_message)
+        self.assertIn("Dirección: Col. Escalón", order.whatsapp_message)
+        self.assertIn(f"Referencia: {order.order_number}", order.whatsapp_message)  # transferencia
+        self.assertTrue(order.whatsapp_url.startswith("https://wa.me/50370000000?text=Pedido%20BASALTO"))
+        self.assertEqual(data["whatsapp_url"], order.whatsapp_url)
+
+    def test_regenerated_when_qty_changes(self):
+        order, _ = self._checkout()
+        self.client.force_login(self.staff)
+        r = self.client.post(reverse("orders:dashboard_orderitem_qty", args=[order.items.get().pk]), {"qty": "3"})
+        self.assertEqual(r.status_code, 302)
+        before_url = order.whatsapp_url
+        order.refresh_from_db()
+        self.assertIn("x3 — $25.00", order.whatsapp_message)
+        self.assertNotIn("x2 —", order.whatsapp_message)
+        self.assertNotEqual(order.whatsapp_url, before_url)
+
+    def test_regenerated_when_address_changes_in_admin(self):
+        order, _ = self._checkout()
+        self.client.force_login(self.staff)
+        url = reverse("admin:orders_order_change", args=[order.pk])
+        form = self.client.get(url).context["adminform"].form
+        data = {k: v for k, v in form.initial.items() if k in form.fields and v is not None}
+        data.update({"address_line1": "Av. Las Magnolias 12", "items-TOTAL_FORMS": "0", "items-INITIAL_FORMS": "0"})
+        r = self.client.post(url, data)
+        self.assertEqual(r.status_code, 302, r.context and r.context["adminform"].form.errors)
+        order.refresh_from_db()
+        self.assertIn("Dirección: Av. Las Magnolias 12", order.whatsapp_message)
+        self.assertIn("Magnolias", unquote(order.whatsapp_url))
+
+    def test_detail_get_does_not_write(self):
+        order, _ = self._checkout()
+        Order.objects.filter(pk=order.pk).update(whatsapp_message="", whatsapp_url="")  # de antes del cache
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse("orders:dashboard_order_detail", args=[order.pk]))
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "Copiar mensaje")  # armado en memoria
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].lstrip().upper().startswith("UPDATE")])
+        self.assertEqual(Order.objects.get(pk=order.pk).whatsapp_url, "")
+
+    def test_backfill_command(self):
+        order, _ = self._checkout()
+        expected = order.whatsapp_message
+        Order.objects.filter(pk=order.pk).update(whatsapp_message="", whatsapp_url="")
+        call_command("backfill_whatsapp", batch_size=1, stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.whatsapp_message, expected)
+        self.assertTrue(order.whatsapp_url.startswith("https://wa.me/50370000000?text="))
+
+
+class AssetUrlTests(SimpleTestCase):
+    """asset_url y los tags {% asset %} / {% preload_image %}: nombre hasheado del manifest, CDN y fallback."""
+
+    HASHED = {"images/catalogo/negro.webp": "images/catalogo/negro.3f2a9c.webp"}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        Path(tmp.name, "staticfiles.json").write_text(json.dumps({"version": "1.1", "paths": self.HASHED}))
+        # STATIC_ROOT / STATIC_URL cambiados -> Django recrea staticfiles_storage (lee este manifest)
+        ctx = override_settings(STATIC_ROOT=tmp.name, FRONTEND_DOMAIN="https://shop.example.com")
+        ctx.enable()
+        self.addCleanup(ctx.disable)
+
+    def _render(self, template, **ctx):
+        return Template("{% load assets %}" + template).render(Context(ctx))
+
+    def test_local_static_path(self):
+        for img in ("images/catalogo/negro.webp", "/static/images/catalogo/negro.webp",
+                    "https://basalto1530.com/static/images/catalogo/negro.webp",
+                    "https://shop.example.com/static/images/catalogo/negro.webp"):
+            with self.subTest(img=img):
+                self.assertEqual(asset_url(img), "/static/images/catalogo/negro.3f2a9c.webp")
+        self.assertEqual(asset_url(""), "")
+
+    def test_missing_from_manifest_falls_back_to_plain_name(self):
+        self.assertEqual(asset_url("/static/images/catalogo/nueva.webp"), "/static/images/catalogo/nueva.webp")
+        self.assertEqual(self._render('{% asset "images/nueva.webp" %}'), "/static/images/nueva.webp")
+
+    def test_external_urls_untouched(self):
+        for url in ("https://res.cloudinary.com/demo/image/upload/v1/camisa.jpg", "https://otro.com/static/x.webp",
+                    "/media/x.webp"):
+            with self.subTest(url=url):
+                self.assertEqual(asset_url(url), url)
+
+    @override_settings(CDN_BASE_URL="https://cdn.example.com", STATIC_URL="https://cdn.example.com/static/")
+    def test_cdn_prefix(self):
+        """Con CDN_BASE_URL, settings arma STATIC_URL sobre el CDN; las URLs del CDN mismo también se reconocen."""
+        expected = "https://cdn.example.com/static/images/catalogo/negro.3f2a9c.webp"
+        for img in ("images/catalogo/negro.webp", "/static/images/catalogo/negro.webp",
+                    "https://cdn.example.com/static/images/catalogo/negro.webp"):
+            with self.subTest(img=img):
+                self.assertEqual(asset_url(img), expected)
+        self.assertEqual(asset_url("images/nueva.webp"), "https://cdn.example.com/static/images/nueva.webp")
+
+    def test_template_tags(self):
+        self.assertEqual(self._render("{% asset img %}", img="/static/images/catalogo/negro.webp"),
+                         "/static/images/catalogo/negro.3f2a9c.webp")
+        self.assertEqual(
+            self._render('{% preload_image img media="(max-width: 600px)" %}', img="images/catalogo/negro.webp"),
+            '<link rel="preload" as="image" href="/static/images/catalogo/negro.3f2a9c.webp" '
+            'media="(max-width: 600px)" fetchpriority="high">',
+        )
+        self.assertEqual(
+            self._render("{% preload_image img %}", img="https://res.cloudinary.com/demo/image/upload/a&b.jpg"),
+            '<link rel="preload" as="image" href="https://res.cloudinary.com/demo/image/upload/a&amp;b.jpg" '
+            'fetchpriority="high">',
+        )
+        self.assertEqual(self._render("{% preload_image img %}", img=""), "")
+
+    def test_variant_img_srcset_uses_manifest_names(self):
+        """Las claves de variantes responsive pasan por el mismo manifest que el original."""
+        rel = "images/resp/images-catalogo-negro.abababab.320.webp"
+        entry = {"widths": [320], "files": {"webp": {"320": rel}}}
+        hashed = {rel: "images/resp/images-catalogo-negro.abababab.320.77e1d0.webp"}
+        Path(settings.STATIC_ROOT, "staticfiles.json").write_text(json.dumps({"version": "1.1", "paths": hashed}))
+        with override_settings(STATIC_ROOT=settings.STATIC_ROOT), \
+                mock.patch("orders.images.load_manifest", return_value={"images/catalogo/negro.webp": entry}):
+            sources = responsive_sources("/static/images/catalogo/negro.webp")
+        self.assertEqual(sources["webp"], f"/static/{hashed[rel]} 320w")
+
+
+class HealthzTests(TestCase):
+    """/healthz/ para el balanceador: anónimo, sin sesión, y 503 si la DB no responde."""
+
+    def test_ok_without_auth_or_session(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get("/healthz/")
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual((data["ok"], data["db"]), (True, "ok"))
+        self.assertEqual(data["pid"], os.getpid())
+        self.assertIn("cache", data)
+        self.assertEqual(r["Cache-Control"], "no-store")
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, r.cookies)
+        self.assertEqual([q["sql"] for q in ctx.captured_queries], ["SELECT 1"])  # ni sesión ni usuario
+
+    def test_db_down_is_503(self):
+        down = mock.Mock()
+        down.cursor.side_effect = OperationalError("connection refused")
+        with mock.patch("orders.views.connection", down), self.assertLogs("orders.views", "WARNING"):
+            r = self.client.get("/healthz/")
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual((r.json()["ok"], r.json()["db"]), (False, "error"))
@@ -0,0 +1,186 @@
+# orders/transitions.py
+"""
+Motor único de cambios de estado de órdenes.
+
+Todos los cambios (dashboard, admin, webhook) pasan por transition():
+- solo transiciones permitidas (ALLOWED)
+- un UPDATE condicional por estado destino, aunque sean 500 órdenes
+- historial en OrderStatusChange
+- hooks por lote (no por fila), dentro de la misma transacción
+- avisos al cliente por outbox (orders/notifications.py): se encolan acá, se envían aparte
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .inventory import apply_stock_changes
+from .models import Order, OrderStatusChange, StockMovement, Variant
+from .notifications import STATUS_EVENTS, enqueue
+from .rollups import REVENUE_STATUSES, apply_orders
+
+logger = logging.getLogger(__name__)
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+# estado actual -> estados a los que se puede pasar
+ALLOWED = {
+    "pending": {"payment_link_created", "paid", "processing", "cancelled"},  # transferencia: pending -> processing
+    "payment_link_created": {"pending", "paid", "cancelled"},
+    "paid": {"processing", "shipped", "cancelled"},
+    "processing": {"shipped", "cancelled"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+
+class TransitionError(Exception):
+    pass
+
+
+def sources_for(to_status: str) -> list:
+    """Estados desde los que se puede llegar a `to_status`."""
+    return [s for s, targets in ALLOWED.items() if to_status in targets]
+
+
+def next_statuses(status: str) -> list:
+    """[(key, label)] a los que puede pasar una orden (para los selects del dashboard)."""
+    return [(k, label) for k, label in Order.STATUS_CHOICES if k in ALLOWED.get(status, ())]
+
+
+# =========================
+# Hooks
+# =========================
+_hooks = defaultdict(list)
+
+
+def on_transition(*statuses):
+    """
+    Registra un hook para uno o más estados destino (sin args = todos).
+    El hook recibe [(order, from_status), ...] con order.status ya actualizado.
+    """
+    def register(fn):
+        for s in statuses or ("*",):
+            _hooks[s].append(fn)
+        return fn
+    return register
+
+
+@on_transition("cancelled")
+def release_stock(changes):
+    """
+    Devuelve al inventario lo que la orden sacó en el checkout.
+    Sale del ledger (neto por orden + variant), así una orden nunca libera dos veces
+    ni libera más de lo que descontó aunque se haya editado la qty después.
+    """
+    orders = {order.pk: order for order, _ in changes}
+    net = (
+        StockMovement.objects
+        .filter(order_id__in=list(orders), variant__isnull=False)
+        .values("order_id", "variant_id")
+        .annotate(net=Sum("delta"))
+    )
+    per_order = defaultdict(list)
+    for row in net:
+        if row["net"] < 0:
+            per_order[row["order_id"]].append((row["variant_id"], -row["net"]))
+    if not per_order:
+        return
+
+    variant_ids = {vid for lines in per_order.values() for vid, _ in lines}
+    variants = Variant.objects.select_for_update().in_bulk(sorted(variant_ids))
+    for order_id, lines in per_order.items():
+        apply_stock_changes(
+            [(variants[vid], qty) for vid, qty in lines],
+            "cancel",
+            order=orders[order_id],
+        )  # invalida el cache de disponibilidad en on_commit
+
+
+@on_transition()
+def update_rollups(changes):
+    """Órdenes que entran a (o salen de) los estados de venta, en un solo lote cada una."""
+    entering = [o for o, old in changes if o.status in REVENUE_STATUSES and old not in REVENUE_STATUSES]
+    leaving = [o for o, old in changes if o.status not in REVENUE_STATUSES and old in REVENUE_STATUSES]
+    apply_orders(entering, 1)
+    apply_orders(leaving, -1)
+
+
+@on_transition(*STATUS_EVENTS)
+def queue_notifications(changes):
+    """Aviso al cliente: solo el INSERT al outbox; lo envía dispatch_notifications."""
+    enqueue([(o, o.status) for o, _ in changes])
+
+
+# =========================
+# Motor
+# =========================
+def transition(orders, to_status: str, source: str = "", actor: str = "") -> tuple:
+    """
+    Pasa un lote de órdenes (queryset, órdenes o ids) a `to_status`.
+    Las que no pueden hacer esa transición se saltan (no es error).
+    Devuelve (movidas, saltadas) como listas de Order.
+    """
+    if to_status not in STATUS_LABELS:
+        raise TransitionError(f"Estado inválido: {to_status}")
+
+    if hasattr(orders, "values_list"):
+        ids = list(orders.values_list("pk", flat=True))
+    else:
+        ids = [getattr(o, "pk", o) for o in orders]
+
+    allowed_from = sources_for(to_status)
+
+    with transaction.atomic():
+        locked = list(Order.objects.select_for_update().filter(pk__in=ids).order_by("pk"))
+        moved = [o for o in locked if o.status in allowed_from]
+        skipped = [o for o in locked if o.status not in allowed_from]
+        if not moved:
+            return moved, skipped
+
+        now = timezone.now()
+        # condicional: si algo cambió el estado entre medio (SQLite no bloquea filas), no se pisa
+        updated = Order.objects.filter(pk__in=[o.pk for o in moved], status__in=allowed_from).update(
+            status=to_status,
+            updated_at=now,
+        )
+        if updated != len(moved):
+            # 👇 historial, stock, rollups y avisos solo para las que este UPDATE movió de verdad
+            done = set(
+                Order.objects.filter(pk__in=[o.pk for o in moved], status=to_status, updated_at=now)
+                .values_list("pk", flat=True)
+            )
+            lost = [o for o in moved if o.pk not in done]
+            for o in lost:
+                o.refresh_from_db(fields=["status", "updated_at"])
+            moved = [o for o in moved if o.pk in done]
+            skipped += lost
+            if not moved:
+                return moved, skipped
+
+        changes = []
+        for o in moved:
+            changes.append((o, o.status))
+            o.status = to_status
+            o.updated_at = now
+
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(
+                order=o,
+                order_number=o.order_number,
+                from_status=old,
+                to_status=to_status,
+                source=source,
+                actor=actor,
+            )
+            for o, old in changes
+        ])
+
+        for hook in _hooks[to_status] + _hooks["*"]:
+            hook(changes)
+
+    logger.info("🔁 %s orden(es) -> %s (%s)", len(moved), to_status, source or "—")
+    return moved, skipped
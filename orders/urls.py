@@ -1,5 +1,5 @@
 from django.urls import path
-from .api import create_order
+from .api import cart_quote, catalog_cards, create_order, stock_availability
 from .views import wompi_callback, payment_success
 from . import views
 
@@ -8,8 +8,12 @@ app_name = "orders"
 urlpatterns = [
     # API / pagos
     path("api/orders/create/", create_order, name="create_order"),
+    path("api/catalog/", catalog_cards, name="catalog_cards"),
+    path("api/stock/", stock_availability, name="stock_availability"),
+    path("api/cart/quote/", cart_quote, name="cart_quote"),
     path("wompi/callback/", wompi_callback, name="wompi_callback"),
     path("payment/success/", payment_success, name="payment_success"),
+    path("healthz/", views.healthz, name="healthz"),
 
     # Dashboard auth
     path("dashboard/login/", views.dashboard_login, name="dashboard_login"),
@@ -17,12 +21,21 @@ urlpatterns = [
 
     # Dashboard
     path("dashboard/orders/", views.dashboard_orders, name="dashboard_orders"),
+    path("dashboard/orders/bulk/status/", views.dashboard_orders_bulk_status, name="dashboard_orders_bulk_status"),
+    path("dashboard/orders/bulk/tracking/", views.dashboard_orders_tracking_import, name="dashboard_orders_tracking_import"),
+    path("dashboard/orders/packing-slips/", views.dashboard_packing_slips, name="dashboard_packing_slips"),
+    path("dashboard/orders/bulk/documents/", views.dashboard_orders_documents, name="dashboard_orders_documents"),
+    path("dashboard/orders/<int:pk>/document/<str:doc>/", views.dashboard_order_document, name="dashboard_order_document"),
+    path("dashboard/jobs/<int:pk>/", views.dashboard_bulk_job, name="dashboard_bulk_job"),
+    path("dashboard/jobs/<int:pk>/download/", views.dashboard_bulk_job_download, name="dashboard_bulk_job_download"),
     path("dashboard/orders/<int:pk>/", views.dashboard_order_detail, name="dashboard_order_detail"),
+    path("dashboard/archive/<int:pk>/", views.dashboard_archived_order_detail, name="dashboard_archived_order_detail"),
     path("dashboard/orders/<int:pk>/update/", views.dashboard_order_update, name="dashboard_order_update"),
     path("dashboard/order-items/<int:pk>/qty/", views.dashboard_orderitem_qty, name="dashboard_orderitem_qty"),
     path("dashboard/orders/<int:pk>/status/", views.dashboard_order_quick_status, name="dashboard_order_quick_status"),
     
     path("dashboard/inventory/", views.dashboard_inventory, name="dashboard_inventory"),
+    path("dashboard/analytics/", views.dashboard_analytics, name="dashboard_analytics"),
     path("dashboard/inventory/<int:pk>/", views.dashboard_variant_detail, name="dashboard_variant_detail"),
     path("dashboard/inventory/<int:pk>/set/", views.dashboard_variant_set_stock, name="dashboard_variant_set_stock"),
     
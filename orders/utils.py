@@ -5,3 +5,15 @@ def generate_order_number(prefix="BAS"):
     d = timezone.now().strftime("%Y%m%d")
     r = random.randint(1000, 9999)
     return f"{prefix}-{d}-{r}"
+
+
+# ---- Tallas ----
+SHIRT_SIZES = {"S", "M", "L", "XL", "XXL"}
+ONE_SIZE_ALIASES = {"UNI", "UNICA", "ÚNICA", "ONE", "ONE SIZE", "OS", "U"}
+
+
+def normalize_size(val) -> str:
+    s = str(val or "").strip().upper()
+    if s in ONE_SIZE_ALIASES:
+        return "UNI"
+    return s
@@ -2,20 +2,50 @@ import json
 import logging
 import hmac
 import hashlib
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
-from django.db import models
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-
-from .models import Order, OrderItem, Product, Variant
+from django.views.decorators.http import require_GET, require_POST
+
+from .assets import asset_url
+from .bulk import MAX_ERRORS, parse_tracking_csv, start_job
+from .cache import CATALOG, PRICES, app_cache
+from .documents import DOC_KINDS, job_output_path, render_documents
+from .images import responsive_sources
+from .inventory import set_stock
+from .models import (
+    ArchivedOrder,
+    BulkJob,
+    LowStockAlert,
+    Order,
+    OrderItem,
+    Product,
+    SalesDay,
+    SalesDayItem,
+    Variant,
+)
+from .notifications import enqueue_tracking
+from .pricing import get_price_list
+from .ratelimit import blocked_counters
+from .replica import read_replica
+from .transitions import STATUS_LABELS, TransitionError, next_statuses, transition
+from .utils import ONE_SIZE_ALIASES
+from .whatsapp import refresh_whatsapp
 from .wompi_redirect import validate_redirect_hash_payment_link
 
 logger = logging.getLogger(__name__)
@@ -30,13 +60,32 @@ def staff_required(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
 
-import json
-from collections import defaultdict
-from .models import Variant
+def _dashboard_transition(request, order, new_status):
+    try:
+        moved, _ = transition([order], new_status, source="dashboard", actor=request.user.get_username())
+    except TransitionError as e:
+        messages.error(request, str(e))
+        return
+    if not moved:
+        messages.error(
+            request,
+            f"{order.order_number}: no se puede pasar de {order.get_status_display()} "
+            f"a {STATUS_LABELS.get(new_status, new_status)}.",
+        )
+
+
+CATALOG_CACHE_TTL = 60  # segundos; igual se invalida al cambiar precios / productos / agotarse algo
 
-SIZES = ["S", "M", "L", "XL", "XXL"]
 
 def build_men_cards():
+    """
+    Cards del catálogo desde el cache de dos niveles (orders/cache.py).
+    ⚠️ La lista es compartida entre requests: filtrar / cortar, no modificar.
+    """
+    return app_cache.get_or_set("catalog:cards", _build_men_cards, ttl=CATALOG_CACHE_TTL, tags=[CATALOG, PRICES])
+
+
+def _build_men_cards():
     """
     Cards agrupadas para el catálogo:
     - Camisas: agrupa por producto + sleeve + color + price + compare_at (NO por img)
@@ -45,14 +94,24 @@ def build_men_cards():
     - kind: shirt vs accessory según tallas reales (UNI / única / one size)
     """
 
-    variants = Variant.objects.filter(active=True, inventory__gt=0).select_related("product")
+    # ⚠️ del primario siempre, aunque el request lea de la réplica: esto queda en el cache compartido
+    # para todos, y justo después de invalidar (on_commit de una escritura) la réplica viene atrasada
+    variants = list(
+        Variant.objects.using("default").filter(active=True, inventory__gt=0).select_related("product")
+    )
+
+    # precios de la misma lista que cotiza el checkout
+    price_list = get_price_list()
+    for v in variants:
+        entry = price_list.get(v.sku)
+        if entry:
+            v.price, v.compare_at = entry.price, entry.compare_at
 
     def norm(s):
         return (str(s or "").strip()).upper()
 
     def is_one_size(sz: str) -> bool:
-        s = norm(sz)
-        return s in {"UNI", "UNICA", "ÚNICA", "ONE", "ONE SIZE", "OS", "U"}
+        return norm(sz) in ONE_SIZE_ALIASES
 
     groups = defaultdict(list)
 
@@ -91,7 +150,8 @@ def build_men_cards():
             "sleeve": sleeve if not is_accessory else "Accesorio",
             "color": color,
             "fabric": group[0].fabric if group else "",
-            "img": img,
+            "img": asset_url(img),
+            "srcset": responsive_sources(img),
             "price": group[0].price if group else 0,
             "compare": group[0].compare_at if group else 0,
             "kind": kind,
@@ -127,32 +187,55 @@ def split_cards(cards):
     return shirts, caps, bags
 
 
-def home(request):
+CATALOG_PAGE_SIZE = 12  # cards renderizadas en el HTML; el resto llega por /api/catalog/
+
+
+def catalog_context():
+    """Primera página de cada grilla + si hay más (para el lazy-load por scroll)."""
     cards = build_men_cards()
     shirts, caps, bags = split_cards(cards)
-    return render(request, "index.html", {
-        "men_cards": shirts,
-        "caps_cards": caps,
-        "bags_cards": bags,
-    })
+
+    ctx = {"CATALOG_PAGE_SIZE": CATALOG_PAGE_SIZE}
+    for name, items in (("men_cards", shirts), ("caps_cards", caps), ("bags_cards", bags)):
+        ctx[name] = items[:CATALOG_PAGE_SIZE]
+        ctx[f"{name}_more"] = len(items) > CATALOG_PAGE_SIZE
+    return ctx
+
+
+def home(request):
+    return render(request, "index.html", catalog_context())
 
 def catalogo(request):
-    cards = build_men_cards()
-    shirts, caps, bags = split_cards(cards)
-    return render(request, "catalogo.html", {
-        "men_cards": shirts,
-        "caps_cards": caps,
-        "bags_cards": bags,
-    })
+    return render(request, "catalogo.html", catalog_context())
 
 def nocturne(request):
-    cards = build_men_cards()
-    shirts, caps, bags = split_cards(cards)
-    return render(request, "nocturne.html", {
-        "men_cards": shirts,
-        "caps_cards": caps,
-        "bags_cards": bags,
-    })
+    return render(request, "nocturne.html", catalog_context())
+
+
+# =========================
+# Health (gunicorn / Railway)
+# =========================
+_WORKER_STARTED = time.monotonic()
+
+
+@require_GET
+def healthz(request):
+    """
+    Salud del worker que atiende: pid + uptime (para ver el reciclado por max_requests),
+    si llega a la base y las métricas del cache de la app. 503 si la DB no responde (el balanceador lo saca).
+    """
+    data = {"ok": True, "pid": os.getpid(), "uptime": round(time.monotonic() - _WORKER_STARTED, 1)}
+    try:
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+        data["db"] = "ok"
+    except Exception as e:
+        logger.warning("⚠️ healthz: DB no responde: %s", e)
+        data.update(ok=False, db="error")
+    data["cache"] = app_cache.stats()
+    response = JsonResponse(data, status=200 if data["ok"] else 503)
+    response["Cache-Control"] = "no-store"
+    return response
 
 
 # =========================
@@ -188,17 +271,13 @@ def wompi_callback(request):
             return HttpResponse(status=200)
 
 
-        order = Order.objects.filter(
-            order_number=ref,
-            status__in=["pending", "payment_link_created"],
-        ).first()
+        # solo pending/payment_link_created pueden pasar a paid (un webhook repetido no hace nada)
+        moved, _ = transition(Order.objects.filter(order_number=ref), "paid", source="webhook")
 
-        if not order:
+        if not moved:
             logger.info("ℹ️ Orden no encontrada o ya procesada ref=%s", ref)
             return HttpResponse(status=200)
 
-        order.status = "paid"
-        order.save(update_fields=["status", "updated_at"])
         logger.info("✅ Orden %s confirmada vía webhook.", ref)
 
     except Exception as e:
@@ -256,14 +335,9 @@ def dashboard_logout(request):
 # =========================
 # Dashboard Orders
 # =========================
-@login_required
-@user_passes_test(staff_required)
-def dashboard_orders(request):
-    qs = Order.objects.all().order_by("-created_at")
-
-    q = (request.GET.get("q") or "").strip()
-    status = (request.GET.get("status") or "").strip()
-
+def _filtered_orders(model, q: str, status: str):
+    """Mismo filtro para el listado y para "seleccionar todo lo filtrado" en acciones masivas."""
+    qs = model.objects.all().order_by("-created_at")
     if q:
         qs = qs.filter(
             Q(order_number__icontains=q)
@@ -274,36 +348,56 @@ def dashboard_orders(request):
         )
     if status:
         qs = qs.filter(status=status)
+    return qs
 
-    base = Order.objects.all()
-    stats = {
-        "pending": base.filter(status="pending").count(),
-        "payment_link_created": base.filter(status="payment_link_created").count(),
-        "paid": base.filter(status="paid").count(),
-        "processing": base.filter(status="processing").count(),
-        "shipped": base.filter(status="shipped").count(),
-        "delivered": base.filter(status="delivered").count(),
-        "cancelled": base.filter(status="cancelled").count(),
-        "total": base.count(),
-    }
+
+@login_required
+@user_passes_test(staff_required)
+@read_replica()  # después del login: la sesión/usuario se leen del primario
+def dashboard_orders(request):
+    # por defecto solo datos "calientes"; el archivo se busca explícitamente (?archive=1)
+    archive = request.GET.get("archive") == "1"
+    model = ArchivedOrder if archive else Order
+
+    q = (request.GET.get("q") or "").strip()
+    status = (request.GET.get("status") or "").strip()
+    qs = _filtered_orders(model, q, status)
+
+    # una sola query (GROUP BY status) en vez de un COUNT por estado
+    per_status = dict(Order.objects.values_list("status").annotate(n=Count("id")).order_by())
+    stats = {key: per_status.get(key, 0) for key, _ in Order.STATUS_CHOICES}
+    stats["total"] = sum(per_status.values())
+
+    # pedidos bloqueados hoy por el rate limit (contadores en cache)
+    blocked = blocked_counters()
+    rate_limited = {"total": sum(blocked.values()), "rules": blocked}
 
     paginator = Paginator(qs, 25)
     page_obj = paginator.get_page(request.GET.get("page"))
+    if not archive:
+        page_obj.object_list = list(page_obj.object_list)
+        for o in page_obj.object_list:
+            o.next_statuses = next_statuses(o.status)
 
     return render(request, "dashboard/orders_list.html", {
         "page_obj": page_obj,
         "q": q,
         "status": status,
+        "archive": archive,
         "STATUS_CHOICES": Order.STATUS_CHOICES,
         "stats": stats,
+        "rate_limited": rate_limited,
     })
 
 
 @login_required
 @user_passes_test(staff_required)
 def dashboard_order_detail(request, pk):
-    order = get_object_or_404(Order.objects.prefetch_related("items"), pk=pk)
-    items = order.items.all().order_by("id")
+    order = get_object_or_404(Order, pk=pk)
+    items = list(order.items.select_related("variant").order_by("id"))
+
+    if not order.whatsapp_url:  # órdenes de antes del cache: en memoria, el GET no escribe (backfill_whatsapp)
+        refresh_whatsapp(order, items)
 
     flow = ["pending", "payment_link_created", "paid", "processing", "shipped", "delivered"]
     current = order.status
@@ -321,11 +415,26 @@ def dashboard_order_detail(request, pk):
     return render(request, "dashboard/order_detail.html", {
         "order": order,
         "items": items,
-        "STATUS_CHOICES": Order.STATUS_CHOICES,
+        "next_statuses": next_statuses(order.status),
+        "history": order.status_changes.order_by("-created_at")[:20],
         "timeline": timeline,
     })
 
 
+@login_required
+@user_passes_test(staff_required)
+def dashboard_archived_order_detail(request, pk):
+    """Orden archivada: misma vista que el detalle, pero solo lectura."""
+    order = get_object_or_404(ArchivedOrder, pk=pk)
+    items = order.items.all().order_by("id")
+
+    return render(request, "dashboard/order_detail.html", {
+        "order": order,
+        "items": items,
+        "archived": True,
+    })
+
+
 @login_required
 @user_passes_test(staff_required)
 @require_POST
@@ -335,12 +444,14 @@ def dashboard_order_update(request, pk):
     new_status = (request.POST.get("status") or "").strip()
     tracking = (request.POST.get("tracking_code") or "").strip()
 
-    valid_status = dict(Order.STATUS_CHOICES)
-    if new_status and new_status in valid_status:
-        order.status = new_status
+    if tracking != order.tracking_code:
+        order.tracking_code = tracking
+        with transaction.atomic():
+            order.save(update_fields=["tracking_code", "updated_at"])
+            enqueue_tracking([order])  # si ya estaba enviada: aviso con el código nuevo
 
-    order.tracking_code = tracking
-    order.save(update_fields=["status", "tracking_code", "updated_at"])
+    if new_status and new_status != order.status:
+        _dashboard_transition(request, order, new_status)
 
     return redirect("orders:dashboard_order_detail", pk=order.pk)
 
@@ -352,13 +463,149 @@ def dashboard_order_quick_status(request, pk):
     order = get_object_or_404(Order, pk=pk)
     new_status = (request.POST.get("status") or "").strip()
 
-    if new_status and new_status in dict(Order.STATUS_CHOICES):
-        order.status = new_status
-        order.save(update_fields=["status", "updated_at"])
+    if new_status and new_status != order.status:
+        _dashboard_transition(request, order, new_status)
 
     return redirect("orders:dashboard_orders")
 
 
+# =========================
+# Dashboard: acciones masivas
+# =========================
+MAX_PACKING_SLIPS = 500
+
+def _selected_ids(data) -> list:
+    """ids marcados, o todas las órdenes del filtro actual si viene all_matching=1."""
+    if data.get("all_matching") == "1":
+        qs = _filtered_orders(Order, (data.get("q") or "").strip(), (data.get("filter_status") or "").strip())
+        return list(qs.values_list("pk", flat=True))
+
+    ids = []
+    for raw in data.getlist("ids"):
+        for part in str(raw).split(","):
+            if part.strip().isdigit():
+                ids.append(int(part))
+    return list(dict.fromkeys(ids))  # sin duplicados, respeta el orden
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_POST
+def dashboard_orders_bulk_status(request):
+    ids = _selected_ids(request.POST)
+    status = (request.POST.get("status") or "").strip()
+
+    if not ids:
+        return JsonResponse({"ok": False, "detail": "No seleccionaste órdenes"}, status=400)
+    if status not in STATUS_LABELS:
+        return JsonResponse({"ok": False, "detail": "Estado inválido"}, status=400)
+
+    job = start_job("status", {"ids": ids, "status": status}, total=len(ids), created_by=request.user.get_username())
+    return JsonResponse({"ok": True, "job": job.pk, "progress_url": reverse("orders:dashboard_bulk_job", args=[job.pk])})
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_POST
+def dashboard_orders_tracking_import(request):
+    upload = request.FILES.get("csv")
+    if not upload:
+        return JsonResponse({"ok": False, "detail": "Subí un CSV (order_number,tracking_code)"}, status=400)
+
+    rows, errors = parse_tracking_csv(upload)
+    if not rows:
+        return JsonResponse({"ok": False, "detail": errors[0] if errors else "El CSV está vacío"}, status=400)
+
+    job = start_job(
+        "tracking",
+        {"rows": rows, "mark_shipped": request.POST.get("mark_shipped") == "1"},
+        total=len(rows),
+        created_by=request.user.get_username(),
+    )
+    if errors:
+        BulkJob.objects.filter(pk=job.pk).update(errors=errors[:MAX_ERRORS])
+    return JsonResponse({"ok": True, "job": job.pk, "progress_url": reverse("orders:dashboard_bulk_job", args=[job.pk])})
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_POST
+def dashboard_orders_documents(request):
+    """PDF (merge) o ZIP de packing slips / comprobantes: se arma en segundo plano con el pool."""
+    ids = _selected_ids(request.POST)[:MAX_PACKING_SLIPS]
+    doc = request.POST.get("doc") or "slip"
+    fmt = request.POST.get("format") or "pdf"
+
+    if not ids:
+        return JsonResponse({"ok": False, "detail": "No seleccionaste órdenes"}, status=400)
+    if doc not in DOC_KINDS or fmt not in ("pdf", "zip"):
+        return JsonResponse({"ok": False, "detail": "Documento inválido"}, status=400)
+
+    job = start_job(
+        "documents",
+        {"ids": ids, "doc": doc, "format": fmt},
+        total=len(ids),
+        created_by=request.user.get_username(),
+    )
+    return JsonResponse({"ok": True, "job": job.pk, "progress_url": reverse("orders:dashboard_bulk_job", args=[job.pk])})
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_GET
+def dashboard_bulk_job(request, pk):
+    job = get_object_or_404(BulkJob, pk=pk)
+    data = {
+        "ok": True,
+        "kind": job.kind,
+        "state": job.state,
+        "total": job.total,
+        "processed": job.processed,
+        "changed": job.changed,
+        "errors": job.errors,
+    }
+    if job.kind == "documents" and job.state == "done":
+        data["download_url"] = reverse("orders:dashboard_bulk_job_download", args=[job.pk])
+    return JsonResponse(data)
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_GET
+def dashboard_bulk_job_download(request, pk):
+    job = get_object_or_404(BulkJob, pk=pk, kind="documents", state="done")
+    fmt = job.params["format"]
+    path = job_output_path(job.pk, fmt)
+    if not path.exists():
+        raise Http404("El archivo ya no está disponible, generalo de nuevo.")
+
+    name = f"basalto-{DOC_KINDS[job.params['doc']]}-{job.created_at:%Y%m%d-%H%M}.{fmt}"
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)  # streaming por chunks
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_GET
+def dashboard_order_document(request, pk, doc):
+    """PDF de una sola orden (desde el detalle): sin job, sale del cache si no cambió."""
+    if doc not in DOC_KINDS:
+        raise Http404
+    order = get_object_or_404(Order, pk=pk)
+    [(order_number, path)] = render_documents([order.pk], doc)
+    return FileResponse(open(path, "rb"), filename=f"{DOC_KINDS[doc]}-{order_number}.pdf")
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_GET
+@read_replica()
+def dashboard_packing_slips(request):
+    """Packing slips imprimibles de las órdenes seleccionadas (2 queries, sin importar cuántas)."""
+    ids = _selected_ids(request.GET)[:MAX_PACKING_SLIPS]
+    orders = Order.objects.filter(pk__in=ids).prefetch_related("items").order_by("created_at")
+    return render(request, "dashboard/packing_slips.html", {"orders": orders})
+
+
 @login_required
 @user_passes_test(staff_required)
 @require_POST
@@ -371,6 +618,8 @@ def dashboard_orderitem_qty(request, pk):
         if qty_int >= 1:
             item.qty = qty_int
             item.save()  # recalcula line_total en save()
+            order = item.order
+            order.save(update_fields=refresh_whatsapp(order))  # cambió un item: mensaje nuevo
     except (TypeError, ValueError):
         pass
 
@@ -382,6 +631,7 @@ def dashboard_orderitem_qty(request, pk):
 # =========================
 @login_required
 @user_passes_test(staff_required)
+@read_replica()
 def dashboard_inventory(request):
     qs = Variant.objects.select_related("product").order_by("product__title", "sleeve", "color", "size")
 
@@ -398,12 +648,15 @@ def dashboard_inventory(request):
         )
 
     if low == "1":
-        qs = qs.filter(inventory__lte=models.F("low_stock_threshold"))
+        qs = qs.filter(low_stock=True)  # flag mantenido + índice parcial
+
+    open_alerts = LowStockAlert.objects.filter(resolved_at__isnull=True).count()
 
     return render(request, "dashboard/inventory_list.html", {
         "variants": qs[:300],  # luego lo paginamos
         "q": q,
         "low": low,
+        "open_alerts": open_alerts,
     })
 
 
@@ -411,20 +664,97 @@ def dashboard_inventory(request):
 @user_passes_test(staff_required)
 def dashboard_variant_detail(request, pk):
     v = get_object_or_404(Variant.objects.select_related("product"), pk=pk)
-    return render(request, "dashboard/variant_detail.html", {"v": v})
+    movements = v.movements.order_by("-created_at")[:20]
+    return render(request, "dashboard/variant_detail.html", {"v": v, "movements": movements})
 
 
 @login_required
 @user_passes_test(staff_required)
 @require_POST
 def dashboard_variant_set_stock(request, pk):
-    v = get_object_or_404(Variant, pk=pk)
     val = request.POST.get("inventory")
 
     try:
-        v.inventory = int(val)
-        v.save(update_fields=["inventory", "updated_at"])
+        new_inventory = int(val)
     except (TypeError, ValueError):
-        pass
+        return redirect("orders:dashboard_variant_detail", pk=pk)
+
+    with transaction.atomic():
+        v = get_object_or_404(Variant.objects.select_for_update(), pk=pk)
+        set_stock(v, new_inventory, reason="manual", actor=request.user.get_username())
 
     return redirect("orders:dashboard_variant_detail", pk=v.pk)
+
+
+# =========================
+# Dashboard Ventas (solo lee rollups)
+# =========================
+ANALYTICS_RANGES = (7, 30, 90, 365)
+
+
+def _with_pct(rows, field):
+    """Agrega 'pct' (0-100) relativo al máximo, para las barras CSS."""
+    top = max((r[field] or 0 for r in rows), default=0)
+    for r in rows:
+        r["pct"] = round(float(r[field] or 0) * 100 / float(top), 1) if top else 0
+    return rows
+
+
+@login_required
+@user_passes_test(staff_required)
+@read_replica()
+def dashboard_analytics(request):
+    try:
+        days = int(request.GET.get("days") or 30)
+    except ValueError:
+        days = 30
+    if days not in ANALYTICS_RANGES:
+        days = 30
+
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+
+    sales = SalesDay.objects.filter(day__gte=since)
+    items = SalesDayItem.objects.filter(day__gte=since)
+
+    totals = sales.aggregate(orders=Sum("orders"), units=Sum("units"), discount=Sum("discount"), total=Sum("total"))
+    totals = {k: v or 0 for k, v in totals.items()}
+    totals["avg_ticket"] = (totals["total"] / totals["orders"]).quantize(Decimal("0.01")) if totals["orders"] else 0
+
+    per_day = {
+        r["day"]: r
+        for r in sales.values("day").annotate(orders=Sum("orders"), units=Sum("units"), total=Sum("total"))
+    }
+    by_day = [
+        per_day.get(d, {"day": d, "orders": 0, "units": 0, "total": 0})
+        for d in (since + timedelta(days=i) for i in range(days))
+    ]
+
+    by_department = list(
+        sales.values("department").annotate(orders=Sum("orders"), total=Sum("total")).order_by("-total")
+    )
+    by_payment = list(
+        sales.values("payment_method").annotate(orders=Sum("orders"), total=Sum("total")).order_by("-total")
+    )
+    payment_labels = dict(Order.PAYMENT_CHOICES)
+    for r in by_payment:
+        r["label"] = payment_labels.get(r["payment_method"], r["payment_method"])
+
+    top_skus = list(
+        items.values("sku", "title").annotate(units=Sum("units"), revenue=Sum("revenue")).order_by("-revenue")[:15]
+    )
+    by_product = list(
+        items.values("product__title").annotate(units=Sum("units"), revenue=Sum("revenue")).order_by("-revenue")[:10]
+    )
+
+    return render(request, "dashboard/analytics.html", {
+        "days": days,
+        "since": since,
+        "RANGES": ANALYTICS_RANGES,
+        "totals": totals,
+        "by_day": _with_pct(by_day, "total"),
+        "by_department": _with_pct(by_department, "total"),
+        "by_payment": _with_pct(by_payment, "total"),
+        "top_skus": _with_pct(top_skus, "revenue"),
+        "by_product": _with_pct(by_product, "revenue"),
+    })
@@ -0,0 +1,87 @@
+# orders/whatsapp.py
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+
+PREORDER_NOTICE = (
+    "Pre-order — producción por lote.\n"
+    "Tu pedido se confecciona especialmente para vos.\n"
+    "Producción: 10–15 días.\n"
+    "Envío: San Salvador 3 días · departamentos 4–5 días hábiles.\n"
+)
+
+TRANSFER_INFO = (
+    "Transferencia bancaria:\n"
+    "Banco: BANCO AGRICOLA\n"
+    "Cuenta de ahorro: 3550507559\n"
+    "A nombre de: WILDER DIAZ\n"
+    "Referencia: {ref}\n"
+    "Enviá tu comprobante por este chat para confirmar tu pre-order.\n"
+)
+
+
+def build_message(order, items) -> str:
+    """
+    Mensaje del pedido para WhatsApp.
+    `items` son los OrderItem ya en memoria (con .variant cargado si tienen SKU):
+    no hace queries.
+    """
+    lines = []
+    lines.append(f"Pedido BASALTO: {order.order_number}")
+    lines.append("")
+    for it in items:
+        sku_txt = f" | SKU {it.variant.sku}" if it.variant_id else ""
+        lines.append(
+            f"- {it.title} | {it.sleeve} | {it.color} | Talla {it.size} | x{it.qty} — ${it.unit_price}{sku_txt}"
+        )
+    lines.append("")
+    lines.append(f"Subtotal: ${order.subtotal}")
+    if order.discount:
+        lines.append(f"Descuento: -${order.discount}")
+    lines.append(f"Envío (El Salvador): ${order.shipping}")
+    lines.append(f"Total: ${order.total}")
+    lines.append("")
+    lines.append("Datos de envío:")
+    lines.append(f"Nombre: {order.full_name}")
+    lines.append(f"Tel: {order.phone}")
+    addr = f"{order.address_line1} {order.address_line2}".strip()
+    lines.append(f"Dirección: {addr}")
+    if order.city:
+        lines.append(f"Ciudad/Municipio: {order.city}")
+    if order.department:
+        lines.append(f"Departamento: {order.department}")
+    lines.append("")
+    lines.append(f"Método de pago: {order.payment_method.upper()}")
+    lines.append("")
+    lines.append(PREORDER_NOTICE.strip())
+    if order.payment_method == "transfer":
+        lines.append("")
+        lines.append(TRANSFER_INFO.format(ref=order.order_number).strip())
+    if order.payment_link:
+        lines.append("")
+        lines.append(f"Link de pago (Wompi): {order.payment_link}")
+    return "\n".join(lines)
+
+
+def wa_link(number: str, message: str) -> str:
+    return f"https://wa.me/{number}?text={quote(message, safe='')}"
+
+
+def customer_number(phone: str) -> str:
+    """Teléfono del cliente en formato wa.me (503 + 8 dígitos si vino sin código de país)."""
+    digits = re.sub(r"\D", "", phone or "")
+    return f"503{digits}" if len(digits) == 8 else digits
+
+
+def refresh_whatsapp(order, items=None) -> list:
+    """
+    Recalcula whatsapp_message / whatsapp_url en la instancia (no guarda).
+    Llamar solo cuando cambian items, totales o el link de pago.
+    Devuelve los campos a pasar en update_fields.
+    """
+    if items is None:
+        items = order.items.select_related("variant").order_by("id")
+    order.whatsapp_message = build_message(order, items)
+    order.whatsapp_url = wa_link(getattr(settings, "BASALTO_WHATSAPP_NUMBER", "50300000000"), order.whatsapp_message)
+    return ["whatsapp_message", "whatsapp_url"]
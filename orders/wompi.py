@@ -1,10 +1,14 @@
 # orders/wompi.py
-import time
-import requests
 from django.conf import settings
 
+from .cache import app_cache
+
+# requests (+ urllib3, certifi...) se importa dentro de cada llamada: solo lo pagan checkout / conciliación
+
 def wompi_app_ping():
     token = get_wompi_token()
+    import requests
+
     r = requests.get(
         f"{settings.WOMPI_API_BASE}/Aplicativo",
         headers={"Authorization": f"Bearer {token}"},
@@ -13,19 +17,29 @@ def wompi_app_ping():
     return r.status_code, r.text
 
 
-_token_cache = {"token": None, "exp": 0}
+TOKEN_CACHE_KEY = "wompi:token"
+
 
 def get_wompi_token() -> str:
+    """
+    Token compartido entre workers (orders/cache.py) hasta 30 s antes de vencer.
+    La conciliación pide links en paralelo: get_or_set hace un solo refresh a la vez.
+    """
+    data = app_cache.get_or_set(TOKEN_CACHE_KEY, _fetch_token, ttl=lambda d: d["expires_in"] - 30)
+    return data["token"]
+
+
+def forget_token():
+    app_cache.delete(TOKEN_CACHE_KEY)
+
+
+def _fetch_token() -> dict:
     print("WOMPI DEBUG:",
           "ID=", settings.WOMPI_CLIENT_ID[:6] + "..." if settings.WOMPI_CLIENT_ID else "EMPTY",
           "SECRET=", "SET" if settings.WOMPI_CLIENT_SECRET else "EMPTY",
           "AUD=", settings.WOMPI_AUDIENCE,
           "TOKEN_URL=", settings.WOMPI_TOKEN_URL
     )
-    
-    now = int(time.time())
-    if _token_cache["token"] and now < _token_cache["exp"] - 30:
-        return _token_cache["token"]
 
     token_data = {
         "grant_type": "client_credentials",
@@ -34,6 +48,8 @@ def get_wompi_token() -> str:
         "audience": settings.WOMPI_AUDIENCE,
     }
 
+    import requests
+
     r = requests.post(
         settings.WOMPI_TOKEN_URL,
         data=token_data,
@@ -49,13 +65,11 @@ def get_wompi_token() -> str:
     if not token:
         raise Exception(f"No se recibió access_token. Respuesta: {data}")
 
-    expires_in = int(data.get("expires_in", 3600))
-    _token_cache["token"] = token
-    _token_cache["exp"] = now + expires_in
-    return token
+    return {"token": token, "expires_in": int(data.get("expires_in", 3600))}
 
 
-def create_payment_link(order_number: str, amount_usd: float, success_url: str, webhook_url: str) -> str:
+def create_payment_link(order_number: str, amount_usd: float, success_url: str, webhook_url: str) -> tuple:
+    """Crea el enlace de pago. Devuelve (urlEnlace, idEnlace); el id sirve para conciliar después."""
     token = get_wompi_token()
 
     payload = {
@@ -68,6 +82,8 @@ def create_payment_link(order_number: str, amount_usd: float, success_url: str,
         },
     }
 
+    import requests
+
     r = requests.post(
         f"{settings.WOMPI_API_BASE}/EnlacePago",
         json=payload,
@@ -87,4 +103,50 @@ def create_payment_link(order_number: str, amount_usd: float, success_url: str,
     link = data.get("urlEnlace") or data.get("UrlEnlace")
     if not link:
         raise Exception(f"No se recibió urlEnlace. Respuesta: {data}")
-    return link
+    link_id = data.get("idEnlace") or data.get("IdEnlace") or ""
+    return link, str(link_id)
+
+
+APPROVED_RESULTS = ("ExitosaAprobada",)
+
+
+def _link_transactions(data: dict) -> list:
+    """Las transacciones de un enlace vienen como lista o como un solo objeto según la versión del API."""
+    for key in ("transacciones", "Transacciones", "transaccionCompra", "TransaccionCompra"):
+        value = data.get(key)
+        if isinstance(value, list):
+            return value
+        if isinstance(value, dict):
+            return [value]
+    return []
+
+
+def get_payment_link_status(link_id: str) -> dict:
+    """
+    Estado de cobro de un enlace (GET /EnlacePago/{id}).
+    {"found": bool, "paid": bool, "transaction_id": str, "amount": str|None}
+    """
+    token = get_wompi_token()
+    import requests
+
+    r = requests.get(
+        f"{settings.WOMPI_API_BASE}/EnlacePago/{link_id}",
+        headers={"Authorization": f"Bearer {token}", "User-Agent": "Basalto/1.0"},
+        timeout=15
+    )
+    if r.status_code == 404:
+        return {"found": False, "paid": False, "transaction_id": "", "amount": None}
+    if not r.ok:
+        raise Exception(f"ENLACE {link_id} {r.status_code}: {r.text[:200]}")
+
+    for tx in _link_transactions(r.json()):
+        result = tx.get("resultadoTransaccion") or tx.get("ResultadoTransaccion")
+        if tx.get("esAprobada") or tx.get("EsAprobada") or result in APPROVED_RESULTS:
+            amount = tx.get("monto", tx.get("Monto"))
+            return {
+                "found": True,
+                "paid": True,
+                "transaction_id": str(tx.get("idTransaccion") or tx.get("IdTransaccion") or ""),
+                "amount": None if amount is None else str(amount),
+            }
+    return {"found": True, "paid": False, "transaction_id": "", "amount": None}
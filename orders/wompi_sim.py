@@ -0,0 +1,383 @@
+# orders/wompi_sim.py
+"""
+Wompi SV simulado (python manage.py wompi_simulator) para pruebas de carga e integración.
+
+Implementa lo que usa orders/wompi.py:
+  POST /connect/token        token client_credentials
+  GET  /Aplicativo           datos del aplicativo (pide Bearer)
+  POST /EnlacePago           crea enlace (idEnlace + urlEnlace)
+  GET  /EnlacePago/{id}      enlace + transacciones (lo que consulta la conciliación)
+  GET  /pay/{id}             "el cliente paga": redirect firmado a urlRedirect + webhook
+
+Con latencia, errores al azar y throttling (429) configurables. Los webhooks salen
+firmados igual que Wompi (wompi_hash = HMAC-SHA256 del body con el client secret),
+a un ritmo fijo por segundo, con reintentos.
+
+Sin Django a propósito: se puede levantar solo, apuntando a cualquier backend.
+El servidor HTTP es el mismo andamiaje del stub de tests (LocalHTTPServer, orders/wompi_stub.py).
+"""
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlencode
+
+from .wompi_stub import LocalHTTPServer
+
+WEBHOOK_RETRIES = 3
+WEBHOOK_RETRY_DELAY = 5.0
+TOKEN_TTL = 3600
+
+
+@dataclass
+class SimConfig:
+    secret: str
+    latency_ms: tuple = (0, 0)  # (min, max) por request
+    error_rate: float = 0.0  # fracción de requests al API que responden 500/503
+    rps: float = 0.0  # throttling global (token bucket); 0 = sin límite
+    webhook_url: str = ""  # pisa el urlWebhook de cada enlace (ej. backend local)
+    webhook_rate: float = 5.0  # webhooks por segundo
+    auto_pay: float = 0.0  # fracción de enlaces que se pagan solos
+    pay_delay: float = 2.0  # segundos entre crear el enlace y el pago automático
+    bad_signature_rate: float = 0.0  # webhooks con hash inválido (simula rechazos)
+    # Wompi manda "wompi_hash"; runserver (y gunicorn >= 22 sin config/gunicorn.conf.py) descartan headers con "_"
+    # (Django lee igual "Wompi-Hash": request.headers cambia "_" por "-")
+    hash_header: str = "wompi_hash"
+    seed: int = None
+
+
+@dataclass
+class _Link:
+    id: int
+    reference: str
+    amount: float
+    product: str
+    redirect_url: str
+    webhook_url: str
+    transactions: list = field(default_factory=list)
+
+
+class _Bucket:
+    """Token bucket: `rate` requests/seg con ráfaga de `rate`."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """0 si pasa; si no, segundos hasta que haya lugar (para Retry-After)."""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+def sign(secret: str, raw: bytes) -> str:
+    return hmac.new(secret.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+
+
+def redirect_hash(secret: str, reference: str, tx_id: str, link_id: str, amount: str) -> str:
+    """Mismo concat que valida orders/wompi_redirect.py."""
+    return sign(secret, f"{reference}{tx_id}{link_id}{amount}".encode("utf-8"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _gate(self) -> bool:
+        """Throttling + latencia + errores al azar. False si ya se respondió."""
+        sim = self.server.owner
+        conf = sim.config
+        sim.bump("requests")
+
+        wait = sim._bucket.take()
+        if wait:
+            sim.bump("throttled")
+            self._json(429, {"error": "Too Many Requests"}, {"Retry-After": str(max(1, round(wait)))})
+            return False
+
+        lo, hi = conf.latency_ms
+        if hi > 0:
+            time.sleep(sim.random.uniform(lo, hi) / 1000)
+
+        if conf.error_rate and sim.random.random() < conf.error_rate:
+            sim.bump("errors")
+            self._json(sim.random.choice((500, 503)), {"error": "simulated failure"})
+            return False
+        return True
+
+    def do_POST(self):
+        sim = self.server.owner
+        raw = self._body()
+        path = self.path.split("?", 1)[0]
+
+        if not self._gate():
+            return
+
+        if path == "/connect/token":
+            return self._json(200, sim.issue_token())
+
+        if not sim.token_ok(self.headers.get("Authorization", "")):
+            return self._json(401, {"error": "invalid_token"})
+
+        if path == "/EnlacePago":
+            try:
+                data = json.loads(raw or b"{}")
+            except ValueError:
+                return self._json(400, {"error": "JSON inválido"})
+            if not data.get("identificadorEnlaceComercio") or not data.get("monto"):
+                return self._json(400, {"error": "identificadorEnlaceComercio y monto son requeridos"})
+            return self._json(200, sim.create_link(data))
+
+        self._json(404, {"error": "not found"})
+
+    def do_GET(self):
+        sim = self.server.owner
+        path = self.path.split("?", 1)[0]
+
+        m = re.fullmatch(r"/pay/(\d+)", path)
+        if m:  # navegador del cliente: sin throttling ni token
+            location = sim.pay(int(m.group(1)))
+            if location is None:
+                return self._json(404, {"error": "enlace no existe"})
+            if not location:
+                return self._json(200, {"ok": True})
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if not self._gate():
+            return
+        if not sim.token_ok(self.headers.get("Authorization", "")):
+            return self._json(401, {"error": "invalid_token"})
+
+        if path == "/Aplicativo":
+            return self._json(200, {"nombre": "Basalto (simulador)", "estaProductivo": False, "enlaces": len(sim.links)})
+
+        m = re.fullmatch(r"/EnlacePago/(\d+)", path)
+        if m:
+            with sim.lock:
+                link = sim.links.get(int(m.group(1)))
+                info = sim.link_info(link) if link else None
+            if info is None:
+                return self._json(404, {"error": "enlace no existe"})
+            return self._json(200, info)
+
+        self._json(404, {"error": "not found"})
+
+
+class WompiSimulator(LocalHTTPServer):
+    handler_class = _Handler
+    thread_name = "wompi-sim-http"
+
+    def __init__(self, config: SimConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.links = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1000)
+        self.stats = {k: 0 for k in (
+            "requests", "throttled", "errors", "links", "payments",
+            "webhooks_sent", "webhooks_failed", "webhooks_bad_signature",
+        )}
+        self._bucket = _Bucket(config.rps)
+
+        self._queue = []  # heap de (due, seq, url, body, intento)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._webhooks = None
+        super().__init__(host, port)
+
+    # ---------- ciclo de vida ----------
+    def start(self):
+        self._webhooks = threading.Thread(target=self._webhook_loop, name="wompi-sim-webhooks", daemon=True)
+        self._webhooks.start()
+        return super().start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        super().stop()
+
+    def bump(self, key: str, n: int = 1):
+        with self.lock:
+            self.stats[key] += n
+
+    # ---------- dominio ----------
+    def issue_token(self) -> dict:
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self.tokens[token] = time.time() + TOKEN_TTL
+        return {"access_token": token, "expires_in": TOKEN_TTL, "token_type": "Bearer"}
+
+    def token_ok(self, header: str) -> bool:
+        token = header[7:] if header.startswith("Bearer ") else ""
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def create_link(self, data: dict) -> dict:
+        conf = data.get("configuracion") or {}
+        link = _Link(
+            id=next(self.ids),
+            reference=str(data.get("identificadorEnlaceComercio") or ""),
+            amount=float(data.get("monto") or 0),
+            product=str(data.get("nombreProducto") or ""),
+            redirect_url=conf.get("urlRedirect") or "",
+            webhook_url=conf.get("urlWebhook") or "",
+        )
+        with self.lock:
+            self.links[link.id] = link
+        self.bump("links")
+
+        if self.config.auto_pay and self.random.random() < self.config.auto_pay:
+            threading.Timer(self.config.pay_delay, self.pay, args=(link.id,)).start()
+
+        return {
+            "idEnlace": link.id,
+            "urlEnlace": f"{self.url}/pay/{link.id}",
+            "urlQrCodeEnlace": f"{self.url}/pay/{link.id}/qr",
+            "estaProductivo": False,
+        }
+
+    def link_info(self, link: _Link) -> dict:
+        return {
+            "idEnlace": link.id,
+            "identificadorEnlaceComercio": link.reference,
+            "monto": link.amount,
+            "nombreProducto": link.product,
+            "urlEnlace": f"{self.url}/pay/{link.id}",
+            "transacciones": list(link.transactions),
+        }
+
+    def pay(self, link_id: int):
+        """Pago aprobado: queda en el enlace, sale el webhook y devuelve la URL de redirect firmada."""
+        with self.lock:
+            link = self.links.get(link_id)
+            if link is None:
+                return None
+            tx_id = secrets.token_hex(8)
+            now = datetime.now(timezone.utc).isoformat()
+            link.transactions.append({
+                "idTransaccion": tx_id,
+                "esAprobada": True,
+                "resultadoTransaccion": "ExitosaAprobada",
+                "monto": link.amount,
+                "fechaTransaccion": now,
+            })
+        self.bump("payments")
+
+        body = {
+            "IdCuenta": "sim",
+            "FechaTransaccion": now,
+            "Monto": link.amount,
+            "ModuloUtilizado": "EnlacePago",
+            "FormaPagoUtilizada": "PagoNormal",
+            "IdTransaccion": tx_id,
+            "ResultadoTransaccion": "ExitosaAprobada",
+            "CodigoAutorizacion": f"{self.random.randint(0, 999999):06d}",
+            "EsProductiva": False,
+            "EnlacePago": {"Id": link.id, "IdentificadorEnlaceComercio": link.reference, "NombreProducto": link.product},
+            "IdExterno": link.reference,
+        }
+        url = self.config.webhook_url or link.webhook_url
+        if url:
+            self.enqueue_webhook(url, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+        if not link.redirect_url:
+            return ""
+        amount = f"{link.amount:.2f}"
+        q = {
+            "identificadorEnlaceComercio": link.reference,
+            "idTransaccion": tx_id,
+            "idEnlace": str(link.id),
+            "monto": amount,
+            "hash": redirect_hash(self.config.secret, link.reference, tx_id, str(link.id), amount),
+        }
+        return f"{link.redirect_url}{'&' if '?' in link.redirect_url else '?'}{urlencode(q)}"
+
+    # ---------- webhooks ----------
+    def enqueue_webhook(self, url: str, raw: bytes, attempt: int = 0, delay: float = 0.0):
+        with self._cond:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._seq), url, raw, attempt))
+            self._cond.notify()
+
+    def _send(self, url: str, raw: bytes) -> bool:
+        signature = sign(self.config.secret, raw)
+        if self.config.bad_signature_rate and self.random.random() < self.config.bad_signature_rate:
+            signature = "0" * 64
+            self.bump("webhooks_bad_signature")
+        req = urllib.request.Request(url, data=raw, method="POST", headers={
+            "Content-Type": "application/json",
+            self.config.hash_header: signature,
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=15) as r:
+                return 200 <= r.status < 300
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def _webhook_loop(self):
+        interval = 1.0 / self.config.webhook_rate if self.config.webhook_rate > 0 else 0.0
+        while True:
+            with self._cond:
+                while not self._stopping and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._cond.wait(timeout)
+                if self._stopping:
+                    return
+                _, _, url, raw, attempt = heapq.heappop(self._queue)
+
+            if self._send(url, raw):
+                self.bump("webhooks_sent")
+            elif attempt < WEBHOOK_RETRIES:
+                self.enqueue_webhook(url, raw, attempt + 1, delay=WEBHOOK_RETRY_DELAY * (attempt + 1))
+            else:
+                self.bump("webhooks_failed")
+
+            if interval:
+                time.sleep(interval)
+
+    def pending_webhooks(self) -> int:
+        with self._cond:
+            return len(self._queue)
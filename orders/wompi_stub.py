@@ -0,0 +1,96 @@
+# orders/wompi_stub.py
+"""
+Wompi falso en localhost que responde respuestas grabadas (tests / pruebas offline).
+
+    recordings = {
+        "POST /connect/token": {"status": 200, "body": {"access_token": "t", "expires_in": 3600}},
+        "GET /EnlacePago/123": {"status": 200, "body": {...}},
+    }
+    with WompiStub(recordings) as stub:
+        # WOMPI_API_BASE = stub.url, WOMPI_TOKEN_URL = stub.url + "/connect/token"
+        ...
+    stub.hits  # [("GET", "/EnlacePago/123"), ...]
+
+Lo que no está grabado responde 404.
+
+LocalHTTPServer es el andamiaje (servidor con threads en un puerto libre, start/stop, `with`);
+lo reusa el simulador (orders/wompi_sim.py). El handler ve a su dueño en self.server.owner.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _replay(self):
+        stub = self.server.owner
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        path = self.path.split("?", 1)[0]
+        with stub.lock:
+            stub.hits.append((self.command, path))
+        rec = stub.recordings.get(f"{self.command} {path}", {"status": 404, "body": {"error": "not recorded"}})
+
+        body = json.dumps(rec.get("body", {})).encode("utf-8")
+        self.send_response(rec.get("status", 200))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _replay
+    do_POST = _replay
+
+    def log_message(self, *args):
+        pass  # sin ruido en la salida de los tests
+
+
+class LocalHTTPServer:
+    """ThreadingHTTPServer en localhost (port=0: uno libre) servido desde un thread daemon."""
+
+    handler_class = None
+    thread_name = "local-http"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=self.thread_name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class WompiStub(LocalHTTPServer):
+    handler_class = _Handler
+    thread_name = "wompi-stub"
+
+    def __init__(self, recordings: dict, host: str = "127.0.0.1", port: int = 0):
+        self.recordings = recordings
+        self.hits = []
+        self.lock = threading.Lock()
+        super().__init__(host, port)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
@@ -9,11 +9,23 @@
     window.__BASALTO_BOUND__ = true;
 
     // ========= Config =========
-    const SHIPPING_FLAT = 3.0;
+    const SHIPPING_FLAT = 3.0; // solo estimado del drawer; el checkout muestra la cotización de /api/cart/quote/
+    const MAX_QTY = 99; // mismo límite que orders/schemas.py
+
+    // carrito guardado en localStorage; subir CART_VERSION si cambia el formato (el viejo se descarta)
+    const CART_KEY = "basalto:cart";
+    const CART_VERSION = 1;
+    const CART_TTL_MS = 14 * 24 * 60 * 60 * 1000;
 
     // ========= State =========
     const cart = [];
     let currentProduct = null;
+    let checkoutIdemKey = null; // se reutiliza si el envío falla por red (reintento = misma orden)
+
+    const newIdemKey = () =>
+      (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
 
     // ========= Helpers =========
     const $ = (id) => document.getElementById(id);
@@ -72,6 +84,9 @@
       return "shirt";
     };
 
+    const esc = (v) =>
+      String(v ?? "").replace(/[&<>"']/g, (ch) => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[ch]));
+
     const getItemUnitPrice = (it) => {
       const p = it.unit_price ?? it.price ?? 0;
       const num = Number(p);
@@ -86,29 +101,61 @@
       }, 0);
     };
 
-    // 🔑 Key única para merge (prioriza SKU si existe)
-    const itemKey = (it) => {
-      const sku = String(it.sku || "").trim();
-      const size = String(it.size || "M").trim().toUpperCase();
-      if (sku) return `SKU:${sku}|SIZE:${size}`;
+    const clampQty = (q) => Math.min(MAX_QTY, Math.max(1, parseInt(q || 1, 10) || 1));
 
-      return [
-        (it.title || "").trim(),
-        (it.sleeve || "").trim(),
-        (it.color || "").trim(),
-        size,
-        String(it.price ?? it.unit_price ?? ""),
-        (it.img || "").trim(),
-      ].join("|");
-    };
+    // 🔑 una línea por SKU (el SKU ya es producto + color + talla)
+    const itemKey = (it) => String(it.sku || "").trim();
 
     const addOrMerge = (item) => {
       const k = itemKey(item);
-      const idx = cart.findIndex((x) => itemKey(x) === k);
-      if (idx >= 0) {
-        cart[idx].qty = Number(cart[idx].qty || 1) + Number(item.qty || 1);
+      const found = cart.find((x) => itemKey(x) === k);
+      if (found) {
+        found.qty = clampQty(Number(found.qty || 1) + Number(item.qty || 1));
       } else {
-        cart.push(item);
+        cart.push({ ...item, qty: clampQty(item.qty) });
+      }
+    };
+
+    // ========= Persistencia (localStorage) =========
+    // Formato compacto: {v, at, l: [[sku, qty, size, price, title, sleeve, color, img], ...]}
+    // Solo lo necesario para dibujar el carrito; precio, título e imagen reales los pone el backend.
+    const saveCart = () => {
+      try {
+        if (!cart.length) {
+          localStorage.removeItem(CART_KEY);
+          return;
+        }
+        const l = cart.map((it) => [
+          it.sku, clampQty(it.qty), it.size || "", getItemUnitPrice(it),
+          it.title || "", it.sleeve || "", it.color || "", it.img || "",
+        ]);
+        localStorage.setItem(CART_KEY, JSON.stringify({ v: CART_VERSION, at: Date.now(), l }));
+      } catch (_) {
+        // modo privado / cuota llena: el carrito sigue en memoria
+      }
+    };
+
+    const loadCart = () => {
+      try {
+        const saved = JSON.parse(localStorage.getItem(CART_KEY) || "null");
+        if (!saved || saved.v !== CART_VERSION || !Array.isArray(saved.l) || Date.now() - Number(saved.at || 0) > CART_TTL_MS) {
+          localStorage.removeItem(CART_KEY);
+          return [];
+        }
+        return saved.l
+          .filter((row) => Array.isArray(row) && String(row[0] || "").trim())
+          .map(([sku, qty, size, price, title, sleeve, color, img]) => ({
+            sku: String(sku).trim(),
+            qty: clampQty(qty),
+            size: normalizeSizeKey(size),
+            price: normalizePrice(price).toFixed(2),
+            title: String(title || "Producto BASALTO"),
+            sleeve: String(sleeve || ""),
+            color: String(color || ""),
+            img: String(img || ""),
+          }));
+      } catch (_) {
+        return [];
       }
     };
 
@@ -167,7 +214,134 @@
       btn.style.display = cart.length ? "inline-flex" : "none";
     };
 
+    // ========= Render incremental =========
+    // Cada contenedor guarda sus filas por SKU: solo se crean las líneas nuevas, se borran
+    // las que salieron y se actualizan los textos de las que cambiaron de cantidad.
+    const rowCaches = new WeakMap();
+
+    const syncRows = (wrap, create, update) => {
+      let rows = rowCaches.get(wrap);
+      if (!rows) {
+        rows = new Map();
+        rowCaches.set(wrap, rows);
+        wrap.innerHTML = "";
+      }
+
+      const keep = new Set();
+      cart.forEach((it, i) => {
+        const key = itemKey(it);
+        keep.add(key);
+
+        let row = rows.get(key);
+        if (!row) {
+          row = { el: create(it), state: "" };
+          row.el.dataset.key = key;
+          rows.set(key, row);
+        }
+
+        const price = getItemUnitPrice(it);
+        const qty = clampQty(it.qty);
+        const state = `${qty}|${price}`;
+        if (row.state !== state) {
+          update(row.el, qty, price, price * qty);
+          row.state = state;
+        }
+
+        if (wrap.children[i] !== row.el) wrap.insertBefore(row.el, wrap.children[i] || null);
+      });
+
+      rows.forEach((row, key) => {
+        if (keep.has(key)) return;
+        row.el.remove();
+        rows.delete(key);
+      });
+    };
+
+    const renderTotals = (elSub, elShip, elTot) => {
+      const subtotal = calcSubtotal(cart);
+      const shipping = cart.length ? SHIPPING_FLAT : 0;
+
+      elSub.textContent = money(subtotal);
+      elShip.textContent = money(shipping);
+      elTot.textContent = money(subtotal + shipping);
+    };
+
     // ========= Checkout Summary =========
+    const createSummaryRow = (it) => {
+      const div = document.createElement("div");
+      div.className = "sum-item";
+      div.innerHTML = `
+        <div class="sum-thumb" style="background-image:url('${esc(it.img)}')"></div>
+        <div class="sum-info">
+          <p class="sum-title">${esc(it.title || "Producto BASALTO")}</p>
+          <div class="sum-meta">
+            ${esc((it.sleeve || "").trim())} · ${esc((it.color || "").trim())} · ${it.size ? `Talla ${esc(it.size.toUpperCase())} · ` : ""}x<span data-qty></span>
+            ${it.sku ? ` · <span style="color:var(--muted)">SKU ${esc(it.sku)}</span>` : ``}
+          </div>
+        </div>
+        <div class="sum-price">
+          <strong data-line></strong><br>
+          <span style="color:var(--muted)"><span data-unit></span> c/u</span>
+        </div>
+      `;
+      return div;
+    };
+
+    const updateRow = (el, qty, price, line) => {
+      el.querySelector("[data-qty]").textContent = String(qty);
+      el.querySelector("[data-line]").textContent = money(line);
+      el.querySelector("[data-unit]").textContent = money(price);
+    };
+
+    // ========= Cotización (mismas reglas que create_order: envío por departamento, descuentos) =========
+    let quoteSeq = 0;
+
+    const refreshQuote = async () => {
+      const itemsWrap = $("sumItems");
+      if (!cart.length || !itemsWrap) return;
+
+      const seq = ++quoteSeq;
+      try {
+        const res = await fetch("/api/cart/quote/", {
+          method: "POST",
+          headers: { "Content-Type": "application/json", Accept: "application/json" },
+          body: JSON.stringify({
+            department: (coDept?.value || "").trim(),
+            items: cart.map((it) => ({ sku: it.sku, qty: clampQty(it.qty) })),
+          }),
+        });
+        if (!res.ok) return;
+        const q = await res.json();
+        if (seq !== quoteSeq) return; // llegó una cotización más nueva
+
+        // precio actual de la lista (carritos guardados con precio viejo)
+        let repriced = false;
+        (q.lines || []).forEach((ln, i) => {
+          const it = cart[i];
+          if (it && it.sku === ln.sku && getItemUnitPrice(it) !== Number(ln.unit_price)) {
+            it.price = ln.unit_price;
+            repriced = true;
+          }
+        });
+        if (repriced) {
+          saveCart();
+          renderDrawer();
+          syncRows(itemsWrap, createSummaryRow, updateRow);
+        }
+
+        const discount = Number(q.discount || 0);
+        const discountRow = $("sumDiscountRow");
+        if (discountRow) discountRow.style.display = discount > 0 ? "" : "none";
+        if ($("sumDiscountLabel")) $("sumDiscountLabel").textContent = q.discount_label || "Descuento";
+        if ($("sumDiscount")) $("sumDiscount").textContent = `-${money(discount)}`;
+        if ($("sumSubtotal")) $("sumSubtotal").textContent = money(q.subtotal);
+        if ($("sumShipping")) $("sumShipping").textContent = money(q.shipping);
+        if ($("sumTotal")) $("sumTotal").textContent = money(q.total);
+      } catch (_) {
+        // sin red: queda el estimado local
+      }
+    };
+
     const renderCheckoutSummary = () => {
       const itemsWrap = $("sumItems");
       const elSubtotal = $("sumSubtotal");
@@ -176,42 +350,45 @@
 
       if (!itemsWrap || !elSubtotal || !elShipping || !elTotal) return;
 
-      itemsWrap.innerHTML = "";
+      syncRows(itemsWrap, createSummaryRow, updateRow);
+      renderTotals(elSubtotal, elShipping, elTotal); // estimado mientras llega la cotización
+      refreshQuote();
+    };
 
-      cart.forEach((it) => {
-        const price = getItemUnitPrice(it);
-        const qty = Math.max(1, parseInt(it.qty || 1, 10));
-        const line = price * qty;
-
-        const div = document.createElement("div");
-        div.className = "sum-item";
-        div.innerHTML = `
-          <div class="sum-thumb" style="background-image:url('${it.img || ""}')"></div>
-          <div class="sum-info">
-            <p class="sum-title">${it.title || "Producto BASALTO"}</p>
-            <div class="sum-meta">
-              ${(it.sleeve || "").trim()} · ${(it.color || "").trim()} · ${it.size ? `Talla ${(it.size || "").toUpperCase()} · ` : ""}x${qty}
-              ${it.sku ? ` · <span style="color:var(--muted)">SKU ${it.sku}</span>` : ``}
-            </div>
-          </div>
-          <div class="sum-price">
-            <strong>${money(line)}</strong><br>
-            <span style="color:var(--muted)">${money(price)} c/u</span>
+    // ========= Drawer (mini carrito) =========
+    const createDrawerRow = (it) => {
+      const div = document.createElement("div");
+      div.className = "ditem";
+      div.innerHTML = `
+        <div class="dthumb" style="background-image:url('${esc(it.img)}')"></div>
+        <div class="dmeta">
+          <p class="dtitle">${esc(it.title || "Producto BASALTO")}</p>
+          <div class="dsub">
+            ${esc((it.sleeve || "").trim())} · ${esc((it.color || "").trim())} ${it.size ? `· Talla ${esc(it.size.toUpperCase())}` : ""}
+            ${it.sku ? ` · SKU ${esc(it.sku)}` : ``}
           </div>
-        `;
-        itemsWrap.appendChild(div);
-      });
 
-      const subtotal = calcSubtotal(cart);
-      const shipping = cart.length ? SHIPPING_FLAT : 0;
-      const total = subtotal + shipping;
+          <div class="drow2">
+            <div class="dqty" aria-label="Cantidad">
+              <button class="dqbtn" type="button" data-dqminus>−</button>
+              <div class="dqval" data-qty></div>
+              <button class="dqbtn" type="button" data-dqplus>+</button>
+            </div>
+
+            <div style="text-align:right;">
+              <div class="dprice" data-line></div>
+              <div class="dsub"><span data-unit></span> c/u</div>
+            </div>
+          </div>
 
-      elSubtotal.textContent = money(subtotal);
-      elShipping.textContent = money(shipping);
-      elTotal.textContent = money(total);
+          <div class="drow2">
+            <button class="dremove" type="button" data-dremove>Eliminar</button>
+          </div>
+        </div>
+      `;
+      return div;
     };
 
-    // ========= Drawer (mini carrito) =========
     const renderDrawer = () => {
       const itemsWrap = $("drawerItems");
       const empty = $("drawerEmpty");
@@ -220,11 +397,6 @@
       const elTot = $("drawerTotal");
       const badge = $("cartBadge");
 
-      if (!itemsWrap || !empty || !elSub || !elShip || !elTot) return;
-
-      itemsWrap.innerHTML = "";
-      empty.style.display = cart.length ? "none" : "block";
-
       if (badge) {
         const count = cart.reduce((acc, it) => acc + Number(it.qty || 1), 0);
         badge.textContent = String(count);
@@ -232,52 +404,26 @@
         badge.setAttribute("aria-label", `${count} items`);
       }
 
-      cart.forEach((it, i) => {
-        const price = getItemUnitPrice(it);
-        const qty = Math.max(1, parseInt(it.qty || 1, 10));
-        const line = price * qty;
-
-        const div = document.createElement("div");
-        div.className = "ditem";
-        div.innerHTML = `
-          <div class="dthumb" style="background-image:url('${it.img || ""}')"></div>
-          <div class="dmeta">
-            <p class="dtitle">${it.title || "Producto BASALTO"}</p>
-            <div class="dsub">
-              ${(it.sleeve || "").trim()} · ${(it.color || "").trim()} ${it.size ? `· Talla ${(it.size || "").toUpperCase()}` : ""}
-              ${it.sku ? ` · SKU ${it.sku}` : ``}
-            </div>
-
-            <div class="drow2">
-              <div class="dqty" aria-label="Cantidad">
-                <button class="dqbtn" type="button" data-dqminus="${i}">−</button>
-                <div class="dqval">${qty}</div>
-                <button class="dqbtn" type="button" data-dqplus="${i}">+</button>
-              </div>
-
-              <div style="text-align:right;">
-                <div class="dprice">${money(line)}</div>
-                <div class="dsub">${money(price)} c/u</div>
-              </div>
-            </div>
+      if (!itemsWrap || !empty || !elSub || !elShip || !elTot) return;
 
-            <div class="drow2">
-              <button class="dremove" type="button" data-dremove="${i}">Eliminar</button>
-            </div>
-          </div>
-        `;
-        itemsWrap.appendChild(div);
-      });
+      empty.style.display = cart.length ? "none" : "block";
+      syncRows(itemsWrap, createDrawerRow, updateRow);
+      renderTotals(elSub, elShip, elTot);
 
-      const subtotal = calcSubtotal(cart);
-      const shipping = cart.length ? SHIPPING_FLAT : 0;
-      const total = subtotal + shipping;
+      updateGoCheckoutVisibility();
+    };
 
-      elSub.textContent = money(subtotal);
-      elShip.textContent = money(shipping);
-      elTot.textContent = money(total);
+    // todo cambio del carrito pasa por acá: guarda, redibuja lo que cambió y es otro pedido
+    const cartChanged = () => {
+      checkoutIdemKey = null;
+      saveCart();
+      renderDrawer();
+      if (checkoutModal && checkoutModal.classList.contains("is-open")) renderCheckoutSummary();
+    };
 
-      updateGoCheckoutVisibility();
+    const clearCart = () => {
+      cart.length = 0;
+      cartChanged();
     };
 
     const openDrawer = () => {
@@ -553,8 +699,7 @@
         }
 
         addOrMerge(item);
-        renderDrawer();
-        updateGoCheckoutVisibility();
+        cartChanged();
 
         addToCartBtn.textContent = "Agregado ✓";
         setTimeout(() => (addToCartBtn.textContent = "Agregar al pedido"), 900);
@@ -567,7 +712,13 @@
         if (cart.length === 0 && currentProduct) {
           const qty = Math.max(1, parseInt(pmQty?.value || "1", 10));
           const size = normalizeSizeKey(pmSize?.value || "M");
-          addOrMerge(buildItemFromCurrent(qty, size));
+          const item = buildItemFromCurrent(qty, size);
+          if (!item.sku) {
+            alert("Esta talla no está disponible en este momento.");
+            return;
+          }
+          addOrMerge(item);
+          cartChanged();
         }
         closeProductModal();
         openCheckout();
@@ -589,11 +740,15 @@
         }
 
         addOrMerge(item);
+        cartChanged();
         closeProductModal();
         openCheckout();
       });
     }
 
+    // Envío según departamento
+    if (coDept) coDept.addEventListener("change", refreshQuote);
+
     // Toggle método de pago
     document.querySelectorAll('input[name="pay_method"]').forEach((r) => {
       r.addEventListener("change", () => {
@@ -603,35 +758,27 @@
       });
     });
 
-    // Drawer qty +/- / remove
+    // Drawer qty +/- / remove (la fila lleva el SKU en data-key)
     document.addEventListener("click", (e) => {
-      const minus = e.target.closest("[data-dqminus]");
-      const plus = e.target.closest("[data-dqplus]");
-      const rem = e.target.closest("[data-dremove]");
-
-      if (minus) {
-        const i = parseInt(minus.getAttribute("data-dqminus"), 10);
-        if (cart[i]) {
-          cart[i].qty = Math.max(1, Number(cart[i].qty || 1) - 1);
-          renderDrawer();
-        }
-      }
+      const btn = e.target.closest("[data-dqminus], [data-dqplus], [data-dremove]");
+      const row = btn && btn.closest(".ditem[data-key]");
+      if (!row) return;
 
-      if (plus) {
-        const i = parseInt(plus.getAttribute("data-dqplus"), 10);
-        if (cart[i]) {
-          cart[i].qty = Math.max(1, Number(cart[i].qty || 1) + 1);
-          renderDrawer();
-        }
-      }
+      const i = cart.findIndex((it) => itemKey(it) === row.dataset.key);
+      if (i < 0) return;
 
-      if (rem) {
-        const i = parseInt(rem.getAttribute("data-dremove"), 10);
-        if (cart[i]) {
-          cart.splice(i, 1);
-          renderDrawer();
-        }
-      }
+      if (btn.hasAttribute("data-dremove")) cart.splice(i, 1);
+      else cart[i].qty = clampQty(Number(cart[i].qty || 1) + (btn.hasAttribute("data-dqplus") ? 1 : -1));
+      cartChanged();
+    });
+
+    // otra pestaña cambió el carrito
+    window.addEventListener("storage", (e) => {
+      if (e.key !== CART_KEY) return;
+      cart.splice(0, cart.length, ...loadCart());
+      checkoutIdemKey = null;
+      renderDrawer();
+      if (checkoutModal && checkoutModal.classList.contains("is-open")) renderCheckoutSummary();
     });
 
     // Drawer -> checkout
@@ -653,6 +800,49 @@
       });
     }
 
+    // ========= Stock en vivo =========
+    // Devuelve mensajes de líneas sin stock suficiente ([] si todo OK o si falla la red:
+    // el backend vuelve a validar con lock igualmente).
+    const checkCartStock = async () => {
+      const need = {};
+      cart.forEach((it) => {
+        const sku = String(it.sku || "").trim();
+        if (sku) need[sku] = (need[sku] || 0) + Math.max(1, parseInt(it.qty || 1, 10));
+      });
+      const skus = Object.keys(need);
+      if (!skus.length) return [];
+
+      try {
+        const res = await fetch(`/api/stock/?skus=${encodeURIComponent(skus.join(","))}`, {
+          headers: { Accept: "application/json" },
+        });
+        if (!res.ok) return [];
+        const data = await res.json();
+        const stock = data.stock || {};
+
+        // de paso, precios al día (el backend igual cobra el de la lista)
+        const prices = data.prices || {};
+        let repriced = false;
+        cart.forEach((it) => {
+          if (prices[it.sku] !== undefined && getItemUnitPrice(it) !== Number(prices[it.sku])) {
+            it.price = prices[it.sku];
+            repriced = true;
+          }
+        });
+        if (repriced) cartChanged();
+
+        return cart
+          .filter((it) => it.sku && Number(stock[it.sku] ?? 0) < need[it.sku])
+          .map((it) => {
+            const avail = Number(stock[it.sku] ?? 0);
+            const label = `${it.title || "Producto"}${it.size ? ` · Talla ${it.size}` : ""}`;
+            return avail > 0 ? `- ${label}: quedan ${avail}` : `- ${label}: agotado`;
+          });
+      } catch (_) {
+        return [];
+      }
+    };
+
     /* ==========================================
        Checkout submit -> API -> Wompi / WhatsApp
        - Card: abre Wompi directo
@@ -677,6 +867,14 @@
           return;
         }
 
+        // ✅ Validar stock en vivo antes de crear la orden
+        const stockProblems = await checkCartStock();
+        if (stockProblems.length) {
+          alert("Sin stock suficiente:\n" + stockProblems.join("\n") + "\n\nAjustá tu pedido e intentá de nuevo.");
+          renderDrawer();
+          return;
+        }
+
         const chosenMethod = getPayMethod();
 
         let pendingWin = null;
@@ -694,17 +892,8 @@
           city: (coCity?.value || "").trim(),
           notes: (coNotes?.value || "").trim(),
           payment_method: chosenMethod,
-          items: cart.map((it) => ({
-            sku: it.sku || "",
-            title: it.title,
-            sleeve: it.sleeve,
-            color: it.color,
-            size: (it.size || "").toUpperCase(),
-            fabric: it.fabric || "",
-            img: it.img || "",
-            qty: it.qty || 1,
-            unit_price: String(it.price ?? it.unit_price ?? "0").replace(/[^0-9.]/g, ""),
-          })),
+          // título, talla, precio e imagen salen del Variant en el backend
+          items: cart.map((it) => ({ sku: it.sku, qty: clampQty(it.qty) })),
         };
 
         if (confirmOrderBtn) {
@@ -713,16 +902,23 @@
         }
 
         try {
+          if (!checkoutIdemKey) checkoutIdemKey = newIdemKey();
+
           const res = await fetch("/api/orders/create/", {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", "Idempotency-Key": checkoutIdemKey },
             body: JSON.stringify(payload),
           });
 
           const raw = await res.text();
+          // hubo respuesta del server: el próximo intento es un pedido nuevo
+          // (salvo 409 = el mismo pedido todavía se está procesando)
+          if (res.status !== 409) checkoutIdemKey = null;
           if (!res.ok) {
             console.log("CREATE_ORDER ERROR:", raw);
-            throw new Error(raw || "Error creando orden");
+            let msg = raw;
+            try { msg = JSON.parse(raw).detail || raw; } catch (_) {}
+            throw new Error(msg || "Error creando orden");
           }
 
           const data = JSON.parse(raw);
@@ -740,8 +936,7 @@
               if (pendingWin && pendingWin.location) pendingWin.location.href = data.payment_link;
               else window.location.href = data.payment_link;
 
-              cart.length = 0;
-              renderDrawer();
+              clearCart();
               closeCheckout();
               return;
             }
@@ -755,8 +950,7 @@
               const w = window.open(data.whatsapp_url, "_blank", "noopener");
               if (!w) window.location.href = data.whatsapp_url;
 
-              cart.length = 0;
-              renderDrawer();
+              clearCart();
               closeCheckout();
               return;
             }
@@ -766,8 +960,7 @@
           }
 
           alert("Orden creada.");
-          cart.length = 0;
-          renderDrawer();
+          clearCart();
           closeCheckout();
         } catch (err) {
           try { if (pendingWin && !pendingWin.closed) pendingWin.close(); } catch (_) {}
@@ -782,6 +975,7 @@
     }
 
     // Inicial
+    cart.push(...loadCart());
     updateGoCheckoutVisibility();
     renderDrawer();
 
@@ -791,6 +985,125 @@
 })();
 
 
+/* ===========================
+   Catalog lazy-load (resto de cards vía /api/catalog/)
+=========================== */
+(() => {
+  document.addEventListener("DOMContentLoaded", () => {
+    const sentinels = Array.from(document.querySelectorAll(".catalog-more"));
+    if (!sentinels.length) return;
+
+    const esc = (v) =>
+      String(v ?? "").replace(/[&<>"']/g, (ch) => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[ch]));
+
+    // mismo markup que templates/partials/catalog_card.html
+    const cardHtml = (c, kicker) => {
+      const src = c.srcset;
+      const thumb = src
+        ? `<div class="thumb"><picture>
+            ${src.avif ? `<source type="image/avif" srcset="${esc(src.avif)}" sizes="${esc(src.sizes)}">` : ""}
+            ${src.webp ? `<source type="image/webp" srcset="${esc(src.webp)}" sizes="${esc(src.sizes)}">` : ""}
+            <img src="${esc(c.img)}" ${src.auto ? `srcset="${esc(src.auto)}" sizes="${esc(src.sizes)}"` : ""} alt="${esc(`${c.title} ${c.color}`)}" loading="lazy" decoding="async">
+          </picture></div>`
+        : `<div class="thumb" style="--img:url('${esc(c.img)}');"></div>`;
+
+      const compare = Number(c.compare || 0) > 0 ? `<del>$${esc(c.compare)}</del>` : "";
+
+      return `
+        <article class="card" data-sleeve="${esc(c.sleeve)}" data-color="${esc(c.color)}">
+          ${thumb}
+          <div class="meta">
+            <span class="kicker">${esc(kicker || c.sleeve)}</span>
+            <div class="titleRow">
+              <h4>${esc(c.title)}</h4>
+              <div class="price">$${esc(c.price)} ${compare}</div>
+            </div>
+            <p class="colorline">${esc(c.color)}</p>
+            <div class="cta">
+              <a class="cardlink js-open-modal" href="#"
+                 data-img="${esc(c.img)}"
+                 data-title="${esc(c.title)}"
+                 data-sleeve="${esc(c.sleeve)}"
+                 data-color="${esc(c.color)}"
+                 data-price="${esc(c.price)}"
+                 data-compare="${esc(c.compare)}"
+                 data-fabric="${esc(c.fabric)}"
+                 data-kind="${esc(c.kind)}"
+                 data-sku-map="${esc(JSON.stringify(c.sku_map || {}))}"
+              >Ver detalles</a>
+            </div>
+          </div>
+        </article>`;
+    };
+
+    const loading = new WeakSet();
+
+    const loadNext = async (el) => {
+      if (loading.has(el) || !el.isConnected) return false;
+      const grid = document.getElementById(el.dataset.catalogGrid || "");
+      if (!grid) return false;
+
+      loading.add(el);
+      try {
+        const url = new URL(el.dataset.catalogUrl, window.location.origin);
+        url.searchParams.set("kind", el.dataset.catalogKind || "shirts");
+        url.searchParams.set("page", el.dataset.catalogPage || "2");
+        url.searchParams.set("per_page", el.dataset.catalogPerPage || "12");
+
+        const res = await fetch(url.toString(), { headers: { Accept: "application/json" } });
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        const data = await res.json();
+
+        grid.insertAdjacentHTML(
+          "beforeend",
+          (data.results || []).map((c) => cardHtml(c, el.dataset.catalogKicker)).join("")
+        );
+        document.dispatchEvent(new CustomEvent("catalog:updated"));
+
+        if (data.next_page) {
+          el.dataset.catalogPage = String(data.next_page);
+          return true;
+        }
+        el.remove();
+        return false;
+      } catch (err) {
+        console.log("CATALOG LOAD ERROR:", err);
+        return false;
+      } finally {
+        loading.delete(el);
+      }
+    };
+
+    const loadAll = async () => {
+      for (const el of sentinels) {
+        // eslint-disable-next-line no-await-in-loop
+        while (await loadNext(el)) { /* sigue */ }
+      }
+    };
+
+    if ("IntersectionObserver" in window) {
+      const io = new IntersectionObserver((entries) => {
+        entries.forEach(async (entry) => {
+          if (!entry.isIntersecting) return;
+          const more = await loadNext(entry.target);
+          if (!more) io.unobserve(entry.target);
+        });
+      }, { rootMargin: "600px 0px" });
+      sentinels.forEach((el) => io.observe(el));
+    } else {
+      loadAll();
+    }
+
+    // Buscar / filtrar necesita todas las cards en el DOM
+    const search = document.getElementById("filterSearch");
+    if (search) search.addEventListener("input", loadAll, { once: true });
+    document.addEventListener("click", (e) => {
+      if (e.target.closest(".fbtn")) loadAll();
+    });
+  });
+})();
+
+
 /* ===========================
    Catalog filters (tab-aware + counter) — FIX for Caps/Bags
 =========================== */
@@ -921,6 +1234,8 @@
     bindTab(tabCaps);
     bindTab(tabBags);
 
+    document.addEventListener("catalog:updated", apply);
+
     apply();
   });
 })();